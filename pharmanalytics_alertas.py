@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Alertas de estoque baixo do PharmAnalytics.
+Define limites de reposição por produto ou categoria e consome a fila de alertas gerada
+pelo banco quando a quantidade de um produto cai abaixo do limite, entregando cada alerta
+como uma linha JSON na saída padrão ou no arquivo informado. Os alertas só saem da fila depois
+de escritos: se a escrita falhar, eles são entregues de novo na próxima execução.
+
+Uso: python pharmanalytics_alertas.py limite --produto COD [QUANTIDADE]
+     python pharmanalytics_alertas.py limite --categoria NOME [QUANTIDADE]
+     python pharmanalytics_alertas.py consumir [--maximo N] [--arquivo ALERTAS.jsonl] [--intervalo SEGUNDOS]
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+
+from pharmanalytics_reformulado import BancoDeDados, OperacoesAlertas
+
+
+def escrever_alertas(alertas: list, caminho: str = None) -> None:
+    """
+    Escreve os alertas como linhas JSON, acrescentando-os ao arquivo ou na saída padrão.
+    """
+    linhas = ''.join(json.dumps({'id': cod, 'produto': produto, 'quantidade': quantidade,
+                                 'limite': minimo, 'momento': momento}) + '\n'
+                     for cod, produto, quantidade, minimo, momento in alertas)
+    if caminho:
+        with open(caminho, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(linhas)
+    else:
+        sys.stdout.write(linhas)
+        sys.stdout.flush()
+
+
+def main(argumentos: list = None) -> int:
+    """
+    Ponto de entrada da linha de comando.
+    """
+    parser = argparse.ArgumentParser(description="Alertas de estoque baixo do PharmAnalytics.")
+    parser.add_argument('--banco', default=BancoDeDados.NOME_DB)
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    limite = comandos.add_parser('limite', help="define ou remove um limite de reposição")
+    alvo = limite.add_mutually_exclusive_group(required=True)
+    alvo.add_argument('--produto', type=int)
+    alvo.add_argument('--categoria')
+    limite.add_argument('quantidade', type=int, nargs='?', help="omitida, remove o limite")
+    consumir = comandos.add_parser('consumir', help="retira os alertas pendentes da fila")
+    consumir.add_argument('--maximo', type=int, default=100, help="alertas retirados por vez")
+    consumir.add_argument('--arquivo', help="acrescenta os alertas a este arquivo em vez da saída padrão")
+    consumir.add_argument('--intervalo', type=float, help="continua consumindo a cada SEGUNDOS")
+    args = parser.parse_args(argumentos)
+
+    BancoDeDados.NOME_DB = args.banco
+    BancoDeDados.criar_tabelas()
+    try:
+        if args.comando == 'limite':
+            if args.produto is not None:
+                OperacoesAlertas.definir_limite_produto(args.produto, args.quantidade)
+            else:
+                OperacoesAlertas.definir_limite_categoria(args.categoria, args.quantidade)
+            print("Limite removido." if args.quantidade is None else "Limite definido.")
+            return 0
+        while True:
+            alertas = OperacoesAlertas.consumir(args.maximo, lambda lote: escrever_alertas(lote, args.arquivo))
+            # Enquanto houver fila, consome sem esperar.
+            if len(alertas) < args.maximo:
+                if args.intervalo is None:
+                    break
+                time.sleep(args.intervalo)
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Erro ao entregar alertas (continuam na fila): {e}", file=sys.stderr)
+        return 1
+    except sqlite3.Error as e:
+        print(f"Erro ao consumir alertas: {e}")
+        return 1
+    finally:
+        BancoDeDados.fechar_conexoes()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
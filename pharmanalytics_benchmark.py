@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Gerador de dados sintéticos e microbenchmarks das operações do PharmAnalytics.
+Os dados são gerados de forma reprodutível a partir de uma semente, e os resultados
+são emitidos em JSON para comparação entre versões.
+
+Uso:
+    python pharmanalytics_benchmark.py gerar BANCO --produtos 100000
+    python pharmanalytics_benchmark.py executar --escalas 1000 100000 1000000 --saida atual.json
+    python pharmanalytics_benchmark.py executar --escalas 1000 --comparar anterior.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from pharmanalytics_reformulado import (
+    BancoDeDados, CacheProdutos, CacheSessoes, OperacoesAdministrador, OperacoesFarmacia, OperacoesProdutos
+)
+
+
+class GeradorDados:
+    """
+    Gera um banco sintético com administradores, usuários, farmácias, telefones,
+    categorias e produtos. A mesma semente produz sempre os mesmos dados.
+    """
+
+    RADICAIS = ('Paracetamol', 'Dipirona', 'Ibuprofeno', 'Amoxicilina', 'Losartana', 'Omeprazol',
+                'Loratadina', 'Azitromicina', 'Metformina', 'Sinvastatina', 'Cetirizina', 'Nimesulida')
+    FORMAS = ('Comprimido', 'Cápsula', 'Xarope', 'Gotas', 'Pomada', 'Solução')
+    BAIRROS = ('Centro', 'Jardim América', 'Vila Nova', 'Boa Vista', 'Santa Cruz', 'São José',
+               'Industrial', 'Bela Vista', 'Planalto', 'Esplanada')
+    HORARIOS = (('07:00', '19:00'), ('08:00', '22:00'), ('00:00', '23:59'), ('09:00', '18:00'))
+    # Registros gravados por transação.
+    TAMANHO_LOTE = 10000
+
+    def __init__(self, produtos: int = 1000, farmacias: int = None, administradores: int = 10,
+                 usuarios: int = None, categorias: int = 50, telefones_por_farmacia: int = 2,
+                 semente: int = 42) -> None:
+        self.produtos = produtos
+        self.farmacias = farmacias if farmacias is not None else max(1, produtos // 100)
+        self.administradores = administradores
+        self.usuarios = usuarios if usuarios is not None else max(1, produtos // 10)
+        self.categorias = categorias
+        self.telefones_por_farmacia = telefones_por_farmacia
+        self.semente = semente
+
+    @staticmethod
+    def cpf_administrador(indice: int) -> int:
+        """
+        CPF sintético do administrador de índice informado.
+        """
+        return 10_000_000_000 + indice
+
+    @staticmethod
+    def senha_administrador(cpf: int) -> str:
+        """
+        Senha sintética do administrador com o CPF informado.
+        """
+        return f'senha{cpf}'
+
+    @staticmethod
+    def nome_produto(codigo: int) -> str:
+        """
+        Nome sintético e único do produto com o código informado.
+        """
+        radical = GeradorDados.RADICAIS[codigo % len(GeradorDados.RADICAIS)]
+        forma = GeradorDados.FORMAS[(codigo // len(GeradorDados.RADICAIS)) % len(GeradorDados.FORMAS)]
+        return f'{radical} {forma} {codigo}'
+
+    def _em_lotes(self, linhas, instrucao: str) -> None:
+        lote = []
+        for linha in linhas:
+            lote.append(linha)
+            if len(lote) >= GeradorDados.TAMANHO_LOTE:
+                with BancoDeDados.transacao() as conn:
+                    conn.executemany(instrucao, lote)
+                lote = []
+        if lote:
+            with BancoDeDados.transacao() as conn:
+                conn.executemany(instrucao, lote)
+
+    def gerar(self) -> None:
+        """
+        Cria o esquema e grava os dados sintéticos no banco configurado em BancoDeDados.NOME_DB.
+        """
+        BancoDeDados.criar_tabelas()
+        aleatorio = random.Random(self.semente)
+        admins = [GeradorDados.cpf_administrador(i) for i in range(self.administradores)]
+        usuarios = [20_000_000_000 + i for i in range(self.usuarios)]
+
+        self._em_lotes(((cpf,) for cpf in admins + usuarios), 'INSERT INTO pessoa (cpf) VALUES (?)')
+        self._em_lotes(
+            ((f'admin{cpf}@pharmanalytics.com',
+              OperacoesAdministrador.gerar_hash_senha(GeradorDados.senha_administrador(cpf)), cpf)
+             for cpf in admins),
+            'INSERT INTO administrador (email, senha, cod_pessoa) VALUES (?, ?, ?)'
+        )
+        self._em_lotes(((cpf,) for cpf in usuarios), 'INSERT INTO usuario (cod_pessoa) VALUES (?)')
+        self._em_lotes(((f'9{cpf % 100_000_000:08d}', cpf) for cpf in usuarios),
+                       'INSERT INTO tel_usuario (numero, cod_usuario) VALUES (?, ?)')
+
+        def farmacias():
+            for cod in range(1, self.farmacias + 1):
+                inicio, fim = aleatorio.choice(GeradorDados.HORARIOS)
+                yield (cod, f'Farmácia {cod}', f'Rua {aleatorio.randint(1, 500)}', aleatorio.randint(1, 9999),
+                       aleatorio.choice(GeradorDados.BAIRROS), f'{aleatorio.randint(1000, 99999):05d}-000',
+                       inicio, fim, 'Segunda-Sábado', aleatorio.choice(admins))
+
+        self._em_lotes(farmacias(), '''INSERT INTO farmacia (cod, nome, rua, num, bairro, cep,
+                                      hora_inicio, hora_fim, dia_funcionamento, cod_admin)
+                                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''')
+        self._em_lotes(
+            ((f'3{cod:04d}{n:04d}', cod) for cod in range(1, self.farmacias + 1)
+             for n in range(self.telefones_por_farmacia)),
+            'INSERT INTO tel_farmacia (numero, cod_farmacia) VALUES (?, ?)'
+        )
+        with BancoDeDados.transacao() as conn:
+            OperacoesFarmacia.indexar_localidades(conn)
+
+        categorias = [f'Categoria {i}' for i in range(1, self.categorias + 1)]
+        self._em_lotes(
+            ((cod, GeradorDados.nome_produto(cod), round(aleatorio.uniform(1, 300), 2),
+              aleatorio.choice(admins), cod) for cod in range(1, self.produtos + 1)),
+            'INSERT INTO produto (cod, nome, preco, cod_admin, cod_estoque) VALUES (?, ?, ?, ?, ?)'
+        )
+        self._em_lotes(((aleatorio.choice(categorias), cod) for cod in range(1, self.produtos + 1)),
+                       'INSERT INTO categoria_produto (categoria, cod_produto) VALUES (?, ?)')
+        self._em_lotes(((cod, aleatorio.randint(0, 1000)) for cod in range(1, self.produtos + 1)),
+                       'INSERT INTO estoque (cod, quantidade) VALUES (?, ?)')
+
+
+class Benchmark:
+    """
+    Mede a latência de cada operação sobre um banco sintético de cada escala.
+    """
+
+    OPERACOES = ('cadastrar_produto', 'atualizar_produto', 'buscar_produto', 'buscar_produto_cache',
+                 'pesquisar_produtos', 'decrementar_estoque', 'consultar_farmacias',
+                 'autenticar_administrador', 'autenticar_administrador_cache', 'excluir_produto')
+
+    def __init__(self, iteracoes: int = 200, semente: int = 42) -> None:
+        self.iteracoes = iteracoes
+        self.semente = semente
+
+    @staticmethod
+    def estatisticas(tempos: list) -> dict:
+        """
+        Resume uma lista de durações (em segundos) em média, percentis e vazão.
+        """
+        ordenados = sorted(tempos)
+
+        def percentil(p):
+            return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))] * 1000
+
+        total = sum(ordenados)
+        return {
+            'n': len(ordenados),
+            'media_ms': total / len(ordenados) * 1000,
+            'p50_ms': percentil(0.50),
+            'p95_ms': percentil(0.95),
+            'p99_ms': percentil(0.99),
+            'ops_s': len(ordenados) / total if total else 0.0,
+        }
+
+    @staticmethod
+    def medir(funcao, argumentos: list) -> dict:
+        """
+        Executa a função uma vez para cada tupla de argumentos e retorna as estatísticas.
+        """
+        tempos = []
+        for args in argumentos:
+            inicio = time.perf_counter()
+            funcao(*args)
+            tempos.append(time.perf_counter() - inicio)
+        return Benchmark.estatisticas(tempos)
+
+    def executar_escala(self, escala: int, diretorio: str) -> dict:
+        """
+        Gera um banco com a quantidade de produtos informada e mede todas as operações.
+        """
+        BancoDeDados.fechar_conexoes()
+        BancoDeDados.NOME_DB = os.path.join(diretorio, f'benchmark_{escala}.db')
+        for sufixo in ('', '-wal', '-shm'):
+            if os.path.exists(BancoDeDados.NOME_DB + sufixo):
+                os.remove(BancoDeDados.NOME_DB + sufixo)
+        gerador = GeradorDados(produtos=escala, semente=self.semente)
+        inicio = time.perf_counter()
+        gerador.gerar()
+        resultados = {'geracao_s': time.perf_counter() - inicio}
+
+        aleatorio = random.Random(self.semente)
+        n = self.iteracoes
+        existentes = [aleatorio.randint(1, escala) for _ in range(n)]
+        novos = list(range(escala + 1, escala + n + 1))
+        admin = GeradorDados.cpf_administrador(0)
+        cache_original = OperacoesProdutos.cache
+        sessoes_originais = OperacoesAdministrador.sessoes
+        try:
+            OperacoesProdutos.cache = CacheProdutos(capacidade=0)
+            resultados['cadastrar_produto'] = Benchmark.medir(
+                OperacoesProdutos.inserir_produto,
+                [(cod, GeradorDados.nome_produto(cod), 'Categoria 1', 9.9, 100, admin) for cod in novos])
+            resultados['atualizar_produto'] = Benchmark.medir(
+                OperacoesProdutos.alterar_produto,
+                [(cod, GeradorDados.nome_produto(cod), 'Categoria 2', 10.5, 500) for cod in existentes])
+            resultados['buscar_produto'] = Benchmark.medir(
+                lambda nome: OperacoesProdutos.obter_produto(nome=nome),
+                [(GeradorDados.nome_produto(cod).lower(),) for cod in existentes])
+            OperacoesProdutos.cache = CacheProdutos()
+            quentes = existentes[:max(1, n // 20)]
+            resultados['buscar_produto_cache'] = Benchmark.medir(
+                lambda nome: OperacoesProdutos.obter_produto(nome=nome),
+                [(GeradorDados.nome_produto(aleatorio.choice(quentes)),) for _ in range(n)])
+            resultados['pesquisar_produtos'] = Benchmark.medir(
+                OperacoesProdutos.pesquisar_produtos,
+                [(GeradorDados.nome_produto(cod)[:6],) for cod in existentes])
+            resultados['decrementar_estoque'] = Benchmark.medir(
+                OperacoesProdutos.finalizar_venda, [([(cod, 1)],) for cod in existentes])
+            resultados['consultar_farmacias'] = Benchmark.medir(
+                OperacoesFarmacia.listar_farmacias_abertas, [('09:00', '18:00')] * n)
+            # Sem o cache de credenciais, cada chamada consulta o banco e recalcula o PBKDF2;
+            # com ele, as chamadas seguintes à primeira só consultam o cache.
+            OperacoesAdministrador.sessoes = CacheSessoes(capacidade=0)
+            resultados['autenticar_administrador'] = Benchmark.medir(
+                OperacoesAdministrador.verificar_credenciais,
+                [(admin, GeradorDados.senha_administrador(admin))] * n)
+            OperacoesAdministrador.sessoes = CacheSessoes()
+            resultados['autenticar_administrador_cache'] = Benchmark.medir(
+                OperacoesAdministrador.verificar_credenciais,
+                [(admin, GeradorDados.senha_administrador(admin))] * n)
+            resultados['excluir_produto'] = Benchmark.medir(
+                OperacoesProdutos.remover_produto, [(cod,) for cod in novos])
+        finally:
+            OperacoesProdutos.cache = cache_original
+            OperacoesAdministrador.sessoes = sessoes_originais
+            BancoDeDados.fechar_conexoes()
+        return resultados
+
+    def executar(self, escalas: list, diretorio: str = None) -> dict:
+        """
+        Executa o benchmark em todas as escalas e retorna o relatório completo.
+        """
+        nome_db_original = BancoDeDados.NOME_DB
+        with tempfile.TemporaryDirectory() as temporario:
+            try:
+                resultados = {str(escala): self.executar_escala(escala, diretorio or temporario)
+                              for escala in escalas}
+            finally:
+                BancoDeDados.NOME_DB = nome_db_original
+        return {
+            'commit': Benchmark.commit_atual(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'iteracoes': self.iteracoes,
+            'semente': self.semente,
+            'escalas': resultados,
+        }
+
+    @staticmethod
+    def commit_atual() -> str:
+        """
+        Retorna o commit do git em que o benchmark foi executado, se disponível.
+        """
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                  text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+                                  ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    @staticmethod
+    def comparar(anterior: dict, atual: dict) -> list:
+        """
+        Compara o p50 de cada operação entre dois relatórios.
+        Retorna tuplas (escala, operação, p50 anterior, p50 atual, variação percentual).
+        """
+        comparacao = []
+        for escala, operacoes in atual['escalas'].items():
+            base = anterior.get('escalas', {}).get(escala, {})
+            for operacao in Benchmark.OPERACOES:
+                if operacao in operacoes and operacao in base:
+                    antes, depois = base[operacao]['p50_ms'], operacoes[operacao]['p50_ms']
+                    variacao = (depois - antes) / antes * 100 if antes else 0.0
+                    comparacao.append((escala, operacao, antes, depois, variacao))
+        return comparacao
+
+
+def main(argumentos: list = None) -> int:
+    """
+    Ponto de entrada da linha de comando.
+    """
+    parser = argparse.ArgumentParser(description="Dados sintéticos e benchmarks do PharmAnalytics.")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    gerar = comandos.add_parser('gerar', help="gera um banco sintético")
+    gerar.add_argument('banco')
+    gerar.add_argument('--produtos', type=int, default=1000)
+    gerar.add_argument('--farmacias', type=int)
+    gerar.add_argument('--administradores', type=int, default=10)
+    gerar.add_argument('--usuarios', type=int)
+    gerar.add_argument('--categorias', type=int, default=50)
+    gerar.add_argument('--telefones', type=int, default=2, help="telefones por farmácia")
+    gerar.add_argument('--semente', type=int, default=42)
+    executar = comandos.add_parser('executar', help="executa os benchmarks")
+    executar.add_argument('--escalas', type=int, nargs='+', default=[1000, 100000, 1000000])
+    executar.add_argument('--iteracoes', type=int, default=200)
+    executar.add_argument('--semente', type=int, default=42)
+    executar.add_argument('--diretorio', help="onde manter os bancos gerados (padrão: temporário)")
+    executar.add_argument('--saida', help="arquivo JSON de resultados (padrão: saída padrão)")
+    executar.add_argument('--comparar', help="relatório JSON anterior para comparação")
+    args = parser.parse_args(argumentos)
+
+    if args.comando == 'gerar':
+        BancoDeDados.NOME_DB = args.banco
+        GeradorDados(args.produtos, args.farmacias, args.administradores, args.usuarios,
+                     args.categorias, args.telefones, args.semente).gerar()
+        BancoDeDados.fechar_conexoes()
+        print(f"Banco sintético gerado em {args.banco}")
+        return 0
+
+    relatorio = Benchmark(args.iteracoes, args.semente).executar(args.escalas, args.diretorio)
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto + '\n')
+    else:
+        print(texto)
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            anterior = json.load(arquivo)
+        for escala, operacao, antes, depois, variacao in Benchmark.comparar(anterior, relatorio):
+            print(f"{escala:>9} {operacao:<26} {antes:9.3f} ms -> {depois:9.3f} ms ({variacao:+.1f}%)",
+                  file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
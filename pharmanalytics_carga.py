@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Gerador de carga concorrente do PharmAnalytics.
+Simula vários terminais de farmácia em processos separados executando uma mistura
+configurável de operações sobre o mesmo banco, e relata vazão, latências, retentativas
+por banco ocupado e a consistência do estoque ao final.
+
+Uso: python pharmanalytics_carga.py --processos 8 --duracao 10 --mix buscar=60,decrementar=25,consultar=10,atualizar=5
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from pharmanalytics_benchmark import Benchmark, GeradorDados
+from pharmanalytics_reformulado import BancoDeDados, EscritorEstoque, OperacoesFarmacia, OperacoesProdutos
+
+OPERACOES = ('buscar', 'decrementar', 'consultar', 'atualizar')
+MIX_PADRAO = {'buscar': 60, 'decrementar': 25, 'consultar': 10, 'atualizar': 5}
+
+
+def ler_mix(texto: str) -> dict:
+    """
+    Converte "buscar=60,decrementar=25" no dicionário de pesos das operações.
+    """
+    mix = {}
+    for parte in texto.split(','):
+        operacao, _, peso = parte.partition('=')
+        operacao = operacao.strip()
+        if operacao not in OPERACOES:
+            raise ValueError(f"operação desconhecida: {operacao}")
+        mix[operacao] = int(peso)
+    return mix
+
+
+def _trabalhador(config: dict) -> dict:
+    """
+    Corpo de cada processo: executa operações sorteadas até o fim da duração.
+    """
+    BancoDeDados.NOME_DB = config['banco']
+    BancoDeDados.PRAGMAS = dict(BancoDeDados.PRAGMAS, busy_timeout=config['busy_timeout'])
+    if config['escritor']:
+        OperacoesProdutos.escritor = EscritorEstoque()
+        OperacoesProdutos.escritor.iniciar()
+    latencias = {operacao: [] for operacao in OPERACOES}
+    contadores = {'retentativas': 0, 'erros': 0, 'vendidos': 0, 'recusados': 0}
+    trava = threading.Lock()
+    operacoes = list(config['mix'])
+    pesos = [config['mix'][operacao] for operacao in operacoes]
+    prazo = time.monotonic() + config['duracao']
+
+    def sortear(operacao: str, aleatorio: random.Random) -> tuple:
+        # Os argumentos são sorteados uma vez por operação e reaproveitados nas retentativas.
+        codigo = aleatorio.randint(1, config['produtos'])
+        if operacao == 'decrementar':
+            return codigo, aleatorio.randint(1, 3)
+        if operacao == 'atualizar':
+            return codigo, round(aleatorio.uniform(1, 300), 2)
+        return codigo,
+
+    def executar(operacao: str, argumentos: tuple) -> None:
+        codigo = argumentos[0]
+        if operacao == 'buscar':
+            OperacoesProdutos.obter_produto(nome=GeradorDados.nome_produto(codigo))
+        elif operacao == 'decrementar':
+            quantidade = argumentos[1]
+            falhas = OperacoesProdutos.finalizar_venda([(codigo, quantidade)])
+            with trava:
+                if falhas:
+                    contadores['recusados'] += 1
+                else:
+                    contadores['vendidos'] += quantidade
+        elif operacao == 'consultar':
+            OperacoesFarmacia.listar_farmacias_abertas('09:00', '18:00')
+        else:
+            # Atualiza apenas o preço, preservando o estoque para a verificação final.
+            with BancoDeDados.transacao() as conn:
+                conn.execute('UPDATE produto SET preco = ? WHERE cod = ?', (argumentos[1], codigo))
+            OperacoesProdutos.cache.invalidar(codigo=codigo)
+
+    def terminal(semente: int) -> None:
+        aleatorio = random.Random(semente)
+        while time.monotonic() < prazo:
+            operacao = aleatorio.choices(operacoes, pesos)[0]
+            argumentos = sortear(operacao, aleatorio)
+            # A latência inclui as tentativas que falharam e as esperas entre elas.
+            inicio = time.perf_counter()
+            for tentativa in range(config['tentativas'] + 1):
+                try:
+                    executar(operacao, argumentos)
+                except sqlite3.OperationalError as e:
+                    if 'locked' not in str(e) and 'busy' not in str(e):
+                        raise
+                    with trava:
+                        contadores['retentativas'] += 1
+                    if tentativa < config['tentativas']:
+                        time.sleep(0.001 * 2 ** min(tentativa, 6))
+                    continue
+                break
+            else:
+                with trava:
+                    contadores['erros'] += 1
+            latencias[operacao].append(time.perf_counter() - inicio)
+
+    threads = [threading.Thread(target=terminal, args=(config['semente'] * 1000 + i,))
+               for i in range(config['threads'])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if OperacoesProdutos.escritor is not None:
+        OperacoesProdutos.escritor.parar()
+    BancoDeDados.fechar_conexoes()
+    return {'latencias': latencias, **contadores}
+
+
+def total_estoque(banco: str) -> tuple:
+    """
+    Retorna a soma e o mínimo das quantidades em estoque do banco.
+    """
+    conn = sqlite3.connect(banco)
+    try:
+        return conn.execute('SELECT coalesce(sum(quantidade), 0), min(quantidade) FROM estoque').fetchone()
+    finally:
+        conn.close()
+
+
+def executar_carga(banco: str, processos: int = 4, duracao: float = 10.0, mix: dict = None,
+                   threads: int = 1, busy_timeout: int = 5000, tentativas: int = 5,
+                   escritor: bool = False, semente: int = 42) -> dict:
+    """
+    Executa a carga sobre um banco já populado e retorna o relatório.
+    """
+    mix = mix or MIX_PADRAO
+    conn = sqlite3.connect(banco)
+    produtos = conn.execute('SELECT max(cod) FROM produto').fetchone()[0] or 1
+    conn.close()
+    estoque_inicial, _ = total_estoque(banco)
+    configuracoes = [{
+        'banco': banco, 'mix': mix, 'duracao': duracao, 'threads': threads, 'produtos': produtos,
+        'busy_timeout': busy_timeout, 'tentativas': tentativas, 'escritor': escritor,
+        'semente': semente + indice,
+    } for indice in range(processos)]
+    inicio = time.perf_counter()
+    with multiprocessing.get_context('spawn').Pool(processos) as pool:
+        parciais = pool.map(_trabalhador, configuracoes)
+    decorrido = time.perf_counter() - inicio
+
+    latencias = {operacao: [] for operacao in OPERACOES}
+    relatorio = {'retentativas': 0, 'erros': 0, 'vendidos': 0, 'recusados': 0}
+    for parcial in parciais:
+        for operacao, tempos in parcial.pop('latencias').items():
+            latencias[operacao].extend(tempos)
+        for chave, valor in parcial.items():
+            relatorio[chave] += valor
+    estoque_final, minimo = total_estoque(banco)
+    # As latências incluem as operações abandonadas (erros); a vazão conta só as concluídas.
+    total_operacoes = sum(len(tempos) for tempos in latencias.values()) - relatorio['erros']
+    relatorio.update({
+        'processos': processos,
+        'threads_por_processo': threads,
+        'duracao_s': decorrido,
+        'operacoes': total_operacoes,
+        'vazao_ops_s': total_operacoes / decorrido if decorrido else 0.0,
+        'latencias': {operacao: Benchmark.estatisticas(tempos)
+                      for operacao, tempos in latencias.items() if tempos},
+        'estoque_inicial': estoque_inicial,
+        'estoque_final': estoque_final,
+        'estoque_consistente': (estoque_inicial - relatorio['vendidos'] == estoque_final
+                                and (minimo is None or minimo >= 0)),
+    })
+    return relatorio
+
+
+def main(argumentos: list = None) -> int:
+    """
+    Ponto de entrada da linha de comando.
+    """
+    parser = argparse.ArgumentParser(description="Carga concorrente simulando terminais de farmácia.")
+    parser.add_argument('--banco', help="banco já populado (padrão: gera um banco temporário)")
+    parser.add_argument('--produtos', type=int, default=10000, help="produtos do banco gerado")
+    parser.add_argument('--processos', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=1, help="terminais por processo")
+    parser.add_argument('--duracao', type=float, default=10.0, help="segundos de carga")
+    parser.add_argument('--mix', type=ler_mix, default=MIX_PADRAO, help="pesos, ex.: buscar=60,decrementar=40")
+    parser.add_argument('--busy-timeout', type=int, default=5000, help="PRAGMA busy_timeout em ms")
+    parser.add_argument('--tentativas', type=int, default=5, help="retentativas quando o banco está ocupado")
+    parser.add_argument('--escritor', action='store_true', help="grava as vendas pelo EscritorEstoque")
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args(argumentos)
+
+    with tempfile.TemporaryDirectory() as temporario:
+        banco = args.banco
+        if banco is None:
+            banco = os.path.join(temporario, 'carga.db')
+            BancoDeDados.NOME_DB = banco
+            GeradorDados(produtos=args.produtos, semente=args.semente).gerar()
+            BancoDeDados.fechar_conexoes()
+        relatorio = executar_carga(banco, args.processos, args.duracao, args.mix, args.threads,
+                                   args.busy_timeout, args.tentativas, args.escritor, args.semente)
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+    return 0 if relatorio['estoque_consistente'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Cópia colunar em memória do catálogo do PharmAnalytics para relatórios.
+Materializa produto, estoque e categoria_produto em colunas compactas (array do Python,
+categorias codificadas por dicionário), com filtros, agregações e top-k que percorrem
+as colunas sem consultar o banco transacional. A cópia pode ser gravada num arquivo
+e reaberta por mapeamento em memória (mmap), e é atualizada de forma incremental a partir
+dos produtos alterados (alteracao_produto) e dos movimentos de estoque (movimento_estoque).
+Com o NumPy instalado, as varreduras usam operações vetorizadas sobre as mesmas colunas.
+
+Uso: python pharmanalytics_colunar.py gravar ARQUIVO
+     python pharmanalytics_colunar.py atualizar ARQUIVO
+     python pharmanalytics_colunar.py consultar ARQUIVO [--categoria X] [--preco-maximo 10] [--estoque-maximo 4]
+"""
+
+import argparse
+import heapq
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+from array import array
+
+from pharmanalytics_reformulado import BancoDeDados
+
+try:
+    import numpy
+except ImportError:  # sem o NumPy, as mesmas consultas rodam em Python puro
+    numpy = None
+
+
+class CatalogoColunar:
+    """
+    Catálogo em colunas: uma posição por produto em cada coluna.
+    Produtos removidos ficam marcados na coluna 'ativo' até a próxima gravação em arquivo.
+    Cada produto é associado à sua primeira categoria em ordem alfabética.
+    """
+
+    COLUNAS = (('cod', 'q'), ('preco', 'd'), ('quantidade', 'q'), ('categoria', 'i'),
+               ('cod_admin', 'q'), ('ativo', 'b'))
+    TIPOS_NUMPY = {'q': 'int64', 'd': 'float64', 'i': 'int32', 'b': 'int8'}
+    # Categoria e administrador ausentes.
+    NENHUM = -1
+    TAMANHO_BLOCO = 1000
+    ASSINATURA = b'PHCOL001'
+    CONSULTA = '''
+        SELECT p.cod, coalesce(p.preco, 0), coalesce(e.quantidade, 0),
+               (SELECT min(categoria) FROM categoria_produto WHERE cod_produto = p.cod),
+               coalesce(p.cod_admin, -1)
+        FROM produto p LEFT JOIN estoque e ON e.cod = p.cod_estoque'''
+
+    def __init__(self, usar_numpy: bool = None) -> None:
+        self.colunas = {nome: array(tipo) for nome, tipo in CatalogoColunar.COLUNAS}
+        self.categorias = []
+        self._codigos_categoria = {}
+        self._posicoes = None
+        self.ultimo_movimento = 0
+        self.ultima_alteracao = 0
+        self.usar_numpy = numpy is not None if usar_numpy is None else usar_numpy
+        self._mapa = None
+
+    def __len__(self) -> int:
+        return len(self.colunas['cod'])
+
+    @staticmethod
+    def _marcadores(conn: sqlite3.Connection) -> tuple:
+        return conn.execute(
+            '''SELECT (SELECT coalesce(max(id), 0) FROM movimento_estoque),
+                      (SELECT coalesce(max(seq), 0) FROM alteracao_produto)'''
+        ).fetchone()
+
+    @classmethod
+    def carregar(cls, usar_numpy: bool = None) -> 'CatalogoColunar':
+        """
+        Materializa o catálogo inteiro do banco configurado, lendo-o em blocos
+        dentro de uma única transação de leitura.
+        """
+        catalogo = cls(usar_numpy)
+        catalogo._posicoes = {}
+        conn = BancoDeDados.conectar()
+        try:
+            conn.execute('BEGIN')
+            catalogo.ultimo_movimento, catalogo.ultima_alteracao = CatalogoColunar._marcadores(conn)
+            cursor = conn.execute(CatalogoColunar.CONSULTA)
+            while True:
+                linhas = cursor.fetchmany(CatalogoColunar.TAMANHO_BLOCO)
+                if not linhas:
+                    break
+                for linha in linhas:
+                    catalogo._gravar_linha(*linha)
+        finally:
+            BancoDeDados.liberar(conn)
+        return catalogo
+
+    def _codigo_categoria(self, categoria: str) -> int:
+        if categoria is None:
+            return CatalogoColunar.NENHUM
+        codigo = self._codigos_categoria.get(categoria)
+        if codigo is None:
+            codigo = self._codigos_categoria[categoria] = len(self.categorias)
+            self.categorias.append(categoria)
+        return codigo
+
+    def _gravar_linha(self, cod: int, preco: float, quantidade: int, categoria: str, cod_admin: int) -> None:
+        valores = (cod, preco, quantidade, self._codigo_categoria(categoria), cod_admin, 1)
+        posicao = self._posicoes.get(cod)
+        if posicao is None:
+            self._posicoes[cod] = len(self)
+            for (nome, _), valor in zip(CatalogoColunar.COLUNAS, valores):
+                self.colunas[nome].append(valor)
+        else:
+            for (nome, _), valor in zip(CatalogoColunar.COLUNAS, valores):
+                self.colunas[nome][posicao] = valor
+
+    def _tornar_editavel(self) -> None:
+        # Colunas abertas de um arquivo são memoryviews somente leitura: copia-as para arrays.
+        if self._mapa is not None:
+            colunas = {}
+            for nome, tipo in CatalogoColunar.COLUNAS:
+                colunas[nome] = array(tipo, self.colunas[nome].tobytes())
+                self.colunas[nome].release()
+            self.colunas = colunas
+            self._mapa.close()
+            self._mapa = None
+        if self._posicoes is None:
+            self._posicoes = {cod: posicao for posicao, cod in enumerate(self.colunas['cod'])}
+
+    def atualizar(self) -> int:
+        """
+        Aplica as alterações feitas no banco desde a última carga ou atualização,
+        relendo apenas os produtos alterados. Retorna quantos produtos foram relidos.
+        """
+        self._tornar_editavel()
+        conn = BancoDeDados.conectar()
+        try:
+            conn.execute('BEGIN')
+            movimento, alteracao = CatalogoColunar._marcadores(conn)
+            codigos = [linha[0] for linha in conn.execute(
+                '''SELECT cod_estoque FROM movimento_estoque WHERE id > ?
+                   UNION SELECT cod FROM alteracao_produto WHERE seq > ?''',
+                (self.ultimo_movimento, self.ultima_alteracao))]
+            for inicio in range(0, len(codigos), 500):
+                bloco = codigos[inicio:inicio + 500]
+                encontrados = set()
+                for linha in conn.execute(
+                        f"{CatalogoColunar.CONSULTA} WHERE p.cod IN ({', '.join('?' * len(bloco))})", bloco):
+                    self._gravar_linha(*linha)
+                    encontrados.add(linha[0])
+                for cod in bloco:
+                    posicao = self._posicoes.get(cod)
+                    if cod not in encontrados and posicao is not None:
+                        self.colunas['ativo'][posicao] = 0
+            self.ultimo_movimento, self.ultima_alteracao = movimento, alteracao
+        finally:
+            BancoDeDados.liberar(conn)
+        return len(codigos)
+
+    def _vetores(self) -> dict:
+        # Visões NumPy sem cópia; não devem sobreviver à consulta, pois travam o redimensionamento dos arrays.
+        return {nome: numpy.frombuffer(self.colunas[nome], dtype=CatalogoColunar.TIPOS_NUMPY[tipo])
+                for nome, tipo in CatalogoColunar.COLUNAS}
+
+    def _condicoes(self, categoria: str, cod_admin: int, preco_minimo: float, preco_maximo: float,
+                   estoque_minimo: int, estoque_maximo: int) -> list:
+        condicoes = []
+        if categoria is not None:
+            condicoes.append(('categoria', '==', self._codigos_categoria.get(categoria, -2)))
+        if cod_admin is not None:
+            condicoes.append(('cod_admin', '==', cod_admin))
+        for coluna, minimo, maximo in (('preco', preco_minimo, preco_maximo),
+                                       ('quantidade', estoque_minimo, estoque_maximo)):
+            if minimo is not None:
+                condicoes.append((coluna, '>=', minimo))
+            if maximo is not None:
+                condicoes.append((coluna, '<=', maximo))
+        return condicoes
+
+    def _selecionar(self, vetores: dict = None, **filtros):
+        """
+        Retorna as posições dos produtos ativos que atendem aos filtros
+        (máscara booleana com NumPy, lista de posições sem ele).
+        """
+        condicoes = self._condicoes(**filtros)
+        if vetores is not None:
+            mascara = vetores['ativo'] == 1
+            for coluna, operador, valor in condicoes:
+                vetor = vetores[coluna]
+                mascara &= (vetor == valor) if operador == '==' else (
+                    (vetor >= valor) if operador == '>=' else (vetor <= valor))
+            return mascara
+        posicoes = [posicao for posicao, ativo in enumerate(self.colunas['ativo']) if ativo]
+        for coluna, operador, valor in condicoes:
+            vetor = self.colunas[coluna]
+            if operador == '==':
+                posicoes = [posicao for posicao in posicoes if vetor[posicao] == valor]
+            elif operador == '>=':
+                posicoes = [posicao for posicao in posicoes if vetor[posicao] >= valor]
+            else:
+                posicoes = [posicao for posicao in posicoes if vetor[posicao] <= valor]
+        return posicoes
+
+    def filtrar(self, categoria: str = None, cod_admin: int = None, preco_minimo: float = None,
+                preco_maximo: float = None, estoque_minimo: int = None, estoque_maximo: int = None) -> list:
+        """
+        Retorna os códigos dos produtos que atendem a todos os filtros (limites inclusivos).
+        """
+        filtros = dict(categoria=categoria, cod_admin=cod_admin, preco_minimo=preco_minimo,
+                       preco_maximo=preco_maximo, estoque_minimo=estoque_minimo, estoque_maximo=estoque_maximo)
+        if self.usar_numpy:
+            vetores = self._vetores()
+            return vetores['cod'][self._selecionar(vetores, **filtros)].tolist()
+        codigos = self.colunas['cod']
+        return [codigos[posicao] for posicao in self._selecionar(**filtros)]
+
+    def agregar(self, por: str = 'categoria', **filtros) -> dict:
+        """
+        Agrupa os produtos filtrados por 'categoria' ou 'cod_admin' e retorna
+        {chave: (produtos, unidades, valor em estoque)}.
+        """
+        if por not in ('categoria', 'cod_admin'):
+            raise ValueError(f"agrupamento desconhecido: {por}")
+        filtros = dict(dict.fromkeys(('categoria', 'cod_admin', 'preco_minimo', 'preco_maximo',
+                                      'estoque_minimo', 'estoque_maximo')), **filtros)
+        grupos = {}
+        if self.usar_numpy:
+            vetores = self._vetores()
+            mascara = self._selecionar(vetores, **filtros)
+            chaves, inverso = numpy.unique(vetores[por][mascara], return_inverse=True)
+            quantidades = vetores['quantidade'][mascara]
+            produtos = numpy.bincount(inverso, minlength=len(chaves))
+            unidades = numpy.bincount(inverso, weights=quantidades, minlength=len(chaves))
+            valores = numpy.bincount(inverso, weights=quantidades * vetores['preco'][mascara],
+                                     minlength=len(chaves))
+            for chave, total, soma, valor in zip(chaves.tolist(), produtos.tolist(),
+                                                 unidades.tolist(), valores.tolist()):
+                grupos[chave] = (total, int(soma), valor)
+        else:
+            coluna, quantidades, precos = self.colunas[por], self.colunas['quantidade'], self.colunas['preco']
+            for posicao in self._selecionar(**filtros):
+                total, soma, valor = grupos.get(coluna[posicao], (0, 0, 0.0))
+                grupos[coluna[posicao]] = (total + 1, soma + quantidades[posicao],
+                                           valor + quantidades[posicao] * precos[posicao])
+        if por == 'categoria':
+            return {(self.categorias[chave] if chave != CatalogoColunar.NENHUM else None): dados
+                    for chave, dados in grupos.items()}
+        return {(chave if chave != CatalogoColunar.NENHUM else None): dados for chave, dados in grupos.items()}
+
+    def top_k(self, k: int, por: str = 'valor', crescente: bool = False, **filtros) -> list:
+        """
+        Retorna até k pares (código, medida) com as maiores medidas (ou as menores, se crescente),
+        em que a medida é 'valor' (preço × quantidade), 'preco' ou 'quantidade'.
+        """
+        if por not in ('valor', 'preco', 'quantidade'):
+            raise ValueError(f"medida desconhecida: {por}")
+        filtros = dict(dict.fromkeys(('categoria', 'cod_admin', 'preco_minimo', 'preco_maximo',
+                                      'estoque_minimo', 'estoque_maximo')), **filtros)
+        if self.usar_numpy:
+            vetores = self._vetores()
+            mascara = self._selecionar(vetores, **filtros)
+            medidas = (vetores['preco'][mascara] * vetores['quantidade'][mascara] if por == 'valor'
+                       else vetores[por][mascara].astype('float64'))
+            codigos = vetores['cod'][mascara]
+            k = min(k, len(medidas))
+            if k <= 0:
+                return []
+            chaves = medidas if crescente else -medidas
+            escolhidos = numpy.argpartition(chaves, k - 1)[:k]
+            escolhidos = escolhidos[numpy.argsort(chaves[escolhidos], kind='stable')]
+            return list(zip(codigos[escolhidos].tolist(), medidas[escolhidos].tolist()))
+        codigos, precos, quantidades = self.colunas['cod'], self.colunas['preco'], self.colunas['quantidade']
+        if por == 'valor':
+            medida = lambda posicao: precos[posicao] * quantidades[posicao]
+        else:
+            medida = lambda posicao, coluna=self.colunas[por]: float(coluna[posicao])
+        selecionar = heapq.nsmallest if crescente else heapq.nlargest
+        return [(codigos[posicao], medida(posicao))
+                for posicao in selecionar(k, self._selecionar(**filtros), key=medida)]
+
+    def gravar(self, caminho: str) -> None:
+        """
+        Grava a cópia num arquivo binário (cabeçalho JSON seguido das colunas alinhadas
+        em 8 bytes), descartando os produtos removidos. A substituição do arquivo é atômica.
+        """
+        ativos = [posicao for posicao, ativo in enumerate(self.colunas['ativo']) if ativo]
+        colunas = {nome: array(tipo, (self.colunas[nome][posicao] for posicao in ativos))
+                   for nome, tipo in CatalogoColunar.COLUNAS}
+        cabecalho = {'linhas': len(ativos), 'categorias': self.categorias,
+                     'ultimo_movimento': self.ultimo_movimento, 'ultima_alteracao': self.ultima_alteracao,
+                     'colunas': [nome for nome, _ in CatalogoColunar.COLUNAS]}
+        dados = json.dumps(cabecalho).encode('utf-8')
+        dados += b'\0' * (-(len(dados) + 16) % 8)
+        temporario = f'{caminho}.tmp'
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(CatalogoColunar.ASSINATURA + struct.pack('<Q', len(dados)) + dados)
+            for nome, _ in CatalogoColunar.COLUNAS:
+                conteudo = colunas[nome].tobytes()
+                arquivo.write(conteudo + b'\0' * (-len(conteudo) % 8))
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def abrir(cls, caminho: str, usar_numpy: bool = None) -> 'CatalogoColunar':
+        """
+        Abre uma cópia gravada por gravar() mapeando o arquivo em memória: as colunas
+        são lidas diretamente das páginas do arquivo, sem cópia nem conversão.
+        """
+        catalogo = cls(usar_numpy)
+        with open(caminho, 'rb') as arquivo:
+            catalogo._mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        visao = memoryview(catalogo._mapa)
+        if bytes(visao[:8]) != CatalogoColunar.ASSINATURA:
+            visao.release()
+            catalogo._mapa.close()
+            raise ValueError(f"{caminho} não é uma cópia colunar do catálogo")
+        tamanho = struct.unpack('<Q', visao[8:16])[0]
+        cabecalho = json.loads(bytes(visao[16:16 + tamanho]).decode('utf-8').rstrip('\0'))
+        catalogo.categorias = cabecalho['categorias']
+        catalogo._codigos_categoria = {nome: codigo for codigo, nome in enumerate(catalogo.categorias)}
+        catalogo.ultimo_movimento = cabecalho['ultimo_movimento']
+        catalogo.ultima_alteracao = cabecalho['ultima_alteracao']
+        deslocamento, linhas = 16 + tamanho, cabecalho['linhas']
+        for nome, tipo in CatalogoColunar.COLUNAS:
+            bytes_coluna = linhas * array(tipo).itemsize
+            catalogo.colunas[nome] = visao[deslocamento:deslocamento + bytes_coluna].cast(tipo)
+            deslocamento += bytes_coluna + (-bytes_coluna % 8)
+        visao.release()
+        return catalogo
+
+    def fechar(self) -> None:
+        """
+        Libera o arquivo mapeado em memória, se houver.
+        """
+        if self._mapa is not None:
+            for coluna in self.colunas.values():
+                coluna.release()
+            self.colunas = {nome: array(tipo) for nome, tipo in CatalogoColunar.COLUNAS}
+            self._mapa.close()
+            self._mapa = None
+
+
+def main(argumentos: list = None) -> int:
+    """
+    Ponto de entrada da linha de comando.
+    """
+    parser = argparse.ArgumentParser(description="Cópia colunar do catálogo do PharmAnalytics.")
+    parser.add_argument('acao', choices=('gravar', 'atualizar', 'consultar'))
+    parser.add_argument('arquivo')
+    parser.add_argument('--categoria')
+    parser.add_argument('--admin', type=int)
+    parser.add_argument('--preco-minimo', type=float)
+    parser.add_argument('--preco-maximo', type=float)
+    parser.add_argument('--estoque-minimo', type=int)
+    parser.add_argument('--estoque-maximo', type=int)
+    parser.add_argument('--top', type=int, help="mostra os K produtos de maior medida")
+    parser.add_argument('--por', choices=('valor', 'preco', 'quantidade'), default='valor')
+    parser.add_argument('--banco', default=BancoDeDados.NOME_DB)
+    args = parser.parse_args(argumentos)
+
+    BancoDeDados.NOME_DB = args.banco
+    try:
+        if args.acao == 'gravar':
+            BancoDeDados.criar_tabelas()
+            catalogo = CatalogoColunar.carregar()
+            catalogo.gravar(args.arquivo)
+            print(f"{len(catalogo)} produto(s) gravado(s) em {args.arquivo}")
+        elif args.acao == 'atualizar':
+            BancoDeDados.criar_tabelas()
+            catalogo = CatalogoColunar.abrir(args.arquivo)
+            alterados = catalogo.atualizar()
+            catalogo.gravar(args.arquivo)
+            print(f"{alterados} produto(s) atualizado(s) em {args.arquivo}")
+        else:
+            catalogo = CatalogoColunar.abrir(args.arquivo)
+            filtros = dict(categoria=args.categoria, cod_admin=args.admin,
+                           preco_minimo=args.preco_minimo, preco_maximo=args.preco_maximo,
+                           estoque_minimo=args.estoque_minimo, estoque_maximo=args.estoque_maximo)
+            if args.top:
+                for cod, medida in catalogo.top_k(args.top, args.por, **filtros):
+                    print(f"{cod}\t{medida:.2f}")
+            else:
+                for cod in catalogo.filtrar(**filtros):
+                    print(cod)
+            catalogo.fechar()
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Erro na cópia colunar: {e}")
+        return 1
+    finally:
+        BancoDeDados.fechar_conexoes()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
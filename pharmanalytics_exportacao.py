@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Exportação contínua dos dados do PharmAnalytics.
+Percorre o banco em blocos (fetchmany) e grava CSV ou JSONL, opcionalmente
+compactado com gzip, usando memória constante independentemente do tamanho das tabelas.
+
+Uso: python pharmanalytics_exportacao.py {produtos,farmacias} ARQUIVO [filtros] [--particoes N]
+"""
+
+import argparse
+import csv
+import gzip
+import heapq
+import json
+import sqlite3
+import sys
+
+from pharmanalytics_reformulado import BancoDeDados, OperacoesFarmacia, RoteadorFarmacias
+
+
+class ExportadorDados:
+    """
+    Gera e grava as linhas de exportação de produtos e farmácias.
+    """
+
+    CAMPOS_PRODUTO = ('cod', 'nome', 'categoria', 'preco', 'quantidade', 'cod_admin')
+    CAMPOS_FARMACIA = ('cod', 'nome', 'telefones', 'rua', 'num', 'bairro', 'cep',
+                       'hora_inicio', 'hora_fim', 'dia_funcionamento', 'cod_admin')
+    # Linhas lidas do banco por vez.
+    TAMANHO_BLOCO = 1000
+
+    @staticmethod
+    def _percorrer(consulta: str, parametros: list, campos: tuple, banco: str = None):
+        # Só a obtenção da conexão fica no bloco: o gerador é suspenso entre os blocos de linhas.
+        # Partições (banco informado) são lidas direto, pois a réplica cobre só o banco principal.
+        with BancoDeDados.usando(banco) if banco is not None else BancoDeDados.leitura():
+            conn = BancoDeDados.conectar()
+        try:
+            cursor = conn.execute(consulta, parametros)
+            while True:
+                linhas = cursor.fetchmany(ExportadorDados.TAMANHO_BLOCO)
+                if not linhas:
+                    break
+                for linha in linhas:
+                    yield dict(zip(campos, linha))
+        finally:
+            BancoDeDados.liberar(conn)
+
+    @staticmethod
+    def produtos(categoria: str = None, estoque_minimo: int = None,
+                 estoque_maximo: int = None, cod_admin: int = None):
+        """
+        Gera os produtos com categoria e quantidade em estoque, em ordem de código,
+        aplicando os filtros informados.
+        """
+        filtros, parametros = [], []
+        if categoria is not None:
+            filtros.append('c.categoria = ?')
+            parametros.append(categoria)
+        if estoque_minimo is not None:
+            filtros.append('e.quantidade >= ?')
+            parametros.append(estoque_minimo)
+        if estoque_maximo is not None:
+            filtros.append('e.quantidade <= ?')
+            parametros.append(estoque_maximo)
+        if cod_admin is not None:
+            filtros.append('p.cod_admin = ?')
+            parametros.append(cod_admin)
+        where = f"WHERE {' AND '.join(filtros)}" if filtros else ''
+        return ExportadorDados._percorrer(
+            f'''SELECT p.cod, p.nome, c.categoria, p.preco, e.quantidade, p.cod_admin
+                FROM produto p
+                LEFT JOIN categoria_produto c ON c.cod_produto = p.cod
+                LEFT JOIN estoque e ON e.cod = p.cod_estoque
+                {where}
+                ORDER BY p.cod''',
+            parametros, ExportadorDados.CAMPOS_PRODUTO
+        )
+
+    @staticmethod
+    def farmacias(cod_admin: int = None):
+        """
+        Gera as farmácias em ordem de código, com os telefones separados por ';'.
+        Com as farmácias particionadas, as partições são percorridas juntas e intercaladas pelo código.
+        """
+        where, parametros = ('WHERE f.cod_admin = ?', [cod_admin]) if cod_admin is not None else ('', [])
+        consulta = (
+            f'''SELECT f.cod, f.nome,
+                       (SELECT group_concat(t.numero, ';') FROM tel_farmacia t
+                        WHERE t.cod_farmacia = f.cod),
+                       f.rua, f.num, f.bairro, f.cep, f.hora_inicio, f.hora_fim,
+                       f.dia_funcionamento, f.cod_admin
+                FROM farmacia f
+                {where}
+                ORDER BY f.cod'''
+        )
+        roteador = OperacoesFarmacia.roteador
+        if roteador is None:
+            return ExportadorDados._percorrer(consulta, parametros, ExportadorDados.CAMPOS_FARMACIA)
+        return heapq.merge(*(ExportadorDados._percorrer(consulta, parametros, ExportadorDados.CAMPOS_FARMACIA, banco)
+                             for banco in roteador.bancos), key=lambda farmacia: farmacia['cod'])
+
+    @staticmethod
+    def gravar(linhas, caminho: str, campos: tuple, formato: str = None, compactar: bool = None) -> int:
+        """
+        Grava as linhas no arquivo em CSV ou JSONL e retorna quantas foram gravadas.
+        Formato e compactação são deduzidos da extensão (.csv, .jsonl, .gz) quando não informados.
+        """
+        if compactar is None:
+            compactar = caminho.lower().endswith('.gz')
+        base = caminho.lower()[:-3] if caminho.lower().endswith('.gz') else caminho.lower()
+        formato = formato or ('csv' if base.endswith('.csv') else 'jsonl')
+        abrir = gzip.open if compactar else open
+        total = 0
+        with abrir(caminho, 'wt', encoding='utf-8', newline='') as arquivo:
+            if formato == 'csv':
+                escritor = csv.DictWriter(arquivo, fieldnames=campos)
+                escritor.writeheader()
+                for linha in linhas:
+                    escritor.writerow(linha)
+                    total += 1
+            else:
+                for linha in linhas:
+                    arquivo.write(json.dumps(linha, ensure_ascii=False) + '\n')
+                    total += 1
+        return total
+
+
+def main(argumentos: list = None) -> int:
+    """
+    Ponto de entrada da linha de comando.
+    """
+    parser = argparse.ArgumentParser(description="Exportação dos dados do PharmAnalytics.")
+    parser.add_argument('tipo', choices=('produtos', 'farmacias'))
+    parser.add_argument('arquivo', help="destino (.csv, .jsonl, com .gz opcional)")
+    parser.add_argument('--formato', choices=('csv', 'jsonl'))
+    parser.add_argument('--gzip', action='store_true', default=None, help="compacta a saída")
+    parser.add_argument('--categoria')
+    parser.add_argument('--estoque-minimo', type=int)
+    parser.add_argument('--estoque-maximo', type=int)
+    parser.add_argument('--admin', type=int, help="CPF do administrador responsável")
+    parser.add_argument('--particoes', type=int, help="farmácias distribuídas entre N bancos")
+    parser.add_argument('--banco', default=BancoDeDados.NOME_DB)
+    args = parser.parse_args(argumentos)
+
+    BancoDeDados.NOME_DB = args.banco
+    BancoDeDados.criar_tabelas()
+    if args.particoes:
+        OperacoesFarmacia.roteador = RoteadorFarmacias(RoteadorFarmacias.nomes_particoes(args.banco, args.particoes))
+        OperacoesFarmacia.roteador.criar_tabelas()
+    try:
+        if args.tipo == 'produtos':
+            linhas = ExportadorDados.produtos(args.categoria, args.estoque_minimo,
+                                              args.estoque_maximo, args.admin)
+            campos = ExportadorDados.CAMPOS_PRODUTO
+        else:
+            linhas = ExportadorDados.farmacias(args.admin)
+            campos = ExportadorDados.CAMPOS_FARMACIA
+        total = ExportadorDados.gravar(linhas, args.arquivo, campos, args.formato, args.gzip)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Erro ao exportar {args.tipo}: {e}")
+        return 1
+    finally:
+        if args.particoes:
+            OperacoesFarmacia.roteador.encerrar()
+            OperacoesFarmacia.roteador = None
+        BancoDeDados.fechar_conexoes()
+    print(f"{total} registro(s) exportado(s) para {args.arquivo}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
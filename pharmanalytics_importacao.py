@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Importação em lote do catálogo do PharmAnalytics.
+Lê arquivos CSV ou JSONL de produtos ou farmácias de forma contínua e grava os
+registros válidos em transações por lote, informando as linhas rejeitadas.
+
+Uso: python pharmanalytics_importacao.py {produtos,farmacias} ARQUIVO --admin CPF [--upsert] [--particoes N]
+"""
+
+import argparse
+import csv
+import json
+import math
+import sqlite3
+import sys
+
+from pharmanalytics_reformulado import (
+    BancoDeDados, OperacoesFarmacia, OperacoesMovimentos, OperacoesProdutos, RoteadorFarmacias
+)
+
+
+class ImportadorCatalogo:
+    """
+    Importa produtos (produto, categoria_produto e estoque) ou farmácias
+    (farmacia e tel_farmacia) a partir de arquivos CSV ou JSONL.
+    Sem upsert, códigos já existentes são rejeitados; com upsert, são atualizados.
+    Com as farmácias particionadas (OperacoesFarmacia.roteador), cada lote é dividido entre
+    as partições e gravado numa transação por partição.
+    """
+
+    CAMPOS_PRODUTO = ('cod', 'nome', 'categoria', 'preco', 'quantidade')
+    CAMPOS_FARMACIA = ('cod', 'nome', 'telefone', 'rua', 'num', 'bairro', 'cep',
+                       'hora_inicio', 'hora_fim', 'dia_funcionamento')
+
+    def __init__(self, cod_admin: int, upsert: bool = False, tamanho_lote: int = 5000) -> None:
+        self.cod_admin = cod_admin
+        self.upsert = upsert
+        self.tamanho_lote = tamanho_lote
+
+    @staticmethod
+    def ler_registros(caminho: str, formato: str = None):
+        """
+        Gera pares (número da linha, registro) lidos do arquivo, um de cada vez.
+        O formato (csv ou jsonl) é deduzido da extensão quando não informado.
+        Linhas JSONL inválidas geram o registro None.
+        """
+        formato = formato or ('csv' if caminho.lower().endswith('.csv') else 'jsonl')
+        with open(caminho, encoding='utf-8', newline='') as arquivo:
+            if formato == 'csv':
+                for numero, registro in enumerate(csv.DictReader(arquivo), start=2):
+                    yield numero, registro
+            else:
+                for numero, linha in enumerate(arquivo, start=1):
+                    if not linha.strip():
+                        continue
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError:
+                        registro = None
+                    yield numero, registro if isinstance(registro, dict) else None
+
+    @staticmethod
+    def _texto(registro: dict, campo: str) -> str:
+        valor = registro.get(campo)
+        if valor is None or str(valor).strip() == '':
+            raise ValueError(f"campo '{campo}' ausente")
+        return str(valor).strip()
+
+    @staticmethod
+    def validar_produto(registro: dict) -> tuple:
+        """
+        Valida e converte um registro de produto em (cod, nome, categoria, preco, quantidade).
+        Lança ValueError com o motivo quando o registro é inválido.
+        """
+        texto = ImportadorCatalogo._texto
+        codigo = int(texto(registro, 'cod'))
+        preco = float(texto(registro, 'preco'))
+        quantidade = int(texto(registro, 'quantidade'))
+        if not math.isfinite(preco):
+            raise ValueError("preço inválido")
+        if preco < 0 or quantidade < 0:
+            raise ValueError("preço e quantidade não podem ser negativos")
+        return codigo, texto(registro, 'nome'), texto(registro, 'categoria'), preco, quantidade
+
+    @staticmethod
+    def validar_farmacia(registro: dict) -> tuple:
+        """
+        Valida e converte um registro de farmácia na tupla dos CAMPOS_FARMACIA.
+        Lança ValueError com o motivo quando o registro é inválido.
+        """
+        texto = ImportadorCatalogo._texto
+        valores = [texto(registro, campo) for campo in ImportadorCatalogo.CAMPOS_FARMACIA]
+        valores[0] = int(valores[0])
+        valores[4] = int(valores[4])
+        return tuple(valores)
+
+    def importar_produtos(self, caminho: str, formato: str = None) -> dict:
+        """
+        Importa os produtos do arquivo e retorna o resumo da importação.
+        """
+        return self._importar(caminho, formato, ImportadorCatalogo.validar_produto,
+                              'produto', self._gravar_produtos)
+
+    def importar_farmacias(self, caminho: str, formato: str = None) -> dict:
+        """
+        Importa as farmácias do arquivo e retorna o resumo da importação.
+        """
+        return self._importar(caminho, formato, ImportadorCatalogo.validar_farmacia,
+                              'farmacia', self._gravar_farmacias)
+
+    def _importar(self, caminho: str, formato: str, validar, tabela: str, gravar) -> dict:
+        resumo = {'inseridos': 0, 'atualizados': 0, 'rejeitados': []}
+        lote = {}
+        for numero, registro in ImportadorCatalogo.ler_registros(caminho, formato):
+            try:
+                if registro is None:
+                    raise ValueError("linha mal formada")
+                linha = validar(registro)
+            except ValueError as e:
+                resumo['rejeitados'].append((numero, str(e)))
+                continue
+            if linha[0] in lote:
+                if not self.upsert:
+                    resumo['rejeitados'].append((numero, "código repetido no arquivo"))
+                    continue
+                del lote[linha[0]]
+            lote[linha[0]] = (numero, linha)
+            if len(lote) >= self.tamanho_lote:
+                self._gravar_lote(lote, tabela, gravar, resumo)
+                lote = {}
+        if lote:
+            self._gravar_lote(lote, tabela, gravar, resumo)
+        resumo['rejeitados'].sort()
+        return resumo
+
+    def _gravar_lote(self, lote: dict, tabela: str, gravar, resumo: dict) -> None:
+        roteador = OperacoesFarmacia.roteador
+        if tabela != 'farmacia' or roteador is None:
+            self._gravar_particao(lote, tabela, gravar, resumo)
+            return
+        particoes = {}
+        for codigo, registro in lote.items():
+            particoes.setdefault(roteador.banco(codigo), {})[codigo] = registro
+        for banco, parte in particoes.items():
+            with BancoDeDados.usando(banco):
+                self._gravar_particao(parte, tabela, gravar, resumo)
+
+    def _gravar_particao(self, lote: dict, tabela: str, gravar, resumo: dict) -> None:
+        with BancoDeDados.transacao() as conn:
+            existentes = set()
+            codigos = list(lote)
+            # Consulta em blocos para respeitar o limite de parâmetros do SQLite.
+            for inicio in range(0, len(codigos), 500):
+                bloco = codigos[inicio:inicio + 500]
+                marcadores = ', '.join('?' * len(bloco))
+                existentes.update(linha[0] for linha in conn.execute(
+                    f'SELECT cod FROM {tabela} WHERE cod IN ({marcadores})', bloco))
+            linhas = []
+            for codigo, (numero, linha) in lote.items():
+                if codigo in existentes and not self.upsert:
+                    resumo['rejeitados'].append((numero, "código já cadastrado"))
+                else:
+                    linhas.append(linha)
+            gravar(conn, linhas)
+            BancoDeDados.apos_confirmar(OperacoesProdutos.cache.limpar)
+        atualizados = len(existentes) if self.upsert else 0
+        resumo['atualizados'] += atualizados
+        resumo['inseridos'] += len(linhas) - atualizados
+
+    def _gravar_produtos(self, conn: sqlite3.Connection, linhas: list) -> None:
+        conn.executemany(
+            '''INSERT INTO produto (cod, nome, preco, cod_admin, cod_estoque)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (cod) DO UPDATE SET nome = excluded.nome, preco = excluded.preco''',
+            ((cod, nome, preco, self.cod_admin, cod) for cod, nome, _, preco, _ in linhas)
+        )
+        if self.upsert:
+            conn.executemany('DELETE FROM categoria_produto WHERE cod_produto = ?',
+                             ((linha[0],) for linha in linhas))
+        conn.executemany(
+            'INSERT INTO categoria_produto (categoria, cod_produto) VALUES (?, ?)',
+            ((categoria, cod) for cod, _, categoria, _, _ in linhas)
+        )
+        with OperacoesMovimentos.contexto(conn, OperacoesMovimentos.IMPORTACAO, self.cod_admin):
+            conn.executemany(
+                '''INSERT INTO estoque (cod, quantidade) VALUES (?, ?)
+                   ON CONFLICT (cod) DO UPDATE SET quantidade = excluded.quantidade''',
+                ((cod, quantidade) for cod, _, _, _, quantidade in linhas)
+            )
+
+    def _gravar_farmacias(self, conn: sqlite3.Connection, linhas: list) -> None:
+        conn.executemany(
+            '''INSERT INTO farmacia (cod, nome, rua, num, bairro, cep,
+               hora_inicio, hora_fim, dia_funcionamento, cod_admin)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (cod) DO UPDATE SET nome = excluded.nome, rua = excluded.rua,
+               num = excluded.num, bairro = excluded.bairro, cep = excluded.cep,
+               hora_inicio = excluded.hora_inicio, hora_fim = excluded.hora_fim,
+               dia_funcionamento = excluded.dia_funcionamento''',
+            ((cod, nome, rua, num, bairro, cep, inicio, fim, dias, self.cod_admin)
+             for cod, nome, _, rua, num, bairro, cep, inicio, fim, dias in linhas)
+        )
+        if self.upsert:
+            conn.executemany('DELETE FROM tel_farmacia WHERE cod_farmacia = ?',
+                             ((linha[0],) for linha in linhas))
+        conn.executemany(
+            'INSERT INTO tel_farmacia (numero, cod_farmacia) VALUES (?, ?)',
+            ((telefone, cod) for cod, _, telefone, *_ in linhas)
+        )
+        for cod, _, _, rua, _, bairro, cep, *_ in linhas:
+            OperacoesFarmacia.indexar_localidade(conn, cod, rua, bairro, cep)
+
+
+def main(argumentos: list = None) -> int:
+    """
+    Ponto de entrada da linha de comando.
+    """
+    parser = argparse.ArgumentParser(description="Importação em lote do catálogo do PharmAnalytics.")
+    parser.add_argument('tipo', choices=('produtos', 'farmacias'))
+    parser.add_argument('arquivo')
+    parser.add_argument('--admin', type=int, required=True, help="CPF do administrador responsável")
+    parser.add_argument('--formato', choices=('csv', 'jsonl'))
+    parser.add_argument('--upsert', action='store_true', help="atualiza os códigos já cadastrados")
+    parser.add_argument('--lote', type=int, default=5000, help="registros por transação")
+    parser.add_argument('--particoes', type=int, help="farmácias distribuídas entre N bancos")
+    parser.add_argument('--banco', default=BancoDeDados.NOME_DB)
+    args = parser.parse_args(argumentos)
+
+    BancoDeDados.NOME_DB = args.banco
+    roteador = None
+    try:
+        BancoDeDados.criar_tabelas()
+        conn = BancoDeDados.conectar()
+        if conn.execute('SELECT 1 FROM administrador WHERE cod_pessoa = ?', (args.admin,)).fetchone() is None:
+            print("Administrador não encontrado.")
+            return 1
+        if args.particoes:
+            roteador = RoteadorFarmacias(RoteadorFarmacias.nomes_particoes(args.banco, args.particoes))
+            OperacoesFarmacia.roteador = roteador
+            roteador.criar_tabelas()
+        importador = ImportadorCatalogo(args.admin, upsert=args.upsert, tamanho_lote=args.lote)
+        if args.tipo == 'produtos':
+            resumo = importador.importar_produtos(args.arquivo, args.formato)
+        else:
+            resumo = importador.importar_farmacias(args.arquivo, args.formato)
+    except (OSError, UnicodeDecodeError, csv.Error, sqlite3.Error) as e:
+        # Os lotes anteriores ao erro já foram gravados.
+        print(f"Erro ao importar {args.tipo}: {e}")
+        return 1
+    finally:
+        if roteador is not None:
+            roteador.encerrar()
+            OperacoesFarmacia.roteador = None
+        BancoDeDados.fechar_conexoes()
+    for numero, motivo in resumo['rejeitados']:
+        print(f"Linha {numero} rejeitada: {motivo}")
+    print(f"Inseridos: {resumo['inseridos']} - Atualizados: {resumo['atualizados']} - "
+          f"Rejeitados: {len(resumo['rejeitados'])}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Modo em lote do PharmAnalytics.
+Executa uma sequência de operações lida de um arquivo JSONL (ou da entrada padrão), uma
+por linha, sem os prompts do menu: todas usam a mesma conexão e são agrupadas em
+transações de até N operações, cada uma isolada num SAVEPOINT para que uma falha não
+desfaça as demais. Para cada operação é emitida uma linha JSON com o resultado.
+
+Exemplo de entrada:
+    {"op": "usuario", "cpf": 123, "telefone": "1199"}
+    {"op": "produto", "cod": 1, "nome": "Dipirona", "categoria": "Analgésico", "preco": 5.0, "quantidade": 10}
+    {"op": "venda", "itens": [{"produto": 1, "quantidade": 2}]}
+    {"op": "buscar", "q": "dipi"}
+
+Uso: python pharmanalytics_lote.py OPERACOES.jsonl --admin CPF [--transacao N] [--saida RESULTADOS.jsonl]
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+
+from pharmanalytics_reformulado import BancoDeDados, OperacoesFarmacia, OperacoesProdutos, OperacoesUsuario
+
+
+class ExecutorLote:
+    """
+    Executa operações descritas por dicionários ({"op": ..., campos}) em transações agrupadas.
+    Os resultados de um grupo só são entregues depois que ele é confirmado no disco. Consultas
+    feitas dentro do grupo leem o banco direto, sem passar pelo cache de produtos.
+    """
+
+    CAMPOS_PRODUTO = ('cod', 'nome', 'categoria', 'preco', 'quantidade')
+    CAMPOS_FARMACIA = ('cod', 'nome', 'telefone', 'rua', 'num', 'bairro', 'cep',
+                       'hora_inicio', 'hora_fim', 'dia_funcionamento')
+
+    def __init__(self, cod_admin: int, tamanho_transacao: int = 1000) -> None:
+        if tamanho_transacao < 1:
+            raise ValueError("O tamanho da transação deve ser positivo.")
+        self.cod_admin = cod_admin
+        self.tamanho_transacao = tamanho_transacao
+        self.operacoes = {
+            'usuario': self._usuario,
+            'produto': self._produto,
+            'atualizar_produto': self._atualizar_produto,
+            'remover_produto': self._remover_produto,
+            'consultar_produto': self._consultar_produto,
+            'buscar': self._buscar,
+            'venda': self._venda,
+            'farmacia': self._farmacia,
+            'atualizar_farmacia': self._atualizar_farmacia,
+            'remover_farmacia': self._remover_farmacia,
+        }
+
+    @staticmethod
+    def _produto_dict(produto: tuple) -> dict:
+        return dict(zip(ExecutorLote.CAMPOS_PRODUTO, produto))
+
+    @staticmethod
+    def _encontrado(alterado: bool, mensagem: str) -> dict:
+        if not alterado:
+            raise LookupError(mensagem)
+        return {}
+
+    def _usuario(self, dados: dict) -> dict:
+        OperacoesUsuario.registrar_usuario(int(dados['cpf']), str(dados['telefone']))
+        return {}
+
+    def _produto(self, dados: dict) -> dict:
+        OperacoesProdutos.inserir_produto(int(dados['cod']), str(dados['nome']), str(dados['categoria']),
+                                          float(dados['preco']), int(dados['quantidade']), self.cod_admin)
+        return {}
+
+    def _atualizar_produto(self, dados: dict) -> dict:
+        return ExecutorLote._encontrado(OperacoesProdutos.alterar_produto(
+            int(dados['cod']), str(dados['nome']), str(dados['categoria']), float(dados['preco']),
+            int(dados['quantidade']), self.cod_admin), "Produto não encontrado.")
+
+    def _remover_produto(self, dados: dict) -> dict:
+        return ExecutorLote._encontrado(OperacoesProdutos.remover_produto(int(dados['cod']), self.cod_admin),
+                                        "Produto não encontrado.")
+
+    def _consultar_produto(self, dados: dict) -> dict:
+        produto = OperacoesProdutos.obter_produto(codigo=dados.get('cod'), nome=dados.get('nome'))
+        if produto is None:
+            raise LookupError("Produto não encontrado.")
+        return {'produto': ExecutorLote._produto_dict(produto)}
+
+    def _buscar(self, dados: dict) -> dict:
+        produtos = OperacoesProdutos.pesquisar_produtos(str(dados['q']), dados.get('limite'))
+        return {'produtos': [ExecutorLote._produto_dict(produto) for produto in produtos]}
+
+    def _venda(self, dados: dict) -> dict:
+        usuario, farmacia = dados.get('usuario'), dados.get('farmacia')
+        falhas = OperacoesProdutos.finalizar_venda(
+            [(item['produto'], int(item['quantidade'])) for item in dados['itens']],
+            None if usuario is None else int(usuario), None if farmacia is None else int(farmacia))
+        return {'confirmada': not falhas,
+                'falhas': [{'linha': linha, 'produto': produto, 'motivo': motivo}
+                           for linha, produto, motivo in falhas]}
+
+    def _farmacia(self, dados: dict) -> dict:
+        OperacoesFarmacia.registrar_farmacia(*self._campos_farmacia(dados), self.cod_admin)
+        return {}
+
+    def _atualizar_farmacia(self, dados: dict) -> dict:
+        return ExecutorLote._encontrado(OperacoesFarmacia.alterar_farmacia(*self._campos_farmacia(dados)),
+                                        "Farmácia não encontrada.")
+
+    def _remover_farmacia(self, dados: dict) -> dict:
+        return ExecutorLote._encontrado(OperacoesFarmacia.remover_farmacia(int(dados['cod'])),
+                                        "Farmácia não encontrada.")
+
+    @staticmethod
+    def _campos_farmacia(dados: dict) -> tuple:
+        return (int(dados['cod']), str(dados['nome']), str(dados['telefone']), str(dados['rua']),
+                int(dados['num']), str(dados['bairro']), str(dados['cep']), str(dados['hora_inicio']),
+                str(dados['hora_fim']), str(dados['dia_funcionamento']))
+
+    def _executar(self, numero: int, linha: str) -> dict:
+        resultado = {'linha': numero}
+        try:
+            dados = json.loads(linha)
+            if not isinstance(dados, dict):
+                raise ValueError("a linha deve ser um objeto JSON")
+            if 'id' in dados:
+                resultado['id'] = dados['id']
+            operacao = self.operacoes.get(dados.get('op'))
+            if operacao is None:
+                raise ValueError(f"operação desconhecida: {dados.get('op')}")
+            # Cada operação abre um SAVEPOINT dentro da transação do grupo.
+            resultado.update(operacao(dados))
+            resultado['ok'] = True
+        except sqlite3.IntegrityError as e:
+            resultado.update(ok=False, erro=f"conflito: {e}")
+        except KeyError as e:
+            resultado.update(ok=False, erro=f"campo ausente: {e}")
+        except (TypeError, ValueError, LookupError) as e:
+            resultado.update(ok=False, erro=str(e))
+        return resultado
+
+    def executar(self, linhas):
+        """
+        Executa as operações das linhas JSONL e produz um resultado por operação, em ordem.
+        Linhas em branco são ignoradas. Operações recusadas geram resultados com ok=False;
+        erros do banco interrompem o lote sem entregar os resultados do grupo desfeito.
+        """
+        grupo = []
+        linhas = iter(linhas)
+        numero = 0
+        while True:
+            try:
+                with BancoDeDados.transacao():
+                    for numero, linha in enumerate(linhas, numero + 1):
+                        if linha.strip():
+                            grupo.append(self._executar(numero, linha))
+                            if len(grupo) >= self.tamanho_transacao:
+                                break
+                    else:
+                        linhas = None
+            except BaseException:
+                # Leituras do grupo desfeito não podem sobreviver no cache de produtos.
+                OperacoesProdutos.cache.limpar()
+                raise
+            # Só depois da confirmação o grupo é entregue.
+            yield from grupo
+            grupo = []
+            if linhas is None:
+                return
+
+
+def main(argumentos: list = None) -> int:
+    """
+    Ponto de entrada da linha de comando.
+    """
+    parser = argparse.ArgumentParser(description="Modo em lote do PharmAnalytics.")
+    parser.add_argument('arquivo', help="operações em JSONL; '-' lê da entrada padrão")
+    parser.add_argument('--admin', type=int, required=True, help="CPF do administrador responsável")
+    parser.add_argument('--transacao', type=int, default=1000, help="operações por transação")
+    parser.add_argument('--saida', help="grava os resultados neste arquivo em vez da saída padrão")
+    parser.add_argument('--banco', default=BancoDeDados.NOME_DB)
+    args = parser.parse_args(argumentos)
+
+    BancoDeDados.NOME_DB = args.banco
+    entrada, saida = sys.stdin, sys.stdout
+    try:
+        BancoDeDados.criar_tabelas()
+        conn = BancoDeDados.conectar()
+        if conn.execute('SELECT 1 FROM administrador WHERE cod_pessoa = ?', (args.admin,)).fetchone() is None:
+            print("Administrador não encontrado.")
+            return 1
+        executor = ExecutorLote(args.admin, args.transacao)
+        if args.arquivo != '-':
+            entrada = open(args.arquivo, encoding='utf-8')
+        if args.saida:
+            saida = open(args.saida, 'w', encoding='utf-8')
+        for resultado in executor.executar(entrada):
+            saida.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+    except (OSError, sqlite3.Error) as e:
+        print(f"Erro ao executar o lote: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if entrada is not sys.stdin:
+            entrada.close()
+        if saida is not sys.stdout:
+            saida.close()
+        BancoDeDados.fechar_conexoes()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
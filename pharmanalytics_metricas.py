@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Instrumentação do PharmAnalytics: histogramas de latência por operação e por
+instrução SQL, registro de consultas lentas com o plano de execução e exportação
+das métricas em JSON ou no formato texto do Prometheus.
+
+Os histogramas usam faixas fixas, sem guardar amostras, para que a instrumentação
+possa ficar ligada em produção. Uso a partir do menu: PHARMANALYTICS_METRICAS=metricas.prom
+
+O trabalho de cada operação é medido em instruções da máquina virtual do SQLite (contadas
+pelo progress handler), não em linhas lidas: o módulo sqlite3 não expõe os contadores por
+instrução do SQLite (sqlite3_stmt_status), de onde viriam as linhas percorridas. As
+instruções da VM crescem com as linhas visitadas e servem para comparar operações entre si.
+"""
+
+import atexit
+import bisect
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import pharmanalytics_reformulado
+from pharmanalytics_reformulado import BancoDeDados
+
+
+class Histograma:
+    """
+    Histograma de durações com faixas fixas (em segundos), soma e contagem.
+    """
+
+    FAIXAS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+              0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+    def __init__(self) -> None:
+        self.contagens = [0] * (len(Histograma.FAIXAS) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def registrar(self, segundos: float) -> None:
+        """
+        Conta uma duração na faixa correspondente.
+        """
+        self.contagens[bisect.bisect_left(Histograma.FAIXAS, segundos)] += 1
+        self.soma += segundos
+        self.total += 1
+
+    def percentil(self, p: float) -> float:
+        """
+        Estima o percentil p (0 a 1) pelo limite superior da faixa que o contém.
+        """
+        alvo = p * self.total
+        acumulado = 0
+        for indice, contagem in enumerate(self.contagens):
+            acumulado += contagem
+            if contagem and acumulado >= alvo:
+                return Histograma.FAIXAS[indice] if indice < len(Histograma.FAIXAS) else float('inf')
+        return 0.0
+
+    def como_dict(self) -> dict:
+        """
+        Retorna o histograma serializável, com a média e os percentis estimados.
+        """
+        return {
+            'total': self.total,
+            'soma_s': self.soma,
+            'media_s': self.soma / self.total if self.total else 0.0,
+            'p50_s': self.percentil(0.50),
+            'p95_s': self.percentil(0.95),
+            'p99_s': self.percentil(0.99),
+            'faixas': dict(zip([str(f) for f in Histograma.FAIXAS] + ['+Inf'], self.contagens)),
+        }
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """
+    Cursor que mede cada instrução do execute/executemany até o fim da leitura dos resultados:
+    nos SELECTs o SQLite percorre as linhas durante os fetch*, não no execute. A duração é
+    registrada quando os resultados se esgotam, na instrução seguinte ou quando o cursor é
+    fechado ou descartado.
+    """
+
+    _pendente = None
+
+    def _concluir(self) -> None:
+        pendente, self._pendente = self._pendente, None
+        if pendente is not None:
+            Instrumentacao.registrar_instrucao(self.connection, *pendente)
+
+    def _medir(self, leitura, *args):
+        inicio = time.perf_counter()
+        try:
+            return leitura(*args)
+        finally:
+            if self._pendente is not None:
+                self._pendente[2] += time.perf_counter() - inicio
+
+    def execute(self, sql, parametros=()):
+        self._concluir()
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            self._pendente = [sql, parametros, time.perf_counter() - inicio]
+
+    def executemany(self, sql, sequencia):
+        self._concluir()
+        # Os primeiros parâmetros servem para o EXPLAIN QUERY PLAN, sem consumir a sequência duas vezes.
+        primeiros = []
+
+        def lembrar(parametros):
+            for item in parametros:
+                if not primeiros:
+                    primeiros.append(item)
+                yield item
+
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, lembrar(sequencia))
+        finally:
+            self._pendente = [sql, primeiros[0] if primeiros else None, time.perf_counter() - inicio]
+
+    def fetchone(self):
+        linha = self._medir(super().fetchone)
+        if linha is None:
+            self._concluir()
+        return linha
+
+    def fetchmany(self, size=None):
+        linhas = self._medir(super().fetchmany, self.arraysize if size is None else size)
+        if not linhas:
+            self._concluir()
+        return linhas
+
+    def fetchall(self):
+        try:
+            return self._medir(super().fetchall)
+        finally:
+            self._concluir()
+
+    def __next__(self):
+        try:
+            return self._medir(super().__next__)
+        except StopIteration:
+            self._concluir()
+            raise
+
+    def close(self):
+        self._concluir()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._concluir()
+        except Exception:
+            # Descartado no encerramento do interpretador ou com a conexão já fechada.
+            pass
+
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    """
+    Conexão cujos cursores e atalhos execute/executemany são instrumentados.
+    """
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or CursorInstrumentado)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self.cursor().executemany(sql, sequencia)
+
+
+class Instrumentacao:
+    """
+    Coleta as métricas das operações e das instruções SQL do processo.
+    """
+
+    CLASSES_OPERACOES = ('OperacoesAdministrador', 'OperacoesUsuario', 'OperacoesFarmacia', 'OperacoesProdutos')
+    # Duração a partir da qual uma instrução é registrada como lenta.
+    LIMIAR_LENTO = 0.1
+    # Intervalo de instruções da máquina virtual do SQLite entre chamadas do progress handler.
+    PASSOS_POR_AVISO = 1000
+    # Consultas lentas mantidas em memória.
+    MAXIMO_LENTAS = 100
+
+    ativa = False
+    operacoes = {}
+    instrucoes = {}
+    erros = {}
+    # Instruções da máquina virtual do SQLite por operação, contadas pelo progress handler em
+    # múltiplos de PASSOS_POR_AVISO: medem o trabalho das consultas, não as linhas lidas.
+    instrucoes_vm = {}
+    lentas = deque(maxlen=MAXIMO_LENTAS)
+    arquivo_lentas = None
+    _originais = {}
+    _trava = threading.Lock()
+    _local = threading.local()
+    _exportador = None
+
+    @staticmethod
+    def ativar(limiar_lento: float = None, arquivo_lentas: str = None) -> None:
+        """
+        Liga a instrumentação: envolve os métodos públicos das classes Operacoes* e passa
+        a criar conexões instrumentadas. As conexões já abertas são fechadas para isso.
+        """
+        if Instrumentacao.ativa:
+            return
+        if limiar_lento is not None:
+            Instrumentacao.LIMIAR_LENTO = limiar_lento
+        Instrumentacao.arquivo_lentas = arquivo_lentas
+        for nome_classe in Instrumentacao.CLASSES_OPERACOES:
+            classe = getattr(pharmanalytics_reformulado, nome_classe)
+            for nome, atributo in list(vars(classe).items()):
+                if isinstance(atributo, staticmethod) and not nome.startswith('_'):
+                    Instrumentacao._originais[(classe, nome)] = atributo
+                    setattr(classe, nome, staticmethod(
+                        Instrumentacao._envolver(f'{nome_classe}.{nome}', atributo.__func__)))
+        BancoDeDados.FABRICA_CONEXAO = ConexaoInstrumentada
+        BancoDeDados.AO_CONECTAR.append(Instrumentacao._configurar_conexao)
+        BancoDeDados.fechar_conexoes()
+        Instrumentacao.ativa = True
+
+    @staticmethod
+    def desativar() -> None:
+        """
+        Desliga a instrumentação e restaura os métodos e a fábrica de conexões originais.
+        """
+        if not Instrumentacao.ativa:
+            return
+        for (classe, nome), original in Instrumentacao._originais.items():
+            setattr(classe, nome, original)
+        Instrumentacao._originais.clear()
+        BancoDeDados.FABRICA_CONEXAO = sqlite3.Connection
+        BancoDeDados.AO_CONECTAR.remove(Instrumentacao._configurar_conexao)
+        BancoDeDados.fechar_conexoes()
+        Instrumentacao.ativa = False
+        Instrumentacao.parar_exportacao()
+
+    @staticmethod
+    def limpar() -> None:
+        """
+        Zera todas as métricas coletadas.
+        """
+        with Instrumentacao._trava:
+            Instrumentacao.operacoes = {}
+            Instrumentacao.instrucoes = {}
+            Instrumentacao.erros = {}
+            Instrumentacao.instrucoes_vm = {}
+            Instrumentacao.lentas.clear()
+
+    @staticmethod
+    def _configurar_conexao(conn: sqlite3.Connection) -> None:
+        local = Instrumentacao._local
+
+        def aviso():
+            local.passos = getattr(local, 'passos', 0) + Instrumentacao.PASSOS_POR_AVISO
+            return 0
+
+        conn.set_progress_handler(aviso, Instrumentacao.PASSOS_POR_AVISO)
+
+    @staticmethod
+    def _envolver(nome: str, funcao):
+        local = Instrumentacao._local
+
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            passos_antes = getattr(local, 'passos', 0)
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            except Exception:
+                with Instrumentacao._trava:
+                    Instrumentacao.erros[nome] = Instrumentacao.erros.get(nome, 0) + 1
+                raise
+            finally:
+                duracao = time.perf_counter() - inicio
+                passos = getattr(local, 'passos', 0) - passos_antes
+                with Instrumentacao._trava:
+                    histograma = Instrumentacao.operacoes.get(nome)
+                    if histograma is None:
+                        histograma = Instrumentacao.operacoes[nome] = Histograma()
+                    histograma.registrar(duracao)
+                    Instrumentacao.instrucoes_vm[nome] = Instrumentacao.instrucoes_vm.get(nome, 0) + passos
+
+        return envolvida
+
+    @staticmethod
+    def normalizar(sql: str) -> str:
+        """
+        Reduz a instrução SQL a uma chave estável (espaços colapsados, até 200 caracteres).
+        """
+        return re.sub(r'\s+', ' ', sql).strip()[:200]
+
+    @staticmethod
+    def registrar_instrucao(conn: sqlite3.Connection, sql: str, parametros, duracao: float) -> None:
+        """
+        Conta a duração da instrução e registra o plano de execução se ela for lenta.
+        """
+        chave = Instrumentacao.normalizar(sql)
+        with Instrumentacao._trava:
+            histograma = Instrumentacao.instrucoes.get(chave)
+            if histograma is None:
+                histograma = Instrumentacao.instrucoes[chave] = Histograma()
+            histograma.registrar(duracao)
+        if duracao < Instrumentacao.LIMIAR_LENTO or chave.upper().startswith(('EXPLAIN', 'PRAGMA')):
+            return
+        plano = None
+        if parametros is not None:
+            try:
+                plano = [linha[-1] for linha in sqlite3.Connection.execute(
+                    conn, f'EXPLAIN QUERY PLAN {sql}', parametros)]
+            except sqlite3.Error:
+                plano = None
+        registro = {'instante': time.time(), 'duracao_s': duracao, 'sql': chave, 'plano': plano}
+        with Instrumentacao._trava:
+            Instrumentacao.lentas.append(registro)
+            if Instrumentacao.arquivo_lentas:
+                with open(Instrumentacao.arquivo_lentas, 'a', encoding='utf-8') as arquivo:
+                    arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+    @staticmethod
+    def exportar_json() -> dict:
+        """
+        Retorna todas as métricas num dicionário serializável.
+        """
+        with Instrumentacao._trava:
+            return {
+                'operacoes': {nome: dict(h.como_dict(), erros=Instrumentacao.erros.get(nome, 0),
+                                         instrucoes_vm=Instrumentacao.instrucoes_vm.get(nome, 0))
+                              for nome, h in Instrumentacao.operacoes.items()},
+                'instrucoes': {sql: h.como_dict() for sql, h in Instrumentacao.instrucoes.items()},
+                'lentas': list(Instrumentacao.lentas),
+            }
+
+    @staticmethod
+    def exportar_prometheus() -> str:
+        """
+        Retorna as métricas no formato texto de exposição do Prometheus.
+        """
+        def rotulo(valor):
+            return valor.replace('\\', '\\\\').replace('"', '\\"')
+
+        def histograma(nome, chave, valor, h):
+            linhas = []
+            acumulado = 0
+            for limite, contagem in zip(list(Histograma.FAIXAS) + ['+Inf'], h.contagens):
+                acumulado += contagem
+                linhas.append(f'{nome}_bucket{{{chave}="{rotulo(valor)}",le="{limite}"}} {acumulado}')
+            linhas.append(f'{nome}_sum{{{chave}="{rotulo(valor)}"}} {h.soma}')
+            linhas.append(f'{nome}_count{{{chave}="{rotulo(valor)}"}} {h.total}')
+            return linhas
+
+        with Instrumentacao._trava:
+            linhas = ['# TYPE pharmanalytics_operacao_segundos histogram']
+            for nome, h in sorted(Instrumentacao.operacoes.items()):
+                linhas += histograma('pharmanalytics_operacao_segundos', 'operacao', nome, h)
+            linhas.append('# TYPE pharmanalytics_operacao_erros_total counter')
+            for nome, total in sorted(Instrumentacao.erros.items()):
+                linhas.append(f'pharmanalytics_operacao_erros_total{{operacao="{rotulo(nome)}"}} {total}')
+            linhas.append('# TYPE pharmanalytics_operacao_instrucoes_vm_total counter')
+            for nome, total in sorted(Instrumentacao.instrucoes_vm.items()):
+                linhas.append(f'pharmanalytics_operacao_instrucoes_vm_total{{operacao="{rotulo(nome)}"}} {total}')
+            linhas.append('# TYPE pharmanalytics_instrucao_segundos histogram')
+            for sql, h in sorted(Instrumentacao.instrucoes.items()):
+                linhas += histograma('pharmanalytics_instrucao_segundos', 'sql', sql, h)
+        return '\n'.join(linhas) + '\n'
+
+    @staticmethod
+    def gravar(caminho: str, formato: str = None) -> None:
+        """
+        Grava as métricas no arquivo, em JSON (.json) ou no formato do Prometheus.
+        """
+        formato = formato or ('json' if caminho.lower().endswith('.json') else 'prometheus')
+        conteudo = (json.dumps(Instrumentacao.exportar_json(), indent=2, ensure_ascii=False)
+                    if formato == 'json' else Instrumentacao.exportar_prometheus())
+        temporario = caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        # Substituição atômica, para que leitores nunca vejam um arquivo pela metade.
+        os.replace(temporario, caminho)
+
+    @staticmethod
+    def iniciar_exportacao(caminho: str, intervalo: float = 15.0, formato: str = None) -> None:
+        """
+        Grava as métricas no arquivo periodicamente, numa thread em segundo plano.
+        """
+        Instrumentacao.parar_exportacao()
+        parar = threading.Event()
+
+        def exportar():
+            while not parar.wait(intervalo):
+                Instrumentacao.gravar(caminho, formato)
+            Instrumentacao.gravar(caminho, formato)
+
+        thread = threading.Thread(target=exportar, name='exportador-metricas', daemon=True)
+        Instrumentacao._exportador = (thread, parar)
+        thread.start()
+        atexit.register(Instrumentacao.parar_exportacao)
+
+    @staticmethod
+    def parar_exportacao() -> None:
+        """
+        Encerra a exportação periódica, gravando as métricas uma última vez.
+        """
+        if Instrumentacao._exportador is not None:
+            thread, parar = Instrumentacao._exportador
+            parar.set()
+            thread.join()
+            Instrumentacao._exportador = None
+
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Livro de movimentos do estoque do PharmAnalytics.
+Grava instantâneos periódicos das quantidades (para que consultas históricas partam do
+instantâneo mais próximo em vez de repetir todo o histórico), consulta a quantidade de
+um produto num instante passado e lista os movimentos de uma janela de tempo.
+As próprias operações já agendam um instantâneo, gravado por uma thread de fundo, a cada
+OperacoesMovimentos.INTERVALO_INSTANTANEO movimentos; o comando instantaneo serve para gravar
+um fora desse ritmo.
+Os gatilhos do livro usam as funções SQL motivo_movimento() e admin_movimento(), registradas
+nas conexões do sistema: o estoque não pode ser alterado por ferramentas externas, como o shell
+sqlite3, mas pode por scripts Python que chamem OperacoesMovimentos.registrar_funcoes(conn).
+
+Uso: python pharmanalytics_movimentos.py instantaneo [--minimo N] [--intervalo SEGUNDOS]
+     python pharmanalytics_movimentos.py quantidade COD --momento 2024-05-01T12:00
+     python pharmanalytics_movimentos.py movimentos [--inicio ...] [--fim ...] [--produto COD]
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from pharmanalytics_reformulado import BancoDeDados, OperacoesMovimentos
+
+
+def ler_momento(texto: str) -> float:
+    """
+    Converte uma data ISO (hora local) ou segundos desde a época em segundos desde a época.
+    """
+    try:
+        return float(texto)
+    except ValueError:
+        return datetime.fromisoformat(texto).timestamp()
+
+
+def main(argumentos: list = None) -> int:
+    """
+    Ponto de entrada da linha de comando.
+    """
+    parser = argparse.ArgumentParser(description="Livro de movimentos do estoque do PharmAnalytics.")
+    parser.add_argument('--banco', default=BancoDeDados.NOME_DB)
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    instantaneo = comandos.add_parser('instantaneo', help="grava um instantâneo das quantidades")
+    instantaneo.add_argument('--minimo', type=int, default=1, help="movimentos desde o último instantâneo")
+    instantaneo.add_argument('--intervalo', type=float, help="repete a cada SEGUNDOS até ser interrompido")
+    quantidade = comandos.add_parser('quantidade', help="quantidade de um produto num instante")
+    quantidade.add_argument('produto', type=int)
+    quantidade.add_argument('--momento', type=ler_momento, default=None, help="padrão: agora")
+    movimentos = comandos.add_parser('movimentos', help="movimentos de uma janela de tempo")
+    movimentos.add_argument('--inicio', type=ler_momento)
+    movimentos.add_argument('--fim', type=ler_momento)
+    movimentos.add_argument('--produto', type=int)
+    args = parser.parse_args(argumentos)
+
+    BancoDeDados.NOME_DB = args.banco
+    BancoDeDados.criar_tabelas()
+    try:
+        if args.comando == 'instantaneo':
+            while True:
+                cod = OperacoesMovimentos.gravar_instantaneo(args.minimo)
+                print(f"Instantâneo {cod} gravado." if cod else "Nenhum instantâneo necessário.")
+                if args.intervalo is None:
+                    break
+                time.sleep(args.intervalo)
+        elif args.comando == 'quantidade':
+            momento = args.momento if args.momento is not None else time.time()
+            total = OperacoesMovimentos.quantidade_em(args.produto, momento)
+            if total is None:
+                print("Instante anterior ao primeiro instantâneo do livro.")
+                return 1
+            print(total)
+        else:
+            for cod, produto, delta, motivo, admin, momento in OperacoesMovimentos.movimentos(
+                    args.inicio, args.fim, args.produto):
+                quando = datetime.fromtimestamp(momento).isoformat(timespec='milliseconds')
+                print(f"{cod}\t{quando}\t{produto}\t{delta:+d}\t{motivo or '-'}\t{admin or '-'}")
+    except KeyboardInterrupt:
+        pass
+    except sqlite3.Error as e:
+        print(f"Erro ao consultar o livro de movimentos: {e}")
+        return 1
+    finally:
+        BancoDeDados.fechar_conexoes()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Histórico de preços do PharmAnalytics.
+Consulta o preço de um produto num instante passado, lista as mudanças de preço de uma
+janela de tempo e compacta o histórico.
+
+Uso: python pharmanalytics_precos.py preco COD --momento 2024-05-01T12:00
+     python pharmanalytics_precos.py alteracoes [--inicio ...] [--fim ...] [--produto COD]
+     python pharmanalytics_precos.py compactar [--antes 2024-01-01 --resolucao SEGUNDOS]
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from pharmanalytics_movimentos import ler_momento
+from pharmanalytics_reformulado import BancoDeDados, OperacoesPrecos
+
+
+def formatar_preco(preco: float) -> str:
+    return '-' if preco is None else f'{preco:.2f}'
+
+
+def main(argumentos: list = None) -> int:
+    """
+    Ponto de entrada da linha de comando.
+    """
+    parser = argparse.ArgumentParser(description="Histórico de preços do PharmAnalytics.")
+    parser.add_argument('--banco', default=BancoDeDados.NOME_DB)
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    preco = comandos.add_parser('preco', help="preço de um produto num instante")
+    preco.add_argument('produto', type=int)
+    preco.add_argument('--momento', type=ler_momento, default=None, help="padrão: agora")
+    alteracoes = comandos.add_parser('alteracoes', help="mudanças de preço de uma janela de tempo")
+    alteracoes.add_argument('--inicio', type=ler_momento)
+    alteracoes.add_argument('--fim', type=ler_momento)
+    alteracoes.add_argument('--produto', type=int)
+    compactar = comandos.add_parser('compactar', help="junta trechos repetidos do histórico")
+    compactar.add_argument('--antes', type=ler_momento, help="reduz as mudanças anteriores a este instante")
+    compactar.add_argument('--resolucao', type=float, help="a uma por janela de SEGUNDOS (exige --antes)")
+    args = parser.parse_args(argumentos)
+
+    BancoDeDados.NOME_DB = args.banco
+    BancoDeDados.criar_tabelas()
+    try:
+        if args.comando == 'preco':
+            momento = args.momento if args.momento is not None else time.time()
+            valor = OperacoesPrecos.preco_em(args.produto, momento)
+            if valor is None:
+                print("Produto sem preço nesse instante.")
+                return 1
+            print(formatar_preco(valor))
+        elif args.comando == 'alteracoes':
+            for cod, momento, anterior, novo in OperacoesPrecos.alteracoes(args.inicio, args.fim, args.produto):
+                quando = datetime.fromtimestamp(momento).isoformat(timespec='milliseconds')
+                print(f"{quando}\t{cod}\t{formatar_preco(anterior)}\t{formatar_preco(novo)}")
+        else:
+            removidas = OperacoesPrecos.compactar(args.antes, args.resolucao)
+            print(f"{removidas} entrada(s) removida(s) do histórico.")
+    except ValueError as e:
+        print(e)
+        return 1
+    except sqlite3.Error as e:
+        print(f"Erro ao consultar o histórico de preços: {e}")
+        return 1
+    finally:
+        BancoDeDados.fechar_conexoes()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,612 +4,3169 @@ Sistema PharmAnalytics: Sistema para gerenciamento de farmácias e produtos.
 Utiliza SQLite para armazenamento dos dados.
 """
 
+import base64
+import difflib
+import hashlib
+import heapq
+import hmac
+import json
+import os
+import queue
+import re
+import secrets
 import sqlite3
+import threading
+import time
+import unicodedata
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as TempoEsgotado
+from contextlib import contextmanager, nullcontext
+
+
+def _gatilhos_resumo() -> tuple:
+    """
+    Monta os gatilhos que mantêm resumo_categoria e resumo_admin.
+    Cada alteração em produto, categoria_produto ou estoque retira a contribuição
+    antiga (OLD) e soma a nova (NEW), ambas calculadas sobre o estado atual das demais tabelas.
+    """
+    minimo = '(SELECT estoque_minimo FROM resumo_parametros)'
+    centavos = 'CAST(round(coalesce({}, 0) * 100) AS INTEGER)'
+
+    def somar(tabela: str, chave: str, selecao: str) -> str:
+        return (f'INSERT INTO {tabela} ({chave}, produtos, unidades, valor_centavos, abaixo_minimo) {selecao} '
+                f'ON CONFLICT ({chave}) DO UPDATE SET produtos = produtos + excluded.produtos, '
+                'unidades = unidades + excluded.unidades, '
+                'valor_centavos = valor_centavos + excluded.valor_centavos, '
+                'abaixo_minimo = abaixo_minimo + excluded.abaixo_minimo;')
+
+    def produto(r: str, s: str) -> str:
+        # Entrada (s = '') ou saída (s = '-') do produto r com a quantidade do seu estoque.
+        valores = f"{s}1, {s}q, {s}q * {centavos.format(r + '.preco')}, {s}(q < {minimo})"
+        quantidade = f'(SELECT coalesce((SELECT quantidade FROM estoque WHERE cod = {r}.cod_estoque), 0) AS q)'
+        return (somar('resumo_admin', 'cod_admin',
+                      f'SELECT {r}.cod_admin, {valores} FROM {quantidade} WHERE {r}.cod_admin IS NOT NULL')
+                + somar('resumo_categoria', 'categoria',
+                        f'SELECT c.categoria, {valores} FROM categoria_produto c, {quantidade} '
+                        f'WHERE c.cod_produto = {r}.cod AND c.categoria IS NOT NULL'))
+
+    def categoria(r: str, s: str) -> str:
+        # Entrada ou saída do produto na categoria r.categoria.
+        return somar('resumo_categoria', 'categoria',
+                     f"SELECT {r}.categoria, {s}1, {s}q, {s}q * {centavos.format('preco')}, {s}(q < {minimo}) "
+                     'FROM (SELECT p.preco, coalesce((SELECT quantidade FROM estoque WHERE cod = p.cod_estoque), 0) AS q '
+                     f'FROM produto p WHERE p.cod = {r}.cod_produto) WHERE {r}.categoria IS NOT NULL')
+
+    def estoque(r: str, s: str) -> str:
+        # Variação da quantidade de zero até r.quantidade (s = '') ou o inverso (s = '-').
+        abaixo = f'(q < {minimo}) - (0 < {minimo})' if not s else f'(0 < {minimo}) - (q < {minimo})'
+        valores = f"0, {s}q, {s}q * {centavos.format('p.preco')}, {abaixo}"
+        quantidade = f'(SELECT coalesce({r}.quantidade, 0) AS q)'
+        return (somar('resumo_admin', 'cod_admin',
+                      f'SELECT p.cod_admin, {valores} FROM produto p, {quantidade} '
+                      f'WHERE p.cod_estoque = {r}.cod AND p.cod_admin IS NOT NULL')
+                + somar('resumo_categoria', 'categoria',
+                        f'SELECT c.categoria, {valores} FROM produto p '
+                        f'JOIN categoria_produto c ON c.cod_produto = p.cod, {quantidade} '
+                        f'WHERE p.cod_estoque = {r}.cod AND c.categoria IS NOT NULL'))
+
+    gatilhos = (
+        ('resumo_produto_ai', 'AFTER INSERT ON produto', produto('NEW', '')),
+        ('resumo_produto_au', 'AFTER UPDATE OF cod, preco, cod_admin, cod_estoque ON produto',
+         produto('OLD', '-') + produto('NEW', '')),
+        ('resumo_produto_ad', 'AFTER DELETE ON produto', produto('OLD', '-')),
+        ('resumo_categoria_ai', 'AFTER INSERT ON categoria_produto', categoria('NEW', '')),
+        ('resumo_categoria_au', 'AFTER UPDATE ON categoria_produto', categoria('OLD', '-') + categoria('NEW', '')),
+        ('resumo_categoria_ad', 'AFTER DELETE ON categoria_produto', categoria('OLD', '-')),
+        ('resumo_estoque_ai', 'AFTER INSERT ON estoque', estoque('NEW', '')),
+        ('resumo_estoque_au', 'AFTER UPDATE OF cod, quantidade ON estoque '
+         'WHEN OLD.cod IS NOT NEW.cod OR OLD.quantidade IS NOT NEW.quantidade',
+         estoque('OLD', '-') + estoque('NEW', '')),
+        ('resumo_estoque_ad', 'AFTER DELETE ON estoque', estoque('OLD', '-')),
+    )
+    return tuple(f'CREATE TRIGGER IF NOT EXISTS {nome} {evento} BEGIN {corpo} END'
+                 for nome, evento, corpo in gatilhos)
 
 
 class BancoDeDados:
     """
-    Gerencia a conexão e a criação das tabelas do banco de dados.
+    Gerencia a conexão e a criação das tabelas do banco de dados.
+
+    Cada thread mantém uma conexão persistente por arquivo de banco, configurada
+    uma única vez com os PRAGMAs abaixo e reaproveitada por todas as operações.
+    """
+
+    NOME_DB = 'pharmanalytics.db'
+    # PRAGMAs aplicados uma única vez, na abertura de cada conexão persistente.
+    PRAGMAS = {
+        'journal_mode': 'WAL',
+        'busy_timeout': 5000,
+        'synchronous': 'NORMAL',
+        'cache_size': -20000,
+        'mmap_size': 268435456,
+    }
+    # PRAGMAs que alteram o arquivo, omitidos nas conexões somente leitura da réplica.
+    PRAGMAS_ESCRITA = ('journal_mode', 'synchronous')
+    # Quantidade de instruções preparadas mantidas em cache por conexão.
+    CACHE_INSTRUCOES = 256
+    # Classe das conexões criadas e funções chamadas com cada nova conexão; permitem
+    # que módulos como o de métricas instrumentem as conexões sem alterar as operações.
+    FABRICA_CONEXAO = sqlite3.Connection
+    AO_CONECTAR = []
+    # Réplica de leitura opcional (ReplicaLeitura); quando definida, as consultas de leitura
+    # marcadas com leitura() são atendidas por ela, longe das gravações do banco principal.
+    replica = None
+
+    _local = threading.local()
+    _trava = threading.Lock()
+    _conexoes = []
+    _geracao = 0
+
+    @staticmethod
+    def conectar() -> sqlite3.Connection:
+        """
+        Retorna a conexão persistente da thread atual com o banco de dados SQLite.
+        A conexão é criada e configurada na primeira chamada e reutilizada nas demais.
+        Lança sqlite3.OperationalError se não for possível abrir o banco.
+        """
+        local = BancoDeDados._local
+        if getattr(local, 'geracao', None) != BancoDeDados._geracao:
+            local.conexoes = {}
+            local.geracao = BancoDeDados._geracao
+        nome_db = BancoDeDados.banco_atual()
+        conn = local.conexoes.get(nome_db)
+        if conn is not None:
+            return conn
+        # A réplica é aberta somente leitura: uma consulta desviada para ela não pode gravar
+        # nem mudar o modo de journal de um arquivo que a próxima cópia sobrescreve.
+        replica = BancoDeDados.replica
+        somente_leitura = replica is not None and nome_db == replica.caminho
+        try:
+            if somente_leitura:
+                conn = sqlite3.connect(
+                    f'file:{urllib.request.pathname2url(os.path.abspath(nome_db))}?mode=ro',
+                    uri=True,
+                    isolation_level=None,
+                    check_same_thread=False,
+                    cached_statements=BancoDeDados.CACHE_INSTRUCOES,
+                    factory=BancoDeDados.FABRICA_CONEXAO
+                )
+            else:
+                conn = sqlite3.connect(
+                    nome_db,
+                    isolation_level='IMMEDIATE',
+                    check_same_thread=False,
+                    cached_statements=BancoDeDados.CACHE_INSTRUCOES,
+                    factory=BancoDeDados.FABRICA_CONEXAO
+                )
+            for pragma, valor in BancoDeDados.PRAGMAS.items():
+                if not (somente_leitura and pragma in BancoDeDados.PRAGMAS_ESCRITA):
+                    conn.execute(f'PRAGMA {pragma} = {valor}')
+            OperacoesMovimentos.registrar_funcoes(conn)
+            for gancho in BancoDeDados.AO_CONECTAR:
+                gancho(conn)
+        except sqlite3.Error as e:
+            if conn is not None:
+                conn.close()
+            raise sqlite3.OperationalError(f"Não foi possível conectar com o banco de dados: {e}") from e
+        with BancoDeDados._trava:
+            BancoDeDados._conexoes.append(conn)
+        local.conexoes[nome_db] = conn
+        return conn
+
+    @staticmethod
+    def banco_atual() -> str:
+        """
+        Retorna o arquivo de banco usado pela thread atual: o definido por usando()
+        ou, fora dele, BancoDeDados.NOME_DB.
+        """
+        return getattr(BancoDeDados._local, 'nome_db', None) or BancoDeDados.NOME_DB
+
+    @staticmethod
+    @contextmanager
+    def usando(nome_db: str):
+        """
+        Direciona as operações da thread atual para outro arquivo de banco durante o bloco
+        (por exemplo, uma partição de farmácias). Não pode trocar de banco dentro de uma transação.
+        """
+        local = BancoDeDados._local
+        anterior = getattr(local, 'nome_db', None)
+        if nome_db != BancoDeDados.banco_atual() and BancoDeDados.em_transacao():
+            raise sqlite3.ProgrammingError("Não é possível trocar de banco durante uma transação.")
+        local.nome_db = nome_db
+        try:
+            yield
+        finally:
+            local.nome_db = anterior
+
+    @staticmethod
+    @contextmanager
+    def leitura():
+        """
+        Direciona as consultas do bloco para a réplica de leitura, se houver uma configurada
+        e dentro do limite de defasagem. Fora do banco principal (partições) ou dentro de
+        uma transação, o bloco continua no banco atual. Produz True quando lê da réplica.
+        """
+        replica = BancoDeDados.replica
+        if (replica is None or BancoDeDados.em_transacao()
+                or BancoDeDados.banco_atual() != BancoDeDados.NOME_DB or not replica.disponivel()):
+            yield False
+        else:
+            with BancoDeDados.usando(replica.caminho):
+                yield True
+
+    @staticmethod
+    def liberar(conn: sqlite3.Connection) -> None:
+        """
+        Devolve a conexão ao final de uma operação.
+        Alterações não confirmadas são descartadas, como ocorria ao fechar a conexão,
+        exceto quando há um bloco transacao() em andamento na thread.
+        """
+        if conn.in_transaction and not BancoDeDados.em_transacao():
+            conn.rollback()
+
+    @staticmethod
+    @contextmanager
+    def transacao():
+        """
+        Executa o bloco numa transação de escrita (BEGIN IMMEDIATE) na conexão da thread,
+        confirmando ao final ou desfazendo tudo se ocorrer uma exceção.
+        Blocos aninhados usam SAVEPOINTs e só a transação mais externa confirma no disco.
+        """
+        conn = BancoDeDados.conectar()
+        local = BancoDeDados._local
+        profundidade = getattr(local, 'profundidade', 0)
+        if profundidade == 0:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.execute('BEGIN IMMEDIATE')
+            local.apos_confirmar = []
+            local.chaves_confirmar = set()
+        else:
+            conn.execute(f'SAVEPOINT nivel_{profundidade}')
+        local.profundidade = profundidade + 1
+        try:
+            yield conn
+        except BaseException:
+            if profundidade == 0:
+                conn.rollback()
+                local.apos_confirmar = []
+                local.chaves_confirmar = set()
+            else:
+                conn.execute(f'ROLLBACK TO nivel_{profundidade}')
+                conn.execute(f'RELEASE nivel_{profundidade}')
+            raise
+        else:
+            if profundidade == 0:
+                conn.commit()
+            else:
+                conn.execute(f'RELEASE nivel_{profundidade}')
+        finally:
+            local.profundidade = profundidade
+        if profundidade == 0:
+            acoes, local.apos_confirmar = local.apos_confirmar, []
+            local.chaves_confirmar = set()
+            for acao in acoes:
+                acao()
+
+    @staticmethod
+    def em_transacao() -> bool:
+        """
+        Indica se há um bloco transacao() em andamento na thread atual.
+        """
+        return bool(getattr(BancoDeDados._local, 'profundidade', 0))
+
+    @staticmethod
+    def apos_confirmar(acao, chave=None) -> None:
+        """
+        Agenda uma ação (por exemplo, invalidar o cache) para depois da confirmação da
+        transação em andamento na thread. Fora de uma transação, executa imediatamente.
+        Ações com a mesma chave são agendadas uma única vez por transação.
+        """
+        if BancoDeDados.em_transacao():
+            local = BancoDeDados._local
+            if chave is not None:
+                if chave in local.chaves_confirmar:
+                    return
+                local.chaves_confirmar.add(chave)
+            local.apos_confirmar.append(acao)
+        else:
+            acao()
+
+    @staticmethod
+    def fechar_conexoes() -> None:
+        """
+        Fecha todas as conexões persistentes abertas pelas threads do processo, depois de
+        concluídos os instantâneos automáticos já agendados.
+        """
+        OperacoesMovimentos.aguardar_instantaneos()
+        with BancoDeDados._trava:
+            for conn in BancoDeDados._conexoes:
+                conn.close()
+            BancoDeDados._conexoes.clear()
+            BancoDeDados._geracao += 1
+
+    # Migrações do esquema, aplicadas em ordem. Após aplicar a migração de
+    # posição i, PRAGMA user_version passa a valer i + 1. Cada passo é uma instrução
+    # SQL ou uma função que recebe a conexão.
+    MIGRACOES = [
+        # 1 - Tabelas originais do sistema
+        (
+            # Tabela Pessoa
+            '''CREATE TABLE IF NOT EXISTS pessoa (
+                cpf INTEGER PRIMARY KEY
+            )''',
+            # Tabela Administrador
+            '''CREATE TABLE IF NOT EXISTS administrador (
+                email VARCHAR(100),
+                senha VARCHAR(50),
+                cod_pessoa INTEGER,
+                FOREIGN KEY (cod_pessoa) REFERENCES pessoa(cpf)
+            )''',
+            # Tabela Usuário
+            '''CREATE TABLE IF NOT EXISTS usuario (
+                cod_pessoa INTEGER PRIMARY KEY,
+                FOREIGN KEY (cod_pessoa) REFERENCES pessoa(cpf)
+            )''',
+            # Tabela Tel_Usuario
+            '''CREATE TABLE IF NOT EXISTS tel_usuario (
+                numero VARCHAR(20),
+                cod_usuario INTEGER,
+                FOREIGN KEY (cod_usuario) REFERENCES usuario(cod_pessoa)
+            )''',
+            # Tabela Farmácia
+            '''CREATE TABLE IF NOT EXISTS farmacia (
+                cod INTEGER PRIMARY KEY,
+                nome VARCHAR(100),
+                rua VARCHAR(100),
+                num INTEGER,
+                bairro VARCHAR(50),
+                cep VARCHAR(20),
+                hora_inicio VARCHAR(5),
+                hora_fim VARCHAR(5),
+                dia_funcionamento VARCHAR(20),
+                cod_admin INTEGER,
+                FOREIGN KEY (cod_admin) REFERENCES administrador(cod_pessoa)
+            )''',
+            # Tabela Tel_Farmácia
+            '''CREATE TABLE IF NOT EXISTS tel_farmacia (
+                numero VARCHAR(20),
+                cod_farmacia INTEGER,
+                FOREIGN KEY (cod_farmacia) REFERENCES farmacia(cod)
+            )''',
+            # Tabela Estoque
+            '''CREATE TABLE IF NOT EXISTS estoque (
+                cod INTEGER PRIMARY KEY,
+                quantidade INTEGER
+            )''',
+            # Tabela Produto
+            '''CREATE TABLE IF NOT EXISTS produto (
+                cod INTEGER PRIMARY KEY,
+                nome VARCHAR(100),
+                preco DOUBLE PRECISION,
+                cod_admin INTEGER,
+                cod_estoque INTEGER,
+                FOREIGN KEY (cod_admin) REFERENCES administrador(cod_pessoa),
+                FOREIGN KEY (cod_estoque) REFERENCES estoque(cod)
+            )''',
+            # Tabela Categoria_Produto
+            '''CREATE TABLE IF NOT EXISTS categoria_produto (
+                categoria VARCHAR(50),
+                cod_produto INTEGER,
+                FOREIGN KEY (cod_produto) REFERENCES produto(cod)
+            )''',
+            # Tabela Usuário_Produto
+            '''CREATE TABLE IF NOT EXISTS usuario_produto (
+                cod_usuario INTEGER,
+                cod_produto INTEGER,
+                FOREIGN KEY (cod_usuario) REFERENCES usuario(cod_pessoa),
+                FOREIGN KEY (cod_produto) REFERENCES produto(cod)
+            )''',
+            # Tabela Usuário_Farmácia
+            '''CREATE TABLE IF NOT EXISTS usuario_farmacia (
+                cod_usuario INTEGER,
+                cod_farmacia INTEGER,
+                FOREIGN KEY (cod_usuario) REFERENCES usuario(cod_pessoa),
+                FOREIGN KEY (cod_farmacia) REFERENCES farmacia(cod)
+            )''',
+        ),
+        # 2 - Índices secundários sobre as chaves estrangeiras e o nome do produto
+        (
+            'CREATE INDEX IF NOT EXISTS idx_administrador_pessoa ON administrador (cod_pessoa)',
+            'CREATE INDEX IF NOT EXISTS idx_tel_usuario_usuario ON tel_usuario (cod_usuario)',
+            'CREATE INDEX IF NOT EXISTS idx_farmacia_admin ON farmacia (cod_admin)',
+            'CREATE INDEX IF NOT EXISTS idx_tel_farmacia_farmacia ON tel_farmacia (cod_farmacia)',
+            'CREATE INDEX IF NOT EXISTS idx_produto_admin ON produto (cod_admin)',
+            'CREATE INDEX IF NOT EXISTS idx_produto_estoque ON produto (cod_estoque)',
+            'CREATE INDEX IF NOT EXISTS idx_produto_nome ON produto (lower(nome))',
+            'CREATE INDEX IF NOT EXISTS idx_categoria_produto_produto ON categoria_produto (cod_produto)',
+            'CREATE INDEX IF NOT EXISTS idx_usuario_produto_usuario ON usuario_produto (cod_usuario)',
+            'CREATE INDEX IF NOT EXISTS idx_usuario_produto_produto ON usuario_produto (cod_produto)',
+            'CREATE INDEX IF NOT EXISTS idx_usuario_farmacia_usuario ON usuario_farmacia (cod_usuario)',
+            'CREATE INDEX IF NOT EXISTS idx_usuario_farmacia_farmacia ON usuario_farmacia (cod_farmacia)',
+        ),
+        # 3 - Índice de texto completo sobre nome e categoria do produto (rowid = produto.cod),
+        # mantido em sincronia por gatilhos
+        (
+            '''CREATE VIRTUAL TABLE IF NOT EXISTS produto_busca USING fts5 (
+                nome,
+                categoria,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )''',
+            '''INSERT INTO produto_busca (rowid, nome, categoria)
+               SELECT p.cod, p.nome,
+                      coalesce((SELECT group_concat(c.categoria, ' ') FROM categoria_produto c
+                                WHERE c.cod_produto = p.cod), '')
+               FROM produto p''',
+            '''CREATE TRIGGER IF NOT EXISTS produto_busca_ai AFTER INSERT ON produto BEGIN
+                INSERT INTO produto_busca (rowid, nome, categoria)
+                VALUES (NEW.cod, NEW.nome,
+                        coalesce((SELECT group_concat(categoria, ' ') FROM categoria_produto
+                                  WHERE cod_produto = NEW.cod), ''));
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS produto_busca_au AFTER UPDATE OF cod, nome ON produto BEGIN
+                DELETE FROM produto_busca WHERE rowid = OLD.cod;
+                INSERT INTO produto_busca (rowid, nome, categoria)
+                VALUES (NEW.cod, NEW.nome,
+                        coalesce((SELECT group_concat(categoria, ' ') FROM categoria_produto
+                                  WHERE cod_produto = NEW.cod), ''));
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS produto_busca_ad AFTER DELETE ON produto BEGIN
+                DELETE FROM produto_busca WHERE rowid = OLD.cod;
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS categoria_busca_ai AFTER INSERT ON categoria_produto BEGIN
+                UPDATE produto_busca
+                SET categoria = coalesce((SELECT group_concat(categoria, ' ') FROM categoria_produto
+                                          WHERE cod_produto = NEW.cod_produto), '')
+                WHERE rowid = NEW.cod_produto;
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS categoria_busca_au AFTER UPDATE ON categoria_produto BEGIN
+                UPDATE produto_busca
+                SET categoria = coalesce((SELECT group_concat(categoria, ' ') FROM categoria_produto
+                                          WHERE cod_produto = OLD.cod_produto), '')
+                WHERE rowid = OLD.cod_produto;
+                UPDATE produto_busca
+                SET categoria = coalesce((SELECT group_concat(categoria, ' ') FROM categoria_produto
+                                          WHERE cod_produto = NEW.cod_produto), '')
+                WHERE rowid = NEW.cod_produto;
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS categoria_busca_ad AFTER DELETE ON categoria_produto BEGIN
+                UPDATE produto_busca
+                SET categoria = coalesce((SELECT group_concat(categoria, ' ') FROM categoria_produto
+                                          WHERE cod_produto = OLD.cod_produto), '')
+                WHERE rowid = OLD.cod_produto;
+            END''',
+        ),
+        # 4 - Índices para os filtros por categoria e por quantidade em estoque
+        (
+            'CREATE INDEX IF NOT EXISTS idx_categoria_produto_categoria ON categoria_produto (categoria)',
+            'CREATE INDEX IF NOT EXISTS idx_estoque_quantidade ON estoque (quantidade)',
+        ),
+        # 5 - Resumos do estoque por categoria e por administrador (unidades, valor em centavos
+        # e produtos abaixo do estoque mínimo), mantidos incrementalmente por gatilhos
+        (
+            '''CREATE TABLE IF NOT EXISTS resumo_parametros (
+                estoque_minimo INTEGER NOT NULL
+            )''',
+            'INSERT INTO resumo_parametros (estoque_minimo) VALUES (10)',
+            '''CREATE TABLE IF NOT EXISTS resumo_categoria (
+                categoria VARCHAR(50) PRIMARY KEY,
+                produtos INTEGER NOT NULL,
+                unidades INTEGER NOT NULL,
+                valor_centavos INTEGER NOT NULL,
+                abaixo_minimo INTEGER NOT NULL
+            )''',
+            '''CREATE TABLE IF NOT EXISTS resumo_admin (
+                cod_admin INTEGER PRIMARY KEY,
+                produtos INTEGER NOT NULL,
+                unidades INTEGER NOT NULL,
+                valor_centavos INTEGER NOT NULL,
+                abaixo_minimo INTEGER NOT NULL
+            )''',
+            '''INSERT INTO resumo_categoria (categoria, produtos, unidades, valor_centavos, abaixo_minimo)
+               SELECT c.categoria, count(*), sum(q), sum(q * CAST(round(coalesce(preco, 0) * 100) AS INTEGER)),
+                      sum(q < (SELECT estoque_minimo FROM resumo_parametros))
+               FROM categoria_produto c
+               JOIN (SELECT p.cod, p.preco, coalesce(e.quantidade, 0) AS q
+                     FROM produto p LEFT JOIN estoque e ON e.cod = p.cod_estoque) ON cod = c.cod_produto
+               WHERE c.categoria IS NOT NULL
+               GROUP BY c.categoria''',
+            '''INSERT INTO resumo_admin (cod_admin, produtos, unidades, valor_centavos, abaixo_minimo)
+               SELECT cod_admin, count(*), sum(q), sum(q * CAST(round(coalesce(preco, 0) * 100) AS INTEGER)),
+                      sum(q < (SELECT estoque_minimo FROM resumo_parametros))
+               FROM (SELECT p.cod_admin, p.preco, coalesce(e.quantidade, 0) AS q
+                     FROM produto p LEFT JOIN estoque e ON e.cod = p.cod_estoque)
+               WHERE cod_admin IS NOT NULL
+               GROUP BY cod_admin''',
+        ) + _gatilhos_resumo(),
+        # 6 - Livro de movimentos do estoque (somente inclusão), alimentado por gatilhos na mesma
+        # transação da alteração, e instantâneos periódicos das quantidades
+        (
+            '''CREATE TABLE IF NOT EXISTS movimento_estoque (
+                id INTEGER PRIMARY KEY,
+                cod_estoque INTEGER NOT NULL,
+                delta INTEGER NOT NULL,
+                motivo VARCHAR(20),
+                cod_admin INTEGER,
+                momento REAL NOT NULL
+            )''',
+            'CREATE INDEX IF NOT EXISTS idx_movimento_estoque_estoque ON movimento_estoque (cod_estoque)',
+            'CREATE INDEX IF NOT EXISTS idx_movimento_estoque_momento ON movimento_estoque (momento)',
+            # Motivo e administrador da transação corrente, gravados pelas operações antes de alterar o estoque
+            '''CREATE TABLE IF NOT EXISTS contexto_movimento (
+                motivo VARCHAR(20),
+                cod_admin INTEGER
+            )''',
+            'INSERT INTO contexto_movimento (motivo, cod_admin) VALUES (NULL, NULL)',
+            '''CREATE TABLE IF NOT EXISTS instantaneo_estoque (
+                id INTEGER PRIMARY KEY,
+                momento REAL NOT NULL,
+                ultimo_movimento INTEGER NOT NULL
+            )''',
+            '''CREATE TABLE IF NOT EXISTS instantaneo_item (
+                cod_instantaneo INTEGER NOT NULL,
+                cod_estoque INTEGER NOT NULL,
+                quantidade INTEGER NOT NULL,
+                PRIMARY KEY (cod_instantaneo, cod_estoque)
+            ) WITHOUT ROWID''',
+            # Instantâneo inicial com as quantidades existentes antes do livro
+            '''INSERT INTO instantaneo_estoque (id, momento, ultimo_movimento)
+               VALUES (1, (julianday('now') - 2440587.5) * 86400.0, 0)''',
+            '''INSERT INTO instantaneo_item (cod_instantaneo, cod_estoque, quantidade)
+               SELECT 1, cod, quantidade FROM estoque WHERE coalesce(quantidade, 0) != 0''',
+            '''CREATE TRIGGER IF NOT EXISTS movimento_estoque_ai AFTER INSERT ON estoque
+               WHEN coalesce(NEW.quantidade, 0) != 0 BEGIN
+                INSERT INTO movimento_estoque (cod_estoque, delta, motivo, cod_admin, momento)
+                SELECT NEW.cod, NEW.quantidade, motivo, cod_admin, (julianday('now') - 2440587.5) * 86400.0
+                FROM contexto_movimento;
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS movimento_estoque_au AFTER UPDATE OF cod, quantidade ON estoque
+               WHEN OLD.cod IS NOT NEW.cod OR OLD.quantidade IS NOT NEW.quantidade BEGIN
+                INSERT INTO movimento_estoque (cod_estoque, delta, motivo, cod_admin, momento)
+                SELECT OLD.cod, -coalesce(OLD.quantidade, 0), motivo, cod_admin,
+                       (julianday('now') - 2440587.5) * 86400.0
+                FROM contexto_movimento WHERE OLD.cod IS NOT NEW.cod AND coalesce(OLD.quantidade, 0) != 0;
+                INSERT INTO movimento_estoque (cod_estoque, delta, motivo, cod_admin, momento)
+                SELECT NEW.cod, coalesce(NEW.quantidade, 0)
+                           - CASE WHEN OLD.cod IS NEW.cod THEN coalesce(OLD.quantidade, 0) ELSE 0 END,
+                       motivo, cod_admin, (julianday('now') - 2440587.5) * 86400.0
+                FROM contexto_movimento
+                WHERE coalesce(NEW.quantidade, 0)
+                          != CASE WHEN OLD.cod IS NEW.cod THEN coalesce(OLD.quantidade, 0) ELSE 0 END;
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS movimento_estoque_ad AFTER DELETE ON estoque
+               WHEN coalesce(OLD.quantidade, 0) != 0 BEGIN
+                INSERT INTO movimento_estoque (cod_estoque, delta, motivo, cod_admin, momento)
+                SELECT OLD.cod, -OLD.quantidade, motivo, cod_admin, (julianday('now') - 2440587.5) * 86400.0
+                FROM contexto_movimento;
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS movimento_estoque_imutavel_au BEFORE UPDATE ON movimento_estoque BEGIN
+                SELECT RAISE(ABORT, 'movimento_estoque é somente inclusão');
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS movimento_estoque_imutavel_ad BEFORE DELETE ON movimento_estoque BEGIN
+                SELECT RAISE(ABORT, 'movimento_estoque é somente inclusão');
+            END''',
+        ),
+        # 7 - Registro dos produtos alterados (cadastro, preço, categoria, remoção), usado na
+        # atualização incremental de cópias do catálogo; as quantidades vêm de movimento_estoque
+        (
+            '''CREATE TABLE IF NOT EXISTS alteracao_produto (
+                seq INTEGER PRIMARY KEY,
+                cod INTEGER NOT NULL
+            )''',
+            '''CREATE TRIGGER IF NOT EXISTS alteracao_produto_ai AFTER INSERT ON produto BEGIN
+                INSERT INTO alteracao_produto (cod) VALUES (NEW.cod);
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS alteracao_produto_au AFTER UPDATE ON produto BEGIN
+                INSERT INTO alteracao_produto (cod) SELECT OLD.cod WHERE OLD.cod IS NOT NEW.cod;
+                INSERT INTO alteracao_produto (cod) VALUES (NEW.cod);
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS alteracao_produto_ad AFTER DELETE ON produto BEGIN
+                INSERT INTO alteracao_produto (cod) VALUES (OLD.cod);
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS alteracao_categoria_ai AFTER INSERT ON categoria_produto BEGIN
+                INSERT INTO alteracao_produto (cod) VALUES (NEW.cod_produto);
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS alteracao_categoria_au AFTER UPDATE ON categoria_produto BEGIN
+                INSERT INTO alteracao_produto (cod) SELECT OLD.cod_produto WHERE OLD.cod_produto IS NOT NEW.cod_produto;
+                INSERT INTO alteracao_produto (cod) VALUES (NEW.cod_produto);
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS alteracao_categoria_ad AFTER DELETE ON categoria_produto BEGIN
+                INSERT INTO alteracao_produto (cod) VALUES (OLD.cod_produto);
+            END''',
+        ),
+        # 8 - Índice de localidade das farmácias: chaves normalizadas de CEP, bairro e rua
+        # ('cep:01310100', 'bairro:vila mariana'), ordenadas para busca por prefixo
+        (
+            '''CREATE TABLE IF NOT EXISTS localidade_farmacia (
+                chave VARCHAR(120) NOT NULL,
+                cod_farmacia INTEGER NOT NULL,
+                PRIMARY KEY (chave, cod_farmacia)
+            ) WITHOUT ROWID''',
+            'CREATE INDEX IF NOT EXISTS idx_localidade_farmacia_farmacia ON localidade_farmacia (cod_farmacia)',
+            lambda conn: OperacoesFarmacia.indexar_localidades(conn),
+        ),
+        # 9 - Limites de reposição por produto ou por categoria e fila de alertas de estoque baixo,
+        # alimentada por gatilho só quando a quantidade passa de >= limite para < limite
+        (
+            '''CREATE TABLE IF NOT EXISTS limite_produto (
+                cod_produto INTEGER PRIMARY KEY,
+                limite INTEGER NOT NULL
+            )''',
+            '''CREATE TABLE IF NOT EXISTS limite_categoria (
+                categoria VARCHAR(50) PRIMARY KEY,
+                limite INTEGER NOT NULL
+            )''',
+            '''CREATE TABLE IF NOT EXISTS alerta_estoque (
+                id INTEGER PRIMARY KEY,
+                cod_produto INTEGER NOT NULL,
+                quantidade INTEGER NOT NULL,
+                limite INTEGER NOT NULL,
+                momento REAL NOT NULL
+            )''',
+            # Só as reduções pagam a busca do limite; o limite do produto prevalece sobre o da categoria.
+            '''CREATE TRIGGER IF NOT EXISTS alerta_estoque_au AFTER UPDATE OF quantidade ON estoque
+               WHEN NEW.quantidade < OLD.quantidade BEGIN
+                INSERT INTO alerta_estoque (cod_produto, quantidade, limite, momento)
+                SELECT cod, NEW.quantidade, limite, (julianday('now') - 2440587.5) * 86400.0
+                FROM (SELECT p.cod, coalesce(
+                          (SELECT limite FROM limite_produto WHERE cod_produto = p.cod),
+                          (SELECT min(l.limite) FROM categoria_produto c
+                           JOIN limite_categoria l ON l.categoria = c.categoria
+                           WHERE c.cod_produto = p.cod)) AS limite
+                      FROM produto p WHERE p.cod_estoque = NEW.cod)
+                WHERE NEW.quantidade < limite AND OLD.quantidade >= limite;
+            END''',
+        ),
+        # 10 - Índices das listagens paginadas por chave (ordem por nome e por preço; o código,
+        # chave primária, completa cada índice e desempata a ordenação)
+        (
+            "CREATE INDEX IF NOT EXISTS idx_produto_nome_pagina ON produto (ifnull(lower(nome), ''))",
+            'CREATE INDEX IF NOT EXISTS idx_produto_preco_pagina ON produto (ifnull(preco, 0))',
+            "CREATE INDEX IF NOT EXISTS idx_farmacia_nome_pagina ON farmacia (ifnull(lower(nome), ''))",
+        ),
+        # 11 - Histórico de preços em trechos: cada linha vale de `inicio` até a linha seguinte
+        # do mesmo produto; preço NULL marca o produto removido. Alimentado por gatilhos em produto.
+        (
+            '''CREATE TABLE IF NOT EXISTS historico_preco (
+                cod_produto INTEGER NOT NULL,
+                inicio REAL NOT NULL,
+                preco DOUBLE PRECISION,
+                PRIMARY KEY (cod_produto, inicio)
+            ) WITHOUT ROWID''',
+            'CREATE INDEX IF NOT EXISTS idx_historico_preco_inicio ON historico_preco (inicio)',
+            '''INSERT OR REPLACE INTO historico_preco (cod_produto, inicio, preco)
+               SELECT cod, (julianday('now') - 2440587.5) * 86400.0, preco FROM produto''',
+            '''CREATE TRIGGER IF NOT EXISTS historico_preco_ai AFTER INSERT ON produto BEGIN
+                INSERT OR REPLACE INTO historico_preco (cod_produto, inicio, preco)
+                VALUES (NEW.cod, (julianday('now') - 2440587.5) * 86400.0, NEW.preco);
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS historico_preco_au AFTER UPDATE OF cod, preco ON produto
+               WHEN NEW.preco IS NOT OLD.preco OR NEW.cod IS NOT OLD.cod BEGIN
+                INSERT OR REPLACE INTO historico_preco (cod_produto, inicio, preco)
+                SELECT OLD.cod, (julianday('now') - 2440587.5) * 86400.0, NULL WHERE OLD.cod IS NOT NEW.cod;
+                INSERT OR REPLACE INTO historico_preco (cod_produto, inicio, preco)
+                VALUES (NEW.cod, (julianday('now') - 2440587.5) * 86400.0, NEW.preco);
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS historico_preco_ad AFTER DELETE ON produto BEGIN
+                INSERT OR REPLACE INTO historico_preco (cod_produto, inicio, preco)
+                VALUES (OLD.cod, (julianday('now') - 2440587.5) * 86400.0, NULL);
+            END''',
+        ),
+        # 12 - Índice "comprados juntos": para cada produto, os vizinhos mais frequentes
+        # (no máximo OperacoesRecomendacao.MAX_VIZINHOS por produto, nos dois sentidos do par)
+        (
+            '''CREATE TABLE IF NOT EXISTS coocorrencia (
+                cod_produto INTEGER NOT NULL,
+                cod_vizinho INTEGER NOT NULL,
+                contagem INTEGER NOT NULL,
+                PRIMARY KEY (cod_produto, cod_vizinho)
+            ) WITHOUT ROWID''',
+        ),
+        # 13 - Motivo e administrador dos movimentos lidos do estado da conexão pelas funções
+        # motivo_movimento() e admin_movimento() (registradas em conectar()), no lugar da linha
+        # única de contexto_movimento que toda gravação de estoque atualizava. Conexões abertas
+        # fora do sistema precisam registrar as duas funções para alterar o estoque (ver
+        # OperacoesMovimentos.registrar_funcoes); sem elas, a gravação falha e nada é alterado.
+        (
+            'DROP TRIGGER IF EXISTS movimento_estoque_ai',
+            'DROP TRIGGER IF EXISTS movimento_estoque_au',
+            'DROP TRIGGER IF EXISTS movimento_estoque_ad',
+            '''CREATE TRIGGER IF NOT EXISTS movimento_estoque_ai AFTER INSERT ON estoque
+               WHEN coalesce(NEW.quantidade, 0) != 0 BEGIN
+                INSERT INTO movimento_estoque (cod_estoque, delta, motivo, cod_admin, momento)
+                VALUES (NEW.cod, NEW.quantidade, motivo_movimento(), admin_movimento(),
+                        (julianday('now') - 2440587.5) * 86400.0);
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS movimento_estoque_au AFTER UPDATE OF cod, quantidade ON estoque
+               WHEN OLD.cod IS NOT NEW.cod OR OLD.quantidade IS NOT NEW.quantidade BEGIN
+                INSERT INTO movimento_estoque (cod_estoque, delta, motivo, cod_admin, momento)
+                SELECT OLD.cod, -coalesce(OLD.quantidade, 0), motivo_movimento(), admin_movimento(),
+                       (julianday('now') - 2440587.5) * 86400.0
+                WHERE OLD.cod IS NOT NEW.cod AND coalesce(OLD.quantidade, 0) != 0;
+                INSERT INTO movimento_estoque (cod_estoque, delta, motivo, cod_admin, momento)
+                SELECT NEW.cod, coalesce(NEW.quantidade, 0)
+                           - CASE WHEN OLD.cod IS NEW.cod THEN coalesce(OLD.quantidade, 0) ELSE 0 END,
+                       motivo_movimento(), admin_movimento(), (julianday('now') - 2440587.5) * 86400.0
+                WHERE coalesce(NEW.quantidade, 0)
+                          != CASE WHEN OLD.cod IS NEW.cod THEN coalesce(OLD.quantidade, 0) ELSE 0 END;
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS movimento_estoque_ad AFTER DELETE ON estoque
+               WHEN coalesce(OLD.quantidade, 0) != 0 BEGIN
+                INSERT INTO movimento_estoque (cod_estoque, delta, motivo, cod_admin, momento)
+                VALUES (OLD.cod, -OLD.quantidade, motivo_movimento(), admin_movimento(),
+                        (julianday('now') - 2440587.5) * 86400.0);
+            END''',
+            'DROP TABLE IF EXISTS contexto_movimento',
+        ),
+        # 14 - alteracao_produto com uma linha por produto, cujo seq passa ao próximo valor a cada
+        # alteração: as cópias do catálogo seguem lendo "seq > marcador", mas a tabela deixa de crescer
+        # a cada gravação e fica limitada ao número de produtos
+        (
+            'DROP TRIGGER IF EXISTS alteracao_produto_ai',
+            'DROP TRIGGER IF EXISTS alteracao_produto_au',
+            'DROP TRIGGER IF EXISTS alteracao_produto_ad',
+            'DROP TRIGGER IF EXISTS alteracao_categoria_ai',
+            'DROP TRIGGER IF EXISTS alteracao_categoria_au',
+            'DROP TRIGGER IF EXISTS alteracao_categoria_ad',
+            '''CREATE TABLE IF NOT EXISTS alteracao_produto_nova (
+                cod INTEGER PRIMARY KEY,
+                seq INTEGER NOT NULL
+            )''',
+            '''INSERT INTO alteracao_produto_nova (cod, seq)
+               SELECT cod, max(seq) FROM alteracao_produto GROUP BY cod''',
+            'DROP TABLE alteracao_produto',
+            'ALTER TABLE alteracao_produto_nova RENAME TO alteracao_produto',
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_alteracao_produto_seq ON alteracao_produto (seq)',
+            '''CREATE TRIGGER IF NOT EXISTS alteracao_produto_ai AFTER INSERT ON produto BEGIN
+                INSERT INTO alteracao_produto (cod, seq)
+                VALUES (NEW.cod, (SELECT coalesce(max(seq), 0) + 1 FROM alteracao_produto))
+                ON CONFLICT (cod) DO UPDATE SET seq = excluded.seq;
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS alteracao_produto_au AFTER UPDATE ON produto BEGIN
+                INSERT INTO alteracao_produto (cod, seq)
+                SELECT OLD.cod, (SELECT coalesce(max(seq), 0) + 1 FROM alteracao_produto)
+                WHERE OLD.cod IS NOT NEW.cod
+                ON CONFLICT (cod) DO UPDATE SET seq = excluded.seq;
+                INSERT INTO alteracao_produto (cod, seq)
+                VALUES (NEW.cod, (SELECT coalesce(max(seq), 0) + 1 FROM alteracao_produto))
+                ON CONFLICT (cod) DO UPDATE SET seq = excluded.seq;
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS alteracao_produto_ad AFTER DELETE ON produto BEGIN
+                INSERT INTO alteracao_produto (cod, seq)
+                VALUES (OLD.cod, (SELECT coalesce(max(seq), 0) + 1 FROM alteracao_produto))
+                ON CONFLICT (cod) DO UPDATE SET seq = excluded.seq;
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS alteracao_categoria_ai AFTER INSERT ON categoria_produto BEGIN
+                INSERT INTO alteracao_produto (cod, seq)
+                VALUES (NEW.cod_produto, (SELECT coalesce(max(seq), 0) + 1 FROM alteracao_produto))
+                ON CONFLICT (cod) DO UPDATE SET seq = excluded.seq;
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS alteracao_categoria_au AFTER UPDATE ON categoria_produto BEGIN
+                INSERT INTO alteracao_produto (cod, seq)
+                SELECT OLD.cod_produto, (SELECT coalesce(max(seq), 0) + 1 FROM alteracao_produto)
+                WHERE OLD.cod_produto IS NOT NEW.cod_produto
+                ON CONFLICT (cod) DO UPDATE SET seq = excluded.seq;
+                INSERT INTO alteracao_produto (cod, seq)
+                VALUES (NEW.cod_produto, (SELECT coalesce(max(seq), 0) + 1 FROM alteracao_produto))
+                ON CONFLICT (cod) DO UPDATE SET seq = excluded.seq;
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS alteracao_categoria_ad AFTER DELETE ON categoria_produto BEGIN
+                INSERT INTO alteracao_produto (cod, seq)
+                VALUES (OLD.cod_produto, (SELECT coalesce(max(seq), 0) + 1 FROM alteracao_produto))
+                ON CONFLICT (cod) DO UPDATE SET seq = excluded.seq;
+            END''',
+        ),
+    ]
+
+    @staticmethod
+    def versao_esquema(conn: sqlite3.Connection) -> int:
+        """
+        Retorna a versão do esquema gravada no banco (PRAGMA user_version).
+        """
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+
+    @staticmethod
+    def criar_tabelas(migracoes: list = None) -> None:
+        """
+        Cria ou atualiza o esquema do banco aplicando as migrações pendentes (por padrão,
+        BancoDeDados.MIGRACOES). Bancos já na versão atual não executam nenhum comando DDL.
+        """
+        migracoes = BancoDeDados.MIGRACOES if migracoes is None else migracoes
+        try:
+            conn = BancoDeDados.conectar()
+        except sqlite3.Error as e:
+            print(f"Erro ao criar tabelas: {e}")
+            return
+        try:
+            versao_atual = len(migracoes)
+            if BancoDeDados.versao_esquema(conn) >= versao_atual:
+                return
+            conn.execute('BEGIN IMMEDIATE')
+            # Relê a versão com a trava de escrita, pois outro processo pode ter migrado antes.
+            versao = BancoDeDados.versao_esquema(conn)
+            for indice in range(versao, versao_atual):
+                for instrucao in migracoes[indice]:
+                    # Passos que não se expressam em SQL são funções que recebem a conexão.
+                    if callable(instrucao):
+                        instrucao(conn)
+                    else:
+                        conn.execute(instrucao)
+                conn.execute(f'PRAGMA user_version = {indice + 1}')
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Erro ao criar tabelas: {e}")
+        finally:
+            BancoDeDados.liberar(conn)
+
+
+class ReplicaLeitura:
+    """
+    Cópia somente leitura do banco principal, atualizada pela API de backup do SQLite em
+    passos de poucas páginas, para que o banco principal nunca fique travado por muito tempo.
+    Uma thread opcional refaz a cópia a cada intervalo; a defasagem é o tempo desde o início
+    da última cópia concluída, e acima de defasagem_maxima as leituras voltam ao banco principal.
+    """
+
+    def __init__(self, caminho: str, intervalo: float = 30.0, defasagem_maxima: float = None,
+                 paginas: int = 1024, pausa: float = 0.001, origem: str = None) -> None:
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self.defasagem_maxima = defasagem_maxima
+        self.paginas = paginas
+        self.pausa = pausa
+        self.origem = origem or BancoDeDados.NOME_DB
+        self.copias = 0
+        self._copiada_em = None
+        self._trava = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def atualizar(self) -> None:
+        """
+        Copia o banco principal para a réplica. Entre os passos a trava de leitura do banco
+        principal é liberada; se ele for alterado no meio da cópia, o SQLite a recomeça.
+        """
+        inicio = time.time()
+        origem = sqlite3.connect(self.origem)
+        try:
+            destino = sqlite3.connect(self.caminho)
+            try:
+                origem.backup(destino, pages=self.paginas, sleep=self.pausa)
+            finally:
+                destino.close()
+        finally:
+            origem.close()
+        with self._trava:
+            self._copiada_em = inicio
+            self.copias += 1
+
+    def defasagem(self) -> float:
+        """
+        Retorna, em segundos, o limite de atraso da réplica em relação ao banco principal,
+        ou None se ainda não houve cópia.
+        """
+        with self._trava:
+            copiada_em = self._copiada_em
+        return None if copiada_em is None else time.time() - copiada_em
+
+    def disponivel(self) -> bool:
+        """
+        Indica se a réplica já foi copiada e está dentro da defasagem máxima.
+        """
+        defasagem = self.defasagem()
+        return defasagem is not None and (self.defasagem_maxima is None or defasagem <= self.defasagem_maxima)
+
+    def iniciar(self) -> None:
+        """
+        Faz a primeira cópia e inicia a thread que refaz a cópia a cada intervalo.
+        """
+        if self._thread is None:
+            self.atualizar()
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._executar, name='replica-leitura', daemon=True)
+            self._thread.start()
+
+    def parar(self) -> None:
+        """
+        Encerra a thread de atualização.
+        """
+        if self._thread is not None:
+            self._parar.set()
+            self._thread.join()
+            self._thread = None
+
+    def _executar(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.atualizar()
+            except sqlite3.Error as e:
+                print(f"Erro ao atualizar a réplica de leitura: {e}")
+
+
+class Paginacao:
+    """
+    Paginação por chave (keyset): cada página continua da chave de ordenação da última linha
+    da anterior, com uma comparação de tuplas resolvida pelo índice, de modo que a página N
+    custa o mesmo que a primeira. A posição é entregue ao cliente como um cursor opaco.
+    """
+
+    @staticmethod
+    def codificar(ordem: str, chave: tuple) -> str:
+        """
+        Gera o cursor que continua a listagem na ordem informada depois da chave.
+        """
+        texto = json.dumps([ordem, list(chave)], separators=(',', ':'))
+        return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decodificar(cursor: str, ordem: str, quantidade_chaves: int) -> list:
+        """
+        Retorna a chave guardada no cursor. Lança ValueError se o cursor for inválido
+        ou tiver sido gerado para outra ordenação.
+        """
+        try:
+            ordem_cursor, chave = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except (ValueError, TypeError):
+            raise ValueError("Cursor inválido.") from None
+        if ordem_cursor != ordem or not isinstance(chave, list) or len(chave) != quantidade_chaves:
+            raise ValueError("Cursor inválido para esta ordenação.")
+        return chave
+
+    @staticmethod
+    def chaves(ordens: dict, ordem: str) -> tuple:
+        """
+        Retorna as expressões de ordenação de `ordem` ('nome', ou '-nome' para decrescente).
+        """
+        chaves = ordens.get(ordem[1:] if ordem.startswith('-') else ordem)
+        if chaves is None:
+            raise ValueError(f"Ordenação desconhecida: {ordem}. Use {', '.join(ordens)}.")
+        return chaves
+
+    @staticmethod
+    def consultar(conn: sqlite3.Connection, selecao: str, origem: str, filtros: list, parametros: list,
+                  ordens: dict, ordem: str, limite: int, cursor: str = None) -> list:
+        """
+        Lê até limite + 1 linhas depois do cursor, cada uma seguida das suas chaves de ordenação.
+        """
+        if limite < 1:
+            raise ValueError("O limite deve ser positivo.")
+        chaves = Paginacao.chaves(ordens, ordem)
+        descendente = ordem.startswith('-')
+        filtros, parametros = list(filtros), list(parametros)
+        if cursor:
+            condicao, valores = Paginacao._depois(chaves, Paginacao.decodificar(cursor, ordem, len(chaves)),
+                                                  descendente)
+            filtros.append(condicao)
+            parametros += valores
+        onde = f"WHERE {' AND '.join(filtros)}" if filtros else ''
+        direcao = ' DESC' if descendente else ''
+        return conn.execute(
+            f'''SELECT {selecao}, {', '.join(chaves)} FROM {origem} {onde}
+                ORDER BY {', '.join(chave + direcao for chave in chaves)} LIMIT ?''',
+            parametros + [limite + 1]
+        ).fetchall()
+
+    @staticmethod
+    def _depois(chaves: tuple, valores: list, descendente: bool) -> tuple:
+        # Equivale a (k1, k2) > (v1, v2), escrito como k1 >= v1 AND (k1 > v1 OR k2 > v2) para
+        # que o SQLite busque a posição no índice da primeira chave em vez de percorrê-lo.
+        estrito, amplo = ('<', '<=') if descendente else ('>', '>=')
+        if len(chaves) == 1:
+            return f'{chaves[0]} {estrito} ?', [valores[0]]
+        resto, parametros = Paginacao._depois(chaves[1:], valores[1:], descendente)
+        return (f'{chaves[0]} {amplo} ? AND ({chaves[0]} {estrito} ? OR ({resto}))',
+                [valores[0], valores[0]] + parametros)
+
+    @staticmethod
+    def pagina(linhas: list, ordem: str, quantidade_chaves: int, limite: int) -> tuple:
+        """
+        Separa a página das linhas lidas por consultar(): retorna (linhas sem as chaves,
+        cursor da próxima página ou None na última).
+        """
+        proximo = None
+        if len(linhas) > limite:
+            proximo = Paginacao.codificar(ordem, linhas[limite - 1][-quantidade_chaves:])
+        return [linha[:-quantidade_chaves] for linha in linhas[:limite]], proximo
+
+
+class SessaoAdministrador:
+    """
+    Contexto de um administrador autenticado, identificado por um token opaco.
+    Cada terminal ou cliente mantém a sua, permitindo vários administradores no mesmo processo.
+    """
+
+    def __init__(self, cpf: int, validade: float) -> None:
+        self.cpf = cpf
+        self.token = secrets.token_urlsafe(32)
+        self.expira_em = time.monotonic() + validade
+
+    def expirada(self) -> bool:
+        """
+        Indica se a sessão já passou da validade.
+        """
+        return self.expira_em < time.monotonic()
+
+
+class CacheSessoes:
+    """
+    Sessões abertas por token e credenciais já conferidas, ambas com validade (TTL),
+    para que operações autorizadas repetidas não consultem o banco nem recalculem o hash.
+    As senhas nunca são guardadas: a chave das credenciais é um HMAC com segredo do processo.
+    """
+
+    def __init__(self, capacidade: int = 1024, ttl: float = 1800.0) -> None:
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self._sessoes = {}
+        self._credenciais = OrderedDict()
+        self._segredo = secrets.token_bytes(32)
+        self._trava = threading.Lock()
+
+    def _chave(self, cpf: int, senha: str) -> tuple:
+        return cpf, hmac.new(self._segredo, senha.encode('utf-8'), hashlib.sha256).digest()
+
+    def abrir(self, cpf: int) -> SessaoAdministrador:
+        """
+        Cria e registra uma nova sessão para o administrador. Com o cache cheio, descarta
+        as sessões expiradas e, se ainda faltar espaço, a sessão mais antiga.
+        """
+        sessao = SessaoAdministrador(cpf, self.ttl)
+        with self._trava:
+            if len(self._sessoes) >= self.capacidade:
+                agora = time.monotonic()
+                for token in [t for t, s in self._sessoes.items() if s.expira_em < agora]:
+                    del self._sessoes[token]
+            # O dicionário mantém a ordem de abertura: a primeira sessão é a mais antiga.
+            while self._sessoes and len(self._sessoes) >= self.capacidade:
+                del self._sessoes[next(iter(self._sessoes))]
+            self._sessoes[sessao.token] = sessao
+        return sessao
+
+    def obter(self, token: str) -> SessaoAdministrador:
+        """
+        Retorna a sessão do token, ou None se inexistente ou expirada.
+        """
+        with self._trava:
+            sessao = self._sessoes.get(token)
+            if sessao is not None and sessao.expirada():
+                del self._sessoes[token]
+                return None
+            return sessao
+
+    def encerrar(self, token: str) -> bool:
+        """
+        Encerra a sessão do token. Retorna False se ela não existia.
+        """
+        with self._trava:
+            return self._sessoes.pop(token, None) is not None
+
+    def credencial_conferida(self, cpf: int, senha: str) -> bool:
+        """
+        Indica se o par CPF/senha já foi validado no banco e ainda está dentro da validade.
+        """
+        chave = self._chave(cpf, senha)
+        with self._trava:
+            expira_em = self._credenciais.get(chave)
+            if expira_em is None:
+                return False
+            if expira_em < time.monotonic():
+                del self._credenciais[chave]
+                return False
+            self._credenciais.move_to_end(chave)
+            return True
+
+    def registrar_credencial(self, cpf: int, senha: str) -> None:
+        """
+        Memoriza um par CPF/senha validado no banco.
+        """
+        chave = self._chave(cpf, senha)
+        with self._trava:
+            self._credenciais[chave] = time.monotonic() + self.ttl
+            self._credenciais.move_to_end(chave)
+            while len(self._credenciais) > self.capacidade:
+                self._credenciais.popitem(last=False)
+
+    def invalidar(self, cpf: int) -> None:
+        """
+        Descarta as credenciais memorizadas e as sessões do administrador (ex.: troca de senha).
+        """
+        with self._trava:
+            for chave in [chave for chave in self._credenciais if chave[0] == cpf]:
+                del self._credenciais[chave]
+            for token in [t for t, sessao in self._sessoes.items() if sessao.cpf == cpf]:
+                del self._sessoes[token]
+
+
+class OperacoesAdministrador:
+    """
+    Operações relacionadas ao administrador do sistema.
+    """
+    # Sessão do terminal interativo; clientes do serviço usam suas próprias sessões.
+    sessao_atual = None
+    sessoes = CacheSessoes()
+    # Custo do hash das senhas (iterações do PBKDF2). Hashes antigos são refeitos no próximo login.
+    ITERACOES_HASH = 200_000
+    ALGORITMO_HASH = 'pbkdf2_sha256'
+
+    @staticmethod
+    def gerar_hash_senha(senha: str, iteracoes: int = None) -> str:
+        """
+        Gera o hash salgado da senha no formato algoritmo$iteracoes$sal$hash.
+        """
+        iteracoes = iteracoes or OperacoesAdministrador.ITERACOES_HASH
+        sal = secrets.token_bytes(16)
+        resumo = hashlib.pbkdf2_hmac('sha256', senha.encode('utf-8'), sal, iteracoes)
+        return f'{OperacoesAdministrador.ALGORITMO_HASH}${iteracoes}${sal.hex()}${resumo.hex()}'
+
+    @staticmethod
+    def conferir_senha(senha: str, armazenada: str) -> bool:
+        """
+        Confere a senha com o valor armazenado, aceitando também senhas
+        legadas gravadas em texto puro. Um hash malformado não confere com nenhuma senha.
+        """
+        if armazenada is None:
+            return False
+        partes = armazenada.split('$')
+        if len(partes) != 4 or partes[0] != OperacoesAdministrador.ALGORITMO_HASH:
+            return hmac.compare_digest(senha.encode('utf-8'), armazenada.encode('utf-8'))
+        _, iteracoes, sal, resumo = partes
+        try:
+            calculado = hashlib.pbkdf2_hmac('sha256', senha.encode('utf-8'), bytes.fromhex(sal), int(iteracoes))
+        except (ValueError, OverflowError):
+            return False
+        return hmac.compare_digest(calculado.hex(), resumo)
+
+    @staticmethod
+    def _hash_desatualizado(armazenada: str) -> bool:
+        partes = armazenada.split('$')
+        if len(partes) != 4 or partes[0] != OperacoesAdministrador.ALGORITMO_HASH:
+            return True
+        try:
+            return int(partes[1]) != OperacoesAdministrador.ITERACOES_HASH
+        except ValueError:
+            return True
+
+    @staticmethod
+    def registrar_administrador(cpf: int, email: str, senha: str) -> None:
+        """
+        Grava um novo administrador (pessoa e administrador) com a senha em hash.
+        Lança sqlite3.IntegrityError se o CPF já existir.
+        """
+        senha_hash = OperacoesAdministrador.gerar_hash_senha(senha)
+        with BancoDeDados.transacao() as conn:
+            # Insere CPF na tabela pessoa
+            conn.execute('INSERT INTO pessoa (cpf) VALUES (?)', (cpf,))
+            # Insere administrador na tabela administrador
+            conn.execute(
+                'INSERT INTO administrador (email, senha, cod_pessoa) VALUES (?, ?, ?)',
+                (email, senha_hash, cpf)
+            )
+
+    @staticmethod
+    def alterar_senha(cpf: int, senha: str) -> bool:
+        """
+        Troca a senha do administrador, encerrando suas sessões abertas.
+        Retorna False se o administrador não existir.
+        """
+        senha_hash = OperacoesAdministrador.gerar_hash_senha(senha)
+        with BancoDeDados.transacao() as conn:
+            alterado = conn.execute('UPDATE administrador SET senha = ? WHERE cod_pessoa = ?',
+                                    (senha_hash, cpf)).rowcount > 0
+            BancoDeDados.apos_confirmar(lambda: OperacoesAdministrador.sessoes.invalidar(cpf))
+        return alterado
+
+    @staticmethod
+    def cadastrar_administrador() -> None:
+        """
+        Realiza o cadastro de um novo administrador.
+        Solicita CPF, e-mail e senha.
+        """
+        try:
+            cpf = int(input("CPF: "))
+            email = input("E-mail: ")
+            senha = input("Senha: ")
+            OperacoesAdministrador.registrar_administrador(cpf, email, senha)
+            print("Administrador cadastrado com sucesso!")
+            # Autentica logo após o cadastro
+            OperacoesAdministrador.autenticar_administrador()
+        except sqlite3.IntegrityError:
+            print("Erro: CPF já existe.")
+        except sqlite3.Error as e:
+            print(f"Erro ao cadastrar administrador: {e}")
+
+    @staticmethod
+    def verificar_credenciais(cpf: int, senha: str) -> bool:
+        """
+        Verifica se o CPF e a senha pertencem a um administrador cadastrado.
+        Credenciais já conferidas são respondidas pelo cache, sem banco nem hash;
+        senhas em texto puro ou com custo antigo são regravadas com o hash atual.
+        """
+        if OperacoesAdministrador.sessoes.credencial_conferida(cpf, senha):
+            return True
+        conn = BancoDeDados.conectar()
+        try:
+            admin = conn.execute(
+                'SELECT senha FROM administrador WHERE cod_pessoa = ?', (cpf,)
+            ).fetchone()
+        finally:
+            BancoDeDados.liberar(conn)
+        if admin is None or admin[0] is None or not OperacoesAdministrador.conferir_senha(senha, admin[0]):
+            return False
+        if OperacoesAdministrador._hash_desatualizado(admin[0]):
+            with BancoDeDados.transacao() as conn:
+                conn.execute('UPDATE administrador SET senha = ? WHERE cod_pessoa = ? AND senha = ?',
+                             (OperacoesAdministrador.gerar_hash_senha(senha), cpf, admin[0]))
+        OperacoesAdministrador.sessoes.registrar_credencial(cpf, senha)
+        return True
+
+    @staticmethod
+    def iniciar_sessao(cpf: int, senha: str) -> SessaoAdministrador:
+        """
+        Valida as credenciais e abre uma sessão para o administrador.
+        Retorna None se as credenciais forem inválidas.
+        """
+        if not OperacoesAdministrador.verificar_credenciais(cpf, senha):
+            return None
+        return OperacoesAdministrador.sessoes.abrir(cpf)
+
+    @staticmethod
+    def obter_sessao(token: str) -> SessaoAdministrador:
+        """
+        Retorna a sessão ativa do token, sem acessar o banco, ou None.
+        """
+        return OperacoesAdministrador.sessoes.obter(token)
+
+    @staticmethod
+    def encerrar_sessao(token: str) -> bool:
+        """
+        Encerra a sessão do token. Retorna False se ela não existia.
+        """
+        return OperacoesAdministrador.sessoes.encerrar(token)
+
+    @staticmethod
+    def admin_autenticado() -> int:
+        """
+        Retorna o CPF do administrador da sessão do terminal, ou None se não houver
+        sessão válida.
+        """
+        sessao = OperacoesAdministrador.sessao_atual
+        if sessao is None or sessao.expirada():
+            return None
+        return sessao.cpf
+
+    @staticmethod
+    def autenticar_administrador() -> bool:
+        """
+        Autentica um administrador.
+        Solicita CPF e senha.
+        Retorna True se a autenticação for bem-sucedida.
+        """
+        try:
+            print("\nLOGIN")
+            cpf = int(input("Digite o CPF: "))
+            senha = input("Digite a senha: ")
+            sessao = OperacoesAdministrador.iniciar_sessao(cpf, senha)
+            if sessao is not None:
+                OperacoesAdministrador.sessao_atual = sessao
+                return True
+            print("Credenciais inválidas!")
+            return False
+        except sqlite3.Error as e:
+            print(f"Erro ao autenticar administrador: {e}")
+            return False
+
+    @staticmethod
+    def administrador_existe() -> bool:
+        """
+        Verifica se já existe ao menos um administrador cadastrado.
+        """
+        try:
+            conn = BancoDeDados.conectar()
+        except sqlite3.Error as e:
+            print(f"Erro ao verificar administradores: {e}")
+            return False
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM administrador')
+            count = cursor.fetchone()[0]
+            return count > 0
+        except sqlite3.Error as e:
+            print(f"Erro ao verificar administradores: {e}")
+            return False
+        finally:
+            BancoDeDados.liberar(conn)
+
+
+class OperacoesUsuario:
+    """
+    Operações relacionadas ao cadastro de usuários.
+    """
+
+    @staticmethod
+    def registrar_usuario(cpf: int, telefone: str) -> None:
+        """
+        Grava um novo usuário (pessoa, usuário e telefone) numa única transação.
+        Lança sqlite3.IntegrityError se o CPF já existir.
+        """
+        with BancoDeDados.transacao() as conn:
+            # Insere CPF na tabela pessoa
+            conn.execute('INSERT INTO pessoa (cpf) VALUES (?)', (cpf,))
+            # Insere usuário na tabela usuario
+            conn.execute('INSERT INTO usuario (cod_pessoa) VALUES (?)', (cpf,))
+            # Insere telefone na tabela tel_usuario
+            conn.execute(
+                'INSERT INTO tel_usuario (numero, cod_usuario) VALUES (?, ?)',
+                (telefone, cpf)
+            )
+
+    @staticmethod
+    def listar_usuarios(limite: int = 50, cursor: str = None) -> tuple:
+        """
+        Lista os usuários em ordem de CPF, paginados por chave. Retorna (linhas, próximo cursor),
+        com linhas (CPF, telefones separados por ';') e cursor None na última página.
+        """
+        with BancoDeDados.leitura():
+            conn = BancoDeDados.conectar()
+        try:
+            linhas = Paginacao.consultar(
+                conn, '''u.cod_pessoa, (SELECT group_concat(t.numero, ';') FROM tel_usuario t
+                                          WHERE t.cod_usuario = u.cod_pessoa)''',
+                'usuario u', [], [], {'cpf': ('u.cod_pessoa',)}, 'cpf', limite, cursor)
+        finally:
+            BancoDeDados.liberar(conn)
+        return Paginacao.pagina(linhas, 'cpf', 1, limite)
+
+    @staticmethod
+    def cadastrar_usuario() -> None:
+        """
+        Realiza o cadastro de um novo usuário.
+        Solicita CPF e telefone.
+        """
+        try:
+            cpf = int(input("CPF: "))
+            telefone = input("Telefone: ")
+            OperacoesUsuario.registrar_usuario(cpf, telefone)
+            print("Usuário cadastrado com sucesso!")
+        except sqlite3.IntegrityError:
+            print("Já existe um usuário com este CPF.")
+        except sqlite3.Error as e:
+            print(f"Erro ao cadastrar usuário: {e}")
+
+
+class RoteadorFarmacias:
+    """
+    Particionamento horizontal dos dados das farmácias (farmacia, tel_farmacia, usuario_farmacia)
+    em vários arquivos de banco, escolhidos pelo código da farmácia. As tabelas globais
+    (pessoa, administrador, produtos) permanecem no banco principal, BancoDeDados.NOME_DB.
+    Consultas que envolvem todas as farmácias são distribuídas em paralelo entre as partições.
+    """
+
+    # Esquema das partições: só as tabelas das farmácias, sem as chaves estrangeiras para as
+    # tabelas globais (administrador, usuario), que ficam no banco principal. A versão de cada
+    # partição é controlada à parte, pelo PRAGMA user_version dela.
+    MIGRACOES = [
+        # 1 - Farmácias, telefones, clientes por farmácia e índice de localidade
+        (
+            '''CREATE TABLE IF NOT EXISTS farmacia (
+                cod INTEGER PRIMARY KEY,
+                nome VARCHAR(100),
+                rua VARCHAR(100),
+                num INTEGER,
+                bairro VARCHAR(50),
+                cep VARCHAR(20),
+                hora_inicio VARCHAR(5),
+                hora_fim VARCHAR(5),
+                dia_funcionamento VARCHAR(20),
+                cod_admin INTEGER
+            )''',
+            '''CREATE TABLE IF NOT EXISTS tel_farmacia (
+                numero VARCHAR(20),
+                cod_farmacia INTEGER,
+                FOREIGN KEY (cod_farmacia) REFERENCES farmacia(cod)
+            )''',
+            '''CREATE TABLE IF NOT EXISTS usuario_farmacia (
+                cod_usuario INTEGER,
+                cod_farmacia INTEGER,
+                FOREIGN KEY (cod_farmacia) REFERENCES farmacia(cod)
+            )''',
+            '''CREATE TABLE IF NOT EXISTS localidade_farmacia (
+                chave VARCHAR(120) NOT NULL,
+                cod_farmacia INTEGER NOT NULL,
+                PRIMARY KEY (chave, cod_farmacia)
+            ) WITHOUT ROWID''',
+            'CREATE INDEX IF NOT EXISTS idx_farmacia_admin ON farmacia (cod_admin)',
+            "CREATE INDEX IF NOT EXISTS idx_farmacia_nome_pagina ON farmacia (ifnull(lower(nome), ''))",
+            'CREATE INDEX IF NOT EXISTS idx_tel_farmacia_farmacia ON tel_farmacia (cod_farmacia)',
+            'CREATE INDEX IF NOT EXISTS idx_usuario_farmacia_usuario ON usuario_farmacia (cod_usuario)',
+            'CREATE INDEX IF NOT EXISTS idx_usuario_farmacia_farmacia ON usuario_farmacia (cod_farmacia)',
+            'CREATE INDEX IF NOT EXISTS idx_localidade_farmacia_farmacia ON localidade_farmacia (cod_farmacia)',
+        ),
+    ]
+
+    def __init__(self, bancos: list, trabalhadores: int = None) -> None:
+        if not bancos:
+            raise ValueError("É necessário ao menos uma partição.")
+        self.bancos = list(bancos)
+        self._executor = ThreadPoolExecutor(max_workers=trabalhadores or len(self.bancos),
+                                            thread_name_prefix='particao')
+
+    @staticmethod
+    def nomes_particoes(nome_db: str, quantidade: int) -> list:
+        """
+        Gera os nomes das partições a partir do banco principal, ex.: pharmanalytics.farmacias-0.db.
+        """
+        base, extensao = os.path.splitext(nome_db)
+        return [f'{base}.farmacias-{indice}{extensao or ".db"}' for indice in range(quantidade)]
+
+    def banco(self, cod_farmacia: int) -> str:
+        """
+        Retorna a partição que guarda a farmácia com o código informado.
+        """
+        return self.bancos[cod_farmacia % len(self.bancos)]
+
+    def criar_tabelas(self) -> None:
+        """
+        Cria ou atualiza o esquema das farmácias (RoteadorFarmacias.MIGRACOES) em todas as partições.
+        """
+        for banco in self.bancos:
+            with BancoDeDados.usando(banco):
+                BancoDeDados.criar_tabelas(RoteadorFarmacias.MIGRACOES)
+
+    @staticmethod
+    def _executar(banco: str, funcao, argumentos: tuple):
+        with BancoDeDados.usando(banco):
+            return funcao(*argumentos)
+
+    def distribuir(self, funcao, *argumentos) -> list:
+        """
+        Executa a função em cada partição, em paralelo, e retorna a lista dos resultados.
+        """
+        futuros = [self._executor.submit(RoteadorFarmacias._executar, banco, funcao, argumentos)
+                   for banco in self.bancos]
+        return [futuro.result() for futuro in futuros]
+
+    def encerrar(self) -> None:
+        """
+        Encerra as threads usadas na distribuição das consultas.
+        """
+        self._executor.shutdown(wait=True)
+
+
+class OperacoesFarmacia:
+    """
+    Operações relacionadas ao gerenciamento de farmácias.
+    """
+    # Quando definido, os dados das farmácias ficam particionados entre os bancos do roteador.
+    roteador = None
+    # Ordenações da listagem paginada; cada uma termina no código, que desempata.
+    ORDENS = {'cod': ('f.cod',), 'nome': ("ifnull(lower(f.nome), '')", 'f.cod')}
+
+    @staticmethod
+    def _particao(codigo: int):
+        roteador = OperacoesFarmacia.roteador
+        return BancoDeDados.usando(roteador.banco(codigo)) if roteador is not None else nullcontext()
+
+    @staticmethod
+    def normalizar_localidade(texto: str) -> str:
+        """
+        Normaliza bairro ou rua para o índice de localidade: sem acentos, em minúsculas
+        e com espaços simples.
+        """
+        sem_acentos = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode('ascii')
+        return ' '.join(sem_acentos.lower().split())
+
+    @staticmethod
+    def _chaves_localidade(rua: str, bairro: str, cep: str) -> list:
+        chaves = [('cep', re.sub(r'\D', '', cep or '')),
+                  ('bairro', OperacoesFarmacia.normalizar_localidade(bairro)),
+                  ('rua', OperacoesFarmacia.normalizar_localidade(rua))]
+        return [f'{tipo}:{valor}' for tipo, valor in chaves if valor]
+
+    @staticmethod
+    def indexar_localidade(conn: sqlite3.Connection, codigo: int, rua: str, bairro: str, cep: str) -> None:
+        """
+        Substitui as chaves de localidade da farmácia, na transação corrente.
+        """
+        conn.execute('DELETE FROM localidade_farmacia WHERE cod_farmacia = ?', (codigo,))
+        conn.executemany('INSERT OR IGNORE INTO localidade_farmacia (chave, cod_farmacia) VALUES (?, ?)',
+                         ((chave, codigo) for chave in OperacoesFarmacia._chaves_localidade(rua, bairro, cep)))
+
+    @staticmethod
+    def indexar_localidades(conn: sqlite3.Connection) -> None:
+        """
+        Reconstrói o índice de localidade de todas as farmácias do banco da conexão,
+        na transação corrente (usado pela migração e por cargas feitas direto nas tabelas).
+        """
+        conn.execute('DELETE FROM localidade_farmacia')
+        conn.executemany(
+            'INSERT OR IGNORE INTO localidade_farmacia (chave, cod_farmacia) VALUES (?, ?)',
+            ((chave, cod) for cod, rua, bairro, cep in conn.execute('SELECT cod, rua, bairro, cep FROM farmacia')
+             for chave in OperacoesFarmacia._chaves_localidade(rua, bairro, cep))
+        )
+
+    @staticmethod
+    def registrar_farmacia(codigo: int, nome: str, telefone: str, rua: str, numero: int,
+                           bairro: str, cep: str, hora_inicio: str, hora_fim: str,
+                           dia_funcionamento: str, cod_admin: int) -> None:
+        """
+        Grava uma nova farmácia e seu telefone numa única transação.
+        Lança sqlite3.IntegrityError se o código já existir.
+        """
+        with OperacoesFarmacia._particao(codigo), BancoDeDados.transacao() as conn:
+            # Insere dados na tabela farmacia
+            conn.execute(
+                '''INSERT INTO farmacia (cod, nome, rua, num, bairro, cep,
+                   hora_inicio, hora_fim, dia_funcionamento, cod_admin)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                (codigo, nome, rua, numero, bairro, cep, hora_inicio,
+                 hora_fim, dia_funcionamento, cod_admin)
+            )
+            # Insere telefone na tabela tel_farmacia
+            conn.execute(
+                'INSERT INTO tel_farmacia (numero, cod_farmacia) VALUES (?, ?)',
+                (telefone, codigo)
+            )
+            OperacoesFarmacia.indexar_localidade(conn, codigo, rua, bairro, cep)
+
+    @staticmethod
+    def alterar_farmacia(codigo: int, nome: str, telefone: str, rua: str, numero: int,
+                         bairro: str, cep: str, hora_inicio: str, hora_fim: str,
+                         dia_funcionamento: str) -> bool:
+        """
+        Substitui os dados e o telefone da farmácia numa única transação.
+        Retorna False se a farmácia não existir.
+        """
+        with OperacoesFarmacia._particao(codigo), BancoDeDados.transacao() as conn:
+            cursor = conn.execute(
+                '''UPDATE farmacia SET nome = ?, rua = ?, num = ?, bairro = ?,
+                   cep = ?, hora_inicio = ?, hora_fim = ?, dia_funcionamento = ?
+                   WHERE cod = ?''',
+                (nome, rua, numero, bairro, cep, hora_inicio, hora_fim,
+                 dia_funcionamento, codigo)
+            )
+            if cursor.rowcount == 0:
+                return False
+            conn.execute(
+                'UPDATE tel_farmacia SET numero = ? WHERE cod_farmacia = ?',
+                (telefone, codigo)
+            )
+            OperacoesFarmacia.indexar_localidade(conn, codigo, rua, bairro, cep)
+        return True
+
+    @staticmethod
+    def remover_farmacia(codigo: int) -> bool:
+        """
+        Remove a farmácia com o código informado.
+        Retorna False se a farmácia não existir.
+        """
+        with OperacoesFarmacia._particao(codigo), BancoDeDados.transacao() as conn:
+            conn.execute('DELETE FROM localidade_farmacia WHERE cod_farmacia = ?', (codigo,))
+            return conn.execute('DELETE FROM farmacia WHERE cod = ?', (codigo,)).rowcount > 0
+
+    @staticmethod
+    def cadastrar_farmacia() -> None:
+        """
+        Realiza o cadastro de uma nova farmácia.
+        Solicita os dados da farmácia e os registra no banco.
+        """
+        cod_admin = OperacoesAdministrador.admin_autenticado()
+        if cod_admin is None:
+            print("É necessário estar autenticado como administrador para cadastrar farmácias.")
+            return
+
+        try:
+            codigo = int(input("Código da farmácia: "))
+            nome = input("Nome da farmácia: ")
+            telefone = input("Telefone: ")
+            rua = input("Rua: ")
+            numero = int(input("Número: "))
+            bairro = input("Bairro: ")
+            cep = input("CEP: ")
+            hora_inicio = input("Horário de abertura (HH:mm): ")
+            hora_fim = input("Horário de fechamento (HH:mm): ")
+            dia_funcionamento = input("Dia(s) de funcionamento (ex: Segunda-Sexta): ")
+            OperacoesFarmacia.registrar_farmacia(
+                codigo, nome, telefone, rua, numero, bairro, cep, hora_inicio,
+                hora_fim, dia_funcionamento, cod_admin
+            )
+            print("Farmácia cadastrada com sucesso!")
+        except sqlite3.IntegrityError:
+            print("Código da farmácia já existe.")
+        except sqlite3.Error as e:
+            print(f"Erro ao cadastrar farmácia: {e}")
+
+    @staticmethod
+    def atualizar_farmacia() -> None:
+        """
+        Atualiza os dados de uma farmácia cadastrada.
+        Solicita os novos dados a partir do código informado.
+        """
+        try:
+            codigo = int(input("Código da farmácia a ser atualizada: "))
+            nome = input("Novo nome da farmácia: ")
+            telefone = input("Novo telefone: ")
+            rua = input("Nova rua: ")
+            numero = int(input("Novo número: "))
+            bairro = input("Novo bairro: ")
+            cep = input("Novo CEP: ")
+            hora_inicio = input("Novo horário de abertura (HH:mm): ")
+            hora_fim = input("Novo horário de fechamento (HH:mm): ")
+            dia_funcionamento = input("Novo dia(s) de funcionamento: ")
+            if OperacoesFarmacia.alterar_farmacia(codigo, nome, telefone, rua, numero, bairro, cep,
+                                                  hora_inicio, hora_fim, dia_funcionamento):
+                print("Dados da farmácia atualizados com sucesso!")
+            else:
+                print("Farmácia não encontrada.")
+        except sqlite3.Error as e:
+            print(f"Erro ao atualizar farmácia: {e}")
+
+    @staticmethod
+    def excluir_farmacia() -> None:
+        """
+        Exclui uma farmácia a partir do código informado.
+        """
+        try:
+            codigo = int(input("Código da farmácia a ser excluída: "))
+            if OperacoesFarmacia.remover_farmacia(codigo):
+                print("Farmácia excluída com sucesso!")
+            else:
+                print("Farmácia não encontrada.")
+        except sqlite3.Error as e:
+            print(f"Erro ao excluir farmácia: {e}")
+
+    @staticmethod
+    def listar_farmacias_abertas(hora_inicio: str, hora_fim: str) -> list:
+        """
+        Retorna as farmácias em funcionamento em todo o intervalo de horário informado,
+        como tuplas (código, nome, rua, número, bairro, CEP, telefone), em ordem de código.
+        Com partições, a consulta roda em paralelo em todas e os resultados são intercalados.
+        """
+        roteador = OperacoesFarmacia.roteador
+        if roteador is not None:
+            return list(heapq.merge(*roteador.distribuir(
+                OperacoesFarmacia._consultar_abertas, hora_inicio, hora_fim)))
+        return OperacoesFarmacia._consultar_abertas(hora_inicio, hora_fim)
+
+    @staticmethod
+    def _consultar_abertas(hora_inicio: str, hora_fim: str) -> list:
+        with BancoDeDados.leitura():
+            conn = BancoDeDados.conectar()
+        try:
+            return conn.execute(
+                '''SELECT f.cod, f.nome, f.rua, f.num, f.bairro, f.cep,
+                          (SELECT numero FROM tel_farmacia WHERE cod_farmacia = f.cod LIMIT 1)
+                   FROM farmacia f
+                   WHERE f.hora_inicio <= ? AND f.hora_fim >= ?
+                   ORDER BY f.cod''',
+                (hora_inicio, hora_fim)
+            ).fetchall()
+        finally:
+            BancoDeDados.liberar(conn)
+
+    @staticmethod
+    def listar_farmacias(limite: int = 50, cursor: str = None, ordem: str = 'cod') -> tuple:
+        """
+        Lista as farmácias paginadas por chave, na ordem 'cod' ou 'nome' ('-' à frente para
+        decrescente). Retorna (linhas, próximo cursor), com linhas (código, nome, rua, número,
+        bairro, CEP, hora de início, hora de fim, dias, telefones separados por ';') e cursor
+        None na última página. Com partições, cada uma lê sua página e elas são intercaladas.
+        """
+        quantidade_chaves = len(Paginacao.chaves(OperacoesFarmacia.ORDENS, ordem))
+        roteador = OperacoesFarmacia.roteador
+        if roteador is not None:
+            linhas = list(heapq.merge(
+                *roteador.distribuir(OperacoesFarmacia._consultar_pagina, limite, cursor, ordem),
+                key=lambda linha: linha[-quantidade_chaves:], reverse=ordem.startswith('-')))
+        else:
+            linhas = OperacoesFarmacia._consultar_pagina(limite, cursor, ordem)
+        return Paginacao.pagina(linhas, ordem, quantidade_chaves, limite)
+
+    @staticmethod
+    def _consultar_pagina(limite: int, cursor: str, ordem: str) -> list:
+        with BancoDeDados.leitura():
+            conn = BancoDeDados.conectar()
+        try:
+            return Paginacao.consultar(
+                conn, '''f.cod, f.nome, f.rua, f.num, f.bairro, f.cep, f.hora_inicio, f.hora_fim,
+                          f.dia_funcionamento,
+                          (SELECT group_concat(t.numero, ';') FROM tel_farmacia t WHERE t.cod_farmacia = f.cod)''',
+                'farmacia f', [], [], OperacoesFarmacia.ORDENS, ordem, limite, cursor)
+        finally:
+            BancoDeDados.liberar(conn)
+
+    @staticmethod
+    def buscar_por_localidade(cep: str = None, bairro: str = None, rua: str = None,
+                              aberta_em: str = None) -> list:
+        """
+        Retorna as farmácias cujo CEP, bairro e rua começam pelos prefixos informados
+        (todos os informados devem casar), opcionalmente só as abertas no horário HH:mm,
+        como tuplas (código, nome, rua, número, bairro, CEP, telefone), em ordem de código.
+        Cada prefixo é uma faixa no índice ordenado localidade_farmacia.
+        """
+        prefixos = [f'{tipo}:{valor}' for tipo, valor in (
+            ('cep', re.sub(r'\D', '', cep or '')),
+            ('bairro', OperacoesFarmacia.normalizar_localidade(bairro)),
+            ('rua', OperacoesFarmacia.normalizar_localidade(rua))) if valor]
+        if not prefixos:
+            raise ValueError("Informe ao menos CEP, bairro ou rua.")
+        roteador = OperacoesFarmacia.roteador
+        if roteador is not None:
+            return list(heapq.merge(*roteador.distribuir(
+                OperacoesFarmacia._consultar_localidade, prefixos, aberta_em)))
+        return OperacoesFarmacia._consultar_localidade(prefixos, aberta_em)
+
+    @staticmethod
+    def _consultar_localidade(prefixos: list, aberta_em: str) -> list:
+        filtros, parametros = [], []
+        for prefixo in prefixos:
+            filtros.append('f.cod IN (SELECT cod_farmacia FROM localidade_farmacia WHERE chave >= ? AND chave < ?)')
+            parametros += [prefixo, prefixo[:-1] + chr(ord(prefixo[-1]) + 1)]
+        if aberta_em is not None:
+            filtros.append('f.hora_inicio <= ? AND f.hora_fim >= ?')
+            parametros += [aberta_em, aberta_em]
+        with BancoDeDados.leitura():
+            conn = BancoDeDados.conectar()
+        try:
+            return conn.execute(
+                f'''SELECT f.cod, f.nome, f.rua, f.num, f.bairro, f.cep,
+                           (SELECT numero FROM tel_farmacia WHERE cod_farmacia = f.cod LIMIT 1)
+                    FROM farmacia f
+                    WHERE {' AND '.join(filtros)}
+                    ORDER BY f.cod''',
+                parametros
+            ).fetchall()
+        finally:
+            BancoDeDados.liberar(conn)
+
+    @staticmethod
+    def reindexar_localidades() -> None:
+        """
+        Reconstrói o índice de localidade no banco principal ou em todas as partições.
+        """
+        def reindexar():
+            with BancoDeDados.transacao() as conn:
+                OperacoesFarmacia.indexar_localidades(conn)
+
+        if OperacoesFarmacia.roteador is not None:
+            OperacoesFarmacia.roteador.distribuir(reindexar)
+        else:
+            reindexar()
+
+    @staticmethod
+    def consultar_farmacias() -> None:
+        """
+        Consulta as farmácias que estão em funcionamento em um determinado intervalo de horário.
+        """
+        try:
+            hora_inicio = input("Informe a hora de início (HH:mm): ")
+            hora_fim = input("Informe a hora de término (HH:mm): ")
+            farmacias = OperacoesFarmacia.listar_farmacias_abertas(hora_inicio, hora_fim)
+            if farmacias:
+                print("Farmácias em funcionamento:")
+                for farmacia in farmacias:
+                    print(f"Farmácia: {farmacia[1]}, Endereço: {farmacia[2]}, "
+                          f"{farmacia[3]}, {farmacia[4]}, {farmacia[5]}")
+                    if farmacia[6]:
+                        print(f"Telefone: {farmacia[6]}")
+            else:
+                print("Nenhuma farmácia encontrada no horário informado.")
+        except sqlite3.Error as e:
+            print(f"Erro ao consultar farmácias: {e}")
+
+    @staticmethod
+    def consultar_farmacias_por_localidade() -> None:
+        """
+        Consulta as farmácias por início do CEP, bairro ou rua, opcionalmente só as abertas agora.
+        """
+        try:
+            cep = input("CEP ou início do CEP (vazio para ignorar): ")
+            bairro = input("Bairro (vazio para ignorar): ")
+            rua = input("Rua (vazio para ignorar): ")
+            abertas = input("Somente abertas agora? (s/n): ").strip().lower() == 's'
+            farmacias = OperacoesFarmacia.buscar_por_localidade(
+                cep, bairro, rua, time.strftime('%H:%M') if abertas else None)
+            if farmacias:
+                print("Farmácias encontradas:")
+                for farmacia in farmacias:
+                    print(f"Farmácia: {farmacia[1]}, Endereço: {farmacia[2]}, "
+                          f"{farmacia[3]}, {farmacia[4]}, {farmacia[5]}")
+                    if farmacia[6]:
+                        print(f"Telefone: {farmacia[6]}")
+            else:
+                print("Nenhuma farmácia encontrada nessa localidade.")
+        except ValueError as e:
+            print(e)
+        except sqlite3.Error as e:
+            print(f"Erro ao consultar farmácias: {e}")
+
+
+class VendaRecusada(Exception):
+    """
+    Indica que uma venda foi desfeita porque uma ou mais linhas não puderam ser atendidas.
+    O atributo falhas contém tuplas (linha, produto, motivo).
+    """
+
+    def __init__(self, falhas: list) -> None:
+        super().__init__(f"{len(falhas)} linha(s) recusada(s)")
+        self.falhas = falhas
+
+
+class CacheProdutos:
+    """
+    Cache LRU com expiração (TTL) da visão montada de um produto: tuplas
+    (código, nome, categoria, preço, quantidade), indexadas por código e por nome normalizado.
+    """
+
+    def __init__(self, capacidade: int = 1024, ttl: float = 60.0) -> None:
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self._entradas = OrderedDict()
+        self._codigos_por_nome = {}
+        self._versao = 0
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.expulsoes = 0
+        self.invalidacoes = 0
+
+    @staticmethod
+    def normalizar(nome: str) -> str:
+        """
+        Normaliza o nome do produto da mesma forma que a busca por nome no banco.
+        """
+        return nome.lower()
+
+    def versao(self) -> int:
+        """
+        Retorna a versão atual do cache, incrementada a cada invalidação.
+        Deve ser lida antes de consultar o banco e repassada a guardar().
+        """
+        return self._versao
+
+    def obter(self, codigo: int = None, nome: str = None) -> tuple:
+        """
+        Retorna o produto em cache pelo código ou pelo nome, ou None se ausente ou expirado.
+        """
+        with self._trava:
+            if codigo is None and nome is not None:
+                codigo = self._codigos_por_nome.get(CacheProdutos.normalizar(nome))
+            entrada = self._entradas.get(codigo)
+            if entrada is None:
+                self.falhas += 1
+                return None
+            expira_em, produto = entrada
+            if expira_em < time.monotonic():
+                self._remover(codigo)
+                self.falhas += 1
+                return None
+            self._entradas.move_to_end(codigo)
+            self.acertos += 1
+            return produto
+
+    def guardar(self, produto: tuple, versao: int) -> None:
+        """
+        Armazena o produto lido do banco. A gravação é descartada se houve alguma
+        invalidação desde que a versão informada foi lida, evitando guardar dados antigos.
+        """
+        with self._trava:
+            if versao != self._versao:
+                return
+            codigo = produto[0]
+            self._remover(codigo)
+            self._entradas[codigo] = (time.monotonic() + self.ttl, produto)
+            self._codigos_por_nome[CacheProdutos.normalizar(produto[1])] = codigo
+            while len(self._entradas) > self.capacidade:
+                self._remover(next(iter(self._entradas)))
+                self.expulsoes += 1
+
+    def invalidar(self, codigo: int = None, nome: str = None) -> None:
+        """
+        Remove do cache o produto com o código e/ou o nome informados.
+        Deve ser chamada após confirmar a alteração no banco.
+        """
+        with self._trava:
+            self._versao += 1
+            self.invalidacoes += 1
+            if nome is not None:
+                self._remover(self._codigos_por_nome.pop(CacheProdutos.normalizar(nome), None))
+            self._remover(codigo)
+
+    def limpar(self) -> None:
+        """
+        Remove todas as entradas do cache.
+        """
+        with self._trava:
+            self._versao += 1
+            self.invalidacoes += 1
+            self._entradas.clear()
+            self._codigos_por_nome.clear()
+
+    def estatisticas(self) -> dict:
+        """
+        Retorna os contadores de acertos, falhas, expulsões e invalidações do cache.
+        """
+        with self._trava:
+            return {
+                'entradas': len(self._entradas),
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'expulsoes': self.expulsoes,
+                'invalidacoes': self.invalidacoes,
+            }
+
+    def _remover(self, codigo: int) -> None:
+        entrada = self._entradas.pop(codigo, None)
+        if entrada is not None:
+            nome = CacheProdutos.normalizar(entrada[1][1])
+            if self._codigos_por_nome.get(nome) == codigo:
+                del self._codigos_por_nome[nome]
+
+
+class EscritorEstoque:
+    """
+    Thread dedicada que recebe baixas de estoque por uma fila e as grava em lotes:
+    os pedidos que chegam dentro da latência máxima (até max_lote pedidos) são
+    agrupados numa única transação, com um SAVEPOINT por pedido para manter cada
+    venda atômica. O resultado de cada pedido é entregue por um Future; a falha de um
+    pedido chega só ao Future dele e não interrompe a thread.
+    """
+
+    def __init__(self, max_lote: int = 256, latencia_maxima: float = 0.005,
+                 tempo_resposta: float = 30.0) -> None:
+        self.max_lote = max_lote
+        self.latencia_maxima = latencia_maxima
+        self.tempo_resposta = tempo_resposta
+        self.lotes = 0
+        self.pedidos = 0
+        self._fila = queue.Queue()
+        self._thread = None
+
+    def iniciar(self) -> None:
+        """
+        Inicia a thread de gravação.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name='escritor-estoque', daemon=True)
+            self._thread.start()
+
+    def parar(self) -> None:
+        """
+        Grava os pedidos pendentes e encerra a thread de gravação.
+        """
+        if self._thread is not None:
+            self._fila.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def enviar(self, itens: list, cod_usuario: int = None, cod_farmacia: int = None) -> Future:
+        """
+        Enfileira uma venda (lista de pares (produto, quantidade)), opcionalmente de um usuário
+        numa farmácia. O Future retornado recebe a lista de linhas recusadas, como em finalizar_venda().
+        Itens malformados são recusados com ValueError antes de entrar na fila.
+        """
+        itens = OperacoesProdutos.validar_itens(itens)
+        futuro = Future()
+        self._fila.put((itens, (cod_usuario, cod_farmacia), futuro))
+        return futuro
+
+    def vender(self, itens: list, cod_usuario: int = None, cod_farmacia: int = None) -> list:
+        """
+        Enfileira a venda e aguarda o resultado por até tempo_resposta segundos.
+        Se o prazo vencer antes de a thread começar o pedido, ele é cancelado e não será gravado;
+        se ela já o tiver começado, o resultado é aguardado por mais um prazo. Em ambos os
+        casos o estouro lança sqlite3.OperationalError informando se a venda pode ter sido gravada.
+        """
+        futuro = self.enviar(itens, cod_usuario, cod_farmacia)
+        try:
+            return futuro.result(timeout=self.tempo_resposta)
+        except TempoEsgotado:
+            if futuro.cancel():
+                raise sqlite3.OperationalError(
+                    "O escritor de estoque não respondeu a tempo; a venda não foi gravada.") from None
+        try:
+            return futuro.result(timeout=self.tempo_resposta)
+        except TempoEsgotado:
+            raise sqlite3.OperationalError(
+                "O escritor de estoque não respondeu a tempo; a venda pode ter sido gravada.") from None
+
+    def _executar(self) -> None:
+        ativo = True
+        while ativo:
+            pedido = self._fila.get()
+            if pedido is None:
+                break
+            lote = [pedido]
+            prazo = time.monotonic() + self.latencia_maxima
+            while len(lote) < self.max_lote:
+                restante = prazo - time.monotonic()
+                try:
+                    pedido = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if pedido is None:
+                    ativo = False
+                    break
+                lote.append(pedido)
+            try:
+                self._gravar(lote)
+            except Exception as e:
+                # Nenhuma falha pode derrubar a thread: os pedidos ainda sem resposta recebem o erro.
+                for *_, futuro in lote:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+
+    def _gravar(self, lote: list) -> None:
+        resultados = []
+        # Pedidos cancelados por quem esperava (prazo vencido) não são gravados.
+        lote = [pedido for pedido in lote if pedido[2].set_running_or_notify_cancel()]
+        if not lote:
+            return
+        try:
+            with BancoDeDados.transacao() as conn:
+                for itens, compra, futuro in lote:
+                    try:
+                        with BancoDeDados.transacao():
+                            falhas, codigos = OperacoesProdutos._baixar_itens(conn, itens)
+                            if falhas:
+                                raise VendaRecusada(falhas)
+                            OperacoesRecomendacao.registrar_compra(conn, codigos, *compra)
+                        resultados.append((futuro, [], codigos, None))
+                    except VendaRecusada as e:
+                        resultados.append((futuro, e.falhas, [], None))
+                    except Exception as e:
+                        resultados.append((futuro, None, [], e))
+        except Exception as e:
+            for *_, futuro in lote:
+                futuro.set_exception(e)
+            return
+        self.lotes += 1
+        self.pedidos += len(lote)
+        for futuro, falhas, codigos, erro in resultados:
+            for codigo in codigos:
+                OperacoesProdutos.cache.invalidar(codigo=codigo)
+            if erro is not None:
+                futuro.set_exception(erro)
+            else:
+                futuro.set_result(falhas)
+
+
+class OperacoesProdutos:
+    """
+    Operações relacionadas ao gerenciamento de produtos.
+    """
+
+    # Cache da visão montada dos produtos mais consultados.
+    cache = CacheProdutos()
+    # Escritor em lote opcional; quando iniciado, as vendas são gravadas por ele.
+    escritor = None
+
+    # Motivos de recusa de uma linha de venda.
+    NAO_ENCONTRADO = "Produto não encontrado."
+    SEM_ESTOQUE = "Quantidade para decrementar é maior que a disponível."
+    QUANTIDADE_INVALIDA = "Quantidade inválida."
+
+    # Quantidade padrão de resultados devolvidos pela pesquisa de produtos.
+    LIMITE_BUSCA = 10
+    # Candidatos avaliados na pesquisa tolerante a erros de digitação.
+    LIMITE_CANDIDATOS = 200
+    # Semelhança mínima (0 a 1) para um candidato ser aceito na pesquisa tolerante.
+    SEMELHANCA_MINIMA = 0.7
+    # Produtos por transação no reajuste de preços pelo menu.
+    LOTE_REAJUSTE = 5000
+    # Ordenações da listagem paginada; cada uma termina no código, que desempata.
+    ORDENS = {'cod': ('p.cod',), 'nome': ("ifnull(lower(p.nome), '')", 'p.cod'),
+              'preco': ('ifnull(p.preco, 0)', 'p.cod')}
+
+    @staticmethod
+    def inserir_produto(codigo: int, nome: str, categoria: str, preco: float,
+                        quantidade: int, cod_admin: int) -> None:
+        """
+        Grava um novo produto (produto, categoria e estoque) numa única transação.
+        Lança sqlite3.IntegrityError se o código já existir.
+        """
+        with BancoDeDados.transacao() as conn:
+            # Insere dados na tabela produto
+            conn.execute(
+                '''INSERT INTO produto (cod, nome, preco, cod_admin, cod_estoque)
+                   VALUES (?, ?, ?, ?, ?)''',
+                (codigo, nome, preco, cod_admin, codigo)
+            )
+            # Insere categoria na tabela categoria_produto
+            conn.execute(
+                '''INSERT INTO categoria_produto (categoria, cod_produto)
+                   VALUES (?, ?)''', (categoria, codigo)
+            )
+            # Insere quantidade na tabela estoque
+            with OperacoesMovimentos.contexto(conn, OperacoesMovimentos.CADASTRO, cod_admin):
+                conn.execute(
+                    '''INSERT INTO estoque (cod, quantidade)
+                       VALUES (?, ?)''', (codigo, quantidade)
+                )
+            BancoDeDados.apos_confirmar(
+                lambda: OperacoesProdutos.cache.invalidar(codigo=codigo, nome=nome)
+            )
+
+    @staticmethod
+    def alterar_produto(codigo: int, nome: str, categoria: str, preco: float, quantidade: int,
+                        cod_admin: int = None) -> bool:
+        """
+        Substitui nome, categoria, preço e quantidade do produto numa única transação.
+        A diferença de quantidade entra no livro de movimentos como ajuste do administrador.
+        Retorna False se o produto não existir.
+        """
+        with BancoDeDados.transacao() as conn:
+            cursor = conn.execute(
+                '''UPDATE produto SET nome = ?, preco = ?
+                   WHERE cod = ?''',
+                (nome, preco, codigo)
+            )
+            if cursor.rowcount == 0:
+                return False
+            with OperacoesMovimentos.contexto(conn, OperacoesMovimentos.AJUSTE, cod_admin):
+                conn.execute(
+                    '''UPDATE estoque SET quantidade = ?
+                       WHERE cod = ?''',
+                    (quantidade, codigo)
+                )
+            conn.execute(
+                '''UPDATE categoria_produto SET categoria = ?
+                   WHERE cod_produto = ?''',
+                (categoria, codigo)
+            )
+            BancoDeDados.apos_confirmar(lambda: OperacoesProdutos.cache.invalidar(codigo=codigo))
+        return True
+
+    @staticmethod
+    def remover_produto(codigo: int, cod_admin: int = None) -> bool:
+        """
+        Remove o produto, sua categoria e seu estoque numa única transação.
+        Retorna False se o produto não existir.
+        """
+        with BancoDeDados.transacao() as conn:
+            removidos = conn.execute('DELETE FROM produto WHERE cod = ?', (codigo,)).rowcount
+            conn.execute('DELETE FROM categoria_produto WHERE cod_produto = ?', (codigo,))
+            with OperacoesMovimentos.contexto(conn, OperacoesMovimentos.REMOCAO, cod_admin):
+                removidos += conn.execute('DELETE FROM estoque WHERE cod = ?', (codigo,)).rowcount
+            BancoDeDados.apos_confirmar(lambda: OperacoesProdutos.cache.invalidar(codigo=codigo))
+        return removidos > 0
+
+    @staticmethod
+    def reajustar_precos(percentual: float = 0.0, valor: float = 0.0, categoria: str = None,
+                         cod_admin: int = None, cod_inicio: int = None, cod_fim: int = None,
+                         simular: bool = False, tamanho_lote: int = None) -> tuple:
+        """
+        Reajusta de uma vez os preços dos produtos da categoria, do administrador e/ou da
+        faixa de códigos informados: novo preço = preço * (1 + percentual / 100) + valor,
+        arredondado a centavos e nunca negativo.
+        Retorna (produtos afetados, variação do valor em estoque em reais). Com simular=True
+        apenas calcula o resultado. Com tamanho_lote, grava em transações de até esse número
+        de produtos, em ordem de código, para não segurar a trava de escrita por muito tempo.
+        """
+        filtros, parametros = [], []
+        if categoria is not None:
+            filtros.append('cod IN (SELECT cod_produto FROM categoria_produto WHERE categoria = ?)')
+            parametros.append(categoria)
+        if cod_admin is not None:
+            filtros.append('cod_admin = ?')
+            parametros.append(cod_admin)
+        if cod_inicio is not None:
+            filtros.append('cod >= ?')
+            parametros.append(cod_inicio)
+        if cod_fim is not None:
+            filtros.append('cod <= ?')
+            parametros.append(cod_fim)
+        if not filtros:
+            raise ValueError("Informe categoria, administrador ou faixa de códigos.")
+        if tamanho_lote is not None and tamanho_lote < 1:
+            raise ValueError("O tamanho do lote deve ser positivo.")
+        novo_preco = 'round(max(coalesce(preco, 0) * ? + ?, 0), 2)'
+        ajuste = [1 + percentual / 100, valor]
+        onde = ' AND '.join(filtros)
+        variacao = f'''SELECT count(*), coalesce(sum(({novo_preco} - coalesce(preco, 0))
+                           * coalesce((SELECT quantidade FROM estoque WHERE cod = produto.cod_estoque), 0)), 0)
+                        FROM produto WHERE {onde}'''
+
+        if simular:
+            conn = BancoDeDados.conectar()
+            try:
+                afetados, delta = conn.execute(variacao, ajuste + parametros).fetchone()
+            finally:
+                BancoDeDados.liberar(conn)
+            return afetados, round(delta, 2)
+
+        afetados, delta, ultimo = 0, 0.0, None
+        while True:
+            with BancoDeDados.transacao() as conn:
+                faixa, limites = '', []
+                if tamanho_lote is not None:
+                    # Fecha o lote no código do último produto dos próximos tamanho_lote.
+                    anterior = '' if ultimo is None else ' AND cod > ?'
+                    limite = conn.execute(
+                        f'''SELECT max(cod) FROM (SELECT cod FROM produto WHERE {onde}{anterior}
+                            ORDER BY cod LIMIT ?)''',
+                        parametros + ([] if ultimo is None else [ultimo]) + [tamanho_lote]
+                    ).fetchone()[0]
+                    if limite is None:
+                        break
+                    faixa = ' AND cod <= ?' + anterior
+                    limites = [limite] + ([] if ultimo is None else [ultimo])
+                    ultimo = limite
+                n, d = conn.execute(variacao + faixa, ajuste + parametros + limites).fetchone()
+                conn.execute(f'UPDATE produto SET preco = {novo_preco} WHERE {onde}{faixa}',
+                             ajuste + parametros + limites)
+                afetados, delta = afetados + n, delta + d
+                if n:
+                    BancoDeDados.apos_confirmar(OperacoesProdutos.cache.limpar)
+            if tamanho_lote is None:
+                break
+        return afetados, round(delta, 2)
+
+    @staticmethod
+    def cadastrar_produto() -> None:
+        """
+        Realiza o cadastro de um novo produto.
+        Solicita código, nome, categoria, preço e quantidade.
+        """
+        cod_admin = OperacoesAdministrador.admin_autenticado()
+        if cod_admin is None:
+            print("É necessário estar autenticado como administrador para cadastrar produtos.")
+            return
+
+        try:
+            codigo = int(input("Código do produto: "))
+            nome = input("Nome do produto: ")
+            categoria = input("Categoria do produto: ")
+            preco = float(input("Preço do produto: R$ "))
+            quantidade = int(input("Quantidade do produto: "))
+            OperacoesProdutos.inserir_produto(codigo, nome, categoria, preco, quantidade, cod_admin)
+            print("Produto cadastrado com sucesso!")
+        except sqlite3.IntegrityError:
+            print("Já existe um produto com este código.")
+        except sqlite3.Error as e:
+            print(f"Erro ao cadastrar produto: {e}")
+
+    @staticmethod
+    def atualizar_produto() -> None:
+        """
+        Atualiza os dados de um produto.
+        Solicita novos dados a partir do código informado.
+        """
+        try:
+            codigo = int(input("Código do produto a ser atualizado: "))
+            nome = input("Novo nome do produto: ")
+            categoria = input("Nova categoria do produto: ")
+            preco = float(input("Novo preço do produto: R$ "))
+            quantidade = int(input("Nova quantidade do produto: "))
+            if OperacoesProdutos.alterar_produto(codigo, nome, categoria, preco, quantidade,
+                                                 OperacoesAdministrador.admin_autenticado()):
+                print("Dados do produto atualizados com sucesso!")
+            else:
+                print("Produto não encontrado.")
+        except sqlite3.Error as e:
+            print(f"Erro ao atualizar produto: {e}")
+
+    @staticmethod
+    def excluir_produto() -> None:
+        """
+        Exclui um produto a partir do código informado.
+        """
+        try:
+            codigo = int(input("Código do produto a ser excluído: "))
+            if OperacoesProdutos.remover_produto(codigo, OperacoesAdministrador.admin_autenticado()):
+                print("Produto excluído com sucesso!")
+            else:
+                print("Produto não encontrado.")
+        except sqlite3.Error as e:
+            print(f"Erro ao excluir produto: {e}")
+
+    @staticmethod
+    def reajustar_produtos() -> None:
+        """
+        Reajusta os preços de vários produtos de uma vez, mostrando antes o efeito do reajuste.
+        """
+        try:
+            categoria = input("Categoria (vazio para todas): ").strip() or None
+            cod_admin = input("CPF do administrador responsável (vazio para todos): ").strip()
+            faixa = input("Faixa de códigos no formato INICIO-FIM (vazio para todos): ").strip()
+            percentual = float(input("Reajuste percentual (ex.: 5 ou -10): ") or 0)
+            valor = float(input("Acréscimo fixo em R$ (ex.: 0.50 ou -1): ") or 0)
+            cod_inicio, cod_fim = (int(c) for c in faixa.split('-')) if faixa else (None, None)
+            filtros = dict(categoria=categoria, cod_admin=int(cod_admin) if cod_admin else None,
+                           cod_inicio=cod_inicio, cod_fim=cod_fim)
+            afetados, delta = OperacoesProdutos.reajustar_precos(percentual, valor, simular=True, **filtros)
+            print(f"{afetados} produto(s) afetado(s); variação do valor em estoque: R${delta:.2f}")
+            if afetados and input("Confirmar o reajuste? (s/n): ").strip().lower() == 's':
+                afetados, _ = OperacoesProdutos.reajustar_precos(
+                    percentual, valor, tamanho_lote=OperacoesProdutos.LOTE_REAJUSTE, **filtros)
+                print(f"Preços de {afetados} produto(s) reajustados com sucesso!")
+        except ValueError as e:
+            print(f"Reajuste inválido: {e}")
+        except sqlite3.Error as e:
+            print(f"Erro ao reajustar preços: {e}")
+
+    @staticmethod
+    def _consultar_indice(conn: sqlite3.Connection, consulta: str, limite: int) -> list:
+        """
+        Executa uma consulta FTS5 no índice de produtos, ordenada por relevância.
+        O nome pesa mais que a categoria no ranqueamento.
+        """
+        cursor = conn.execute(
+            '''SELECT p.cod, p.nome, b.categoria, p.preco, e.quantidade
+               FROM produto_busca b
+               JOIN produto p ON p.cod = b.rowid
+               LEFT JOIN estoque e ON e.cod = p.cod_estoque
+               WHERE produto_busca MATCH ?
+               ORDER BY bm25(produto_busca, 10.0, 1.0)
+               LIMIT ?''',
+            (consulta, limite)
+        )
+        return cursor.fetchall()
+
+    @staticmethod
+    def pesquisar_produtos(termo: str, limite: int = None) -> list:
+        """
+        Pesquisa produtos por nome e categoria no índice de texto completo.
+        Cada palavra do termo casa por prefixo ("parace" encontra "Paracetamol") e todas
+        precisam estar presentes. Sem resultados, recorre a uma busca tolerante a erros
+        de digitação. Retorna tuplas (código, nome, categoria, preço, quantidade).
+        """
+        limite = limite or OperacoesProdutos.LIMITE_BUSCA
+        palavras = re.findall(r'\w+', termo.lower())
+        if not palavras:
+            return []
+        with BancoDeDados.leitura():
+            conn = BancoDeDados.conectar()
+        try:
+            produtos = OperacoesProdutos._consultar_indice(
+                conn, ' '.join(f'"{palavra}"*' for palavra in palavras), limite
+            )
+            if produtos:
+                return produtos
+            # Busca tolerante: candidatos que compartilham as duas primeiras letras de
+            # alguma palavra, ordenados pela semelhança com o termo digitado.
+            candidatos = OperacoesProdutos._consultar_indice(
+                conn, ' OR '.join(f'"{palavra[:2]}"*' for palavra in palavras),
+                OperacoesProdutos.LIMITE_CANDIDATOS
+            )
+            pontuados = []
+            for produto in candidatos:
+                termos_produto = re.findall(r'\w+', f'{produto[1]} {produto[2]}'.lower())
+                nota = sum(
+                    max(difflib.SequenceMatcher(None, palavra, termo_produto).ratio()
+                        for termo_produto in termos_produto)
+                    for palavra in palavras
+                ) / len(palavras) if termos_produto else 0.0
+                if nota >= OperacoesProdutos.SEMELHANCA_MINIMA:
+                    pontuados.append((nota, produto))
+            pontuados.sort(key=lambda item: item[0], reverse=True)
+            return [produto for _, produto in pontuados[:limite]]
+        finally:
+            BancoDeDados.liberar(conn)
+
+    @staticmethod
+    def obter_produto(codigo: int = None, nome: str = None) -> tuple:
+        """
+        Retorna o produto pelo código ou pelo nome exato (sem diferenciar maiúsculas),
+        como a tupla (código, nome, categoria, preço, quantidade), ou None se não existir.
+        A leitura passa pelo cache de produtos e, em caso de falha, faz uma única consulta.
+        Dentro de uma transação o cache é ignorado: ele não reflete as gravações ainda não
+        confirmadas, e o que se lê delas não pode ficar no cache se a transação for desfeita.
+        """
+        em_transacao = BancoDeDados.em_transacao()
+        if not em_transacao:
+            produto = OperacoesProdutos.cache.obter(codigo=codigo, nome=nome)
+            if produto is not None:
+                return produto
+        versao = OperacoesProdutos.cache.versao()
+        if codigo is not None:
+            filtro, parametro = 'p.cod = ?', codigo
+        else:
+            filtro, parametro = 'LOWER(p.nome) = ?', nome.lower()
+        with BancoDeDados.leitura() as da_replica:
+            conn = BancoDeDados.conectar()
+        try:
+            produto = conn.execute(
+                f'''SELECT p.cod, p.nome, c.categoria, p.preco, e.quantidade
+                    FROM produto p
+                    LEFT JOIN categoria_produto c ON c.cod_produto = p.cod
+                    LEFT JOIN estoque e ON e.cod = p.cod_estoque
+                    WHERE {filtro}
+                    LIMIT 1''',
+                (parametro,)
+            ).fetchone()
+        finally:
+            BancoDeDados.liberar(conn)
+        # O que vem da réplica pode estar defasado e não entra no cache.
+        if produto is not None and not da_replica and not em_transacao:
+            OperacoesProdutos.cache.guardar(produto, versao)
+        return produto
+
+    @staticmethod
+    def listar_produtos(limite: int = 50, cursor: str = None, ordem: str = 'cod', categoria: str = None) -> tuple:
+        """
+        Lista os produtos, opcionalmente só os da categoria, paginados por chave na ordem
+        'cod', 'nome' ou 'preco' ('-' à frente para decrescente). Retorna (linhas, próximo
+        cursor), com linhas (código, nome, categoria, preço, quantidade) e cursor None na última página.
+        """
+        filtros, parametros = [], []
+        if categoria is not None:
+            filtros.append('p.cod IN (SELECT cod_produto FROM categoria_produto WHERE categoria = ?)')
+            parametros.append(categoria)
+        with BancoDeDados.leitura():
+            conn = BancoDeDados.conectar()
+        try:
+            linhas = Paginacao.consultar(
+                conn, '''p.cod, p.nome, (SELECT categoria FROM categoria_produto WHERE cod_produto = p.cod LIMIT 1),
+                          p.preco, (SELECT quantidade FROM estoque WHERE cod = p.cod_estoque)''',
+                'produto p', filtros, parametros, OperacoesProdutos.ORDENS, ordem, limite, cursor)
+        finally:
+            BancoDeDados.liberar(conn)
+        return Paginacao.pagina(linhas, ordem, len(Paginacao.chaves(OperacoesProdutos.ORDENS, ordem)), limite)
+
+    @staticmethod
+    def buscar_produto() -> None:
+        """
+        Busca um produto a partir do nome.
+        Exibe os detalhes do produto caso seja encontrado.
+        """
+        try:
+            nome = input("Informe o nome do produto: ")
+            produto = OperacoesProdutos.obter_produto(nome=nome)
+            if not produto:
+                semelhantes = OperacoesProdutos.pesquisar_produtos(nome)
+                if not semelhantes:
+                    print("Produto não encontrado.")
+                    return
+                print("Produtos encontrados:")
+                for _, nome_produto, categoria, preco, quantidade in semelhantes:
+                    print(f"{nome_produto} - Categoria: {categoria} - "
+                          f"Preço: R${preco:.2f} - Quantidade: {quantidade}")
+                return
+            print(f"Produto encontrado: {produto[1]} - Categoria: {produto[2]} - "
+                  f"Preço: R${produto[3]:.2f} - Quantidade: {produto[4]}")
+        except sqlite3.Error as e:
+            print(f"Erro ao buscar produto: {e}")
+
+    @staticmethod
+    def validar_itens(itens: list) -> list:
+        """
+        Confere a forma de uma cesta de venda e a devolve como lista de pares (produto, quantidade).
+        Lança ValueError para itens que não são pares, produtos que não são código nem nome e
+        inteiros fora da faixa do SQLite; quantidades não positivas viram linhas recusadas na baixa.
+        """
+        pares = []
+        for linha, item in enumerate(itens):
+            try:
+                produto, quantidade = item
+            except (TypeError, ValueError):
+                raise ValueError(f"Item {linha} deve ser um par (produto, quantidade).") from None
+            if not isinstance(produto, (int, str)):
+                raise ValueError(f"Item {linha}: o produto deve ser um código ou um nome.")
+            for valor in (produto, quantidade):
+                if isinstance(valor, int) and not -2 ** 63 <= valor < 2 ** 63:
+                    raise ValueError(f"Item {linha}: valor fora da faixa permitida.")
+            pares.append((produto, quantidade))
+        return pares
+
+    @staticmethod
+    def _baixar_itens(conn: sqlite3.Connection, itens: list) -> tuple:
+        """
+        Aplica as baixas de estoque na transação corrente com atualizações condicionais
+        (quantidade >= solicitada) e retorna as linhas recusadas e os códigos alterados.
+        """
+        falhas = []
+        codigos = []
+        with OperacoesMovimentos.contexto(conn, OperacoesMovimentos.VENDA):
+            for linha, (produto, quantidade) in enumerate(itens):
+                if isinstance(produto, str):
+                    encontrado = conn.execute(
+                        'SELECT cod FROM produto WHERE LOWER(nome) = ?', (produto.lower(),)
+                    ).fetchone()
+                    if encontrado is None:
+                        falhas.append((linha, produto, OperacoesProdutos.NAO_ENCONTRADO))
+                        continue
+                    codigo = encontrado[0]
+                else:
+                    codigo = produto
+                if not isinstance(quantidade, int) or quantidade <= 0:
+                    falhas.append((linha, produto, OperacoesProdutos.QUANTIDADE_INVALIDA))
+                    continue
+                cursor = conn.execute(
+                    '''UPDATE estoque SET quantidade = quantidade - ?
+                       WHERE cod = ? AND quantidade >= ?''',
+                    (quantidade, codigo, quantidade)
+                )
+                if cursor.rowcount == 0:
+                    existe = conn.execute('SELECT 1 FROM estoque WHERE cod = ?', (codigo,)).fetchone()
+                    motivo = OperacoesProdutos.SEM_ESTOQUE if existe else OperacoesProdutos.NAO_ENCONTRADO
+                    falhas.append((linha, produto, motivo))
+                else:
+                    codigos.append(codigo)
+        return falhas, codigos
+
+    @staticmethod
+    def finalizar_venda(itens: list, cod_usuario: int = None, cod_farmacia: int = None) -> list:
+        """
+        Dá baixa no estoque de uma cesta de itens numa única transação.
+        Cada item é um par (produto, quantidade), em que produto é o código ou o nome exato.
+        Ou todas as linhas são aplicadas, ou nenhuma: a lista retornada contém as linhas
+        recusadas como tuplas (linha, produto, motivo) e fica vazia quando a venda é confirmada.
+        A compra confirmada alimenta as recomendações e, com o usuário, o histórico dele.
+        Com um EscritorEstoque configurado, a venda é gravada em lote pela thread dele.
+        """
+        if OperacoesProdutos.escritor is not None and not BancoDeDados.em_transacao():
+            return OperacoesProdutos.escritor.vender(itens, cod_usuario, cod_farmacia)
+        itens = OperacoesProdutos.validar_itens(itens)
+        try:
+            with BancoDeDados.transacao() as conn:
+                falhas, codigos = OperacoesProdutos._baixar_itens(conn, itens)
+                if falhas:
+                    raise VendaRecusada(falhas)
+                OperacoesRecomendacao.registrar_compra(conn, codigos, cod_usuario, cod_farmacia)
+                for codigo in codigos:
+                    BancoDeDados.apos_confirmar(
+                        lambda codigo=codigo: OperacoesProdutos.cache.invalidar(codigo=codigo)
+                    )
+        except VendaRecusada as e:
+            return e.falhas
+        return []
+
+    @staticmethod
+    def decrementar_estoque() -> None:
+        """
+        Decrementa a quantidade de um produto no estoque.
+        Solicita o nome do produto e a quantidade a ser decrementada.
+        """
+        try:
+            nome = input("Informe o nome do produto: ")
+            quantidade = int(input("Quantidade a ser decrementada: "))
+            falhas = OperacoesProdutos.finalizar_venda([(nome, quantidade)])
+            if not falhas:
+                print("Estoque decrementado com sucesso!")
+                return
+            motivo = falhas[0][2]
+            print(motivo)
+            if motivo == OperacoesProdutos.NAO_ENCONTRADO:
+                semelhantes = OperacoesProdutos.pesquisar_produtos(nome)
+                if semelhantes:
+                    print("Você quis dizer: " + ", ".join(p[1] for p in semelhantes) + "?")
+        except sqlite3.Error as e:
+            print(f"Erro ao decrementar estoque: {e}")
+
+
+class OperacoesMovimentos:
+    """
+    Consultas ao livro de movimentos do estoque (movimento_estoque) e gravação de instantâneos.
+    Cada alteração de estoque.quantidade gera um movimento pelos gatilhos, na mesma transação;
+    as operações informam o motivo e o administrador com contexto() antes de alterar o estoque.
+    O contexto fica no estado da thread e chega aos gatilhos pelas funções SQL da conexão, sem
+    gravar nada no banco. O código do estoque é o próprio código do produto.
+    Como os gatilhos chamam motivo_movimento() e admin_movimento(), só conexões com essas funções
+    registradas (as de conectar() ou qualquer uma passada a registrar_funcoes()) alteram o estoque;
+    em outras ferramentas, como o shell sqlite3, a alteração falha com "no such function".
     """
 
-    NOME_DB = 'pharmanalytics.db'
+    # Motivos registrados pelas operações do sistema; alterações diretas ficam sem motivo.
+    CADASTRO = 'cadastro'
+    AJUSTE = 'ajuste'
+    VENDA = 'venda'
+    REMOCAO = 'remocao'
+    IMPORTACAO = 'importacao'
+
+    # Movimentos entre instantâneos gravados automaticamente após as operações; None desliga.
+    INTERVALO_INSTANTANEO = 10000
+
+    _local = threading.local()
+    # Último movimento coberto por um instantâneo, por banco, para evitar consultas a cada gravação.
+    # _cobertos, _pendentes e _trabalhador são compartilhados pelas threads e protegidos por _trava.
+    _cobertos = {}
+    _pendentes = set()
+    _trava = threading.Lock()
+    _fila = queue.Queue()
+    _trabalhador = None
 
     @staticmethod
-    def conectar() -> sqlite3.Connection:
+    def registrar_funcoes(conn: sqlite3.Connection) -> None:
         """
-        Estabelece e retorna uma conexão com o banco de dados SQLite.
+        Registra na conexão as funções motivo_movimento() e admin_movimento(), que os gatilhos
+        do livro usam para ler o contexto definido por contexto() na thread atual.
         """
-        try:
-            return sqlite3.connect(BancoDeDados.NOME_DB)
-        except sqlite3.Error as e:
-            print(f"Erro ao conectar com o banco de dados: {e}")
-            return None
+        local = OperacoesMovimentos._local
+        conn.create_function('motivo_movimento', 0, lambda: getattr(local, 'motivo', None))
+        conn.create_function('admin_movimento', 0, lambda: getattr(local, 'cod_admin', None))
 
     @staticmethod
-    def criar_tabelas() -> None:
+    @contextmanager
+    def contexto(conn: sqlite3.Connection, motivo: str, cod_admin: int = None):
         """
-        Cria as tabelas necessárias se elas não existirem.
+        Define o motivo e o administrador dos movimentos gerados dentro do bloco,
+        restaurando o contexto anterior ao sair. Deve ser usado dentro de uma transação;
+        após a confirmação, se o livro cresceu INTERVALO_INSTANTANEO movimentos, um instantâneo
+        é gravado por uma thread de fundo, fora do tempo de resposta da operação.
         """
-        conn = BancoDeDados.conectar()
-        if conn:
+        local = OperacoesMovimentos._local
+        anterior = getattr(local, 'motivo', None), getattr(local, 'cod_admin', None)
+        local.motivo, local.cod_admin = motivo, cod_admin
+        try:
+            yield conn
+        finally:
+            local.motivo, local.cod_admin = anterior
+        if OperacoesMovimentos.INTERVALO_INSTANTANEO and BancoDeDados.em_transacao():
+            BancoDeDados.apos_confirmar(OperacoesMovimentos._agendar_instantaneo,
+                                        chave='instantaneo_automatico')
+
+    @staticmethod
+    def _agendar_instantaneo() -> None:
+        intervalo = OperacoesMovimentos.INTERVALO_INSTANTANEO
+        if not intervalo:
+            return
+        banco = BancoDeDados.banco_atual()
+        try:
+            # max(id) é lido direto da chave; a cópia do estoque fica com a thread de fundo.
+            ultimo = BancoDeDados.conectar().execute(
+                'SELECT coalesce(max(id), 0) FROM movimento_estoque').fetchone()[0]
+        except sqlite3.Error:
+            # A operação já foi confirmada; o instantâneo fica para a próxima gravação.
+            return
+        with OperacoesMovimentos._trava:
+            coberto = OperacoesMovimentos._cobertos.get(banco)
+            if banco in OperacoesMovimentos._pendentes or (coberto is not None and ultimo - coberto < intervalo):
+                return
+            OperacoesMovimentos._pendentes.add(banco)
+            if OperacoesMovimentos._trabalhador is None:
+                OperacoesMovimentos._trabalhador = threading.Thread(
+                    target=OperacoesMovimentos._gravar_instantaneos, name='instantaneo', daemon=True)
+                OperacoesMovimentos._trabalhador.start()
+        OperacoesMovimentos._fila.put((banco, intervalo))
+
+    @staticmethod
+    def _gravar_instantaneos() -> None:
+        while True:
+            banco, intervalo = OperacoesMovimentos._fila.get()
             try:
-                cursor = conn.cursor()
-                # Tabela Pessoa
-                cursor.execute(
-                    '''CREATE TABLE IF NOT EXISTS pessoa (
-                        cpf INTEGER PRIMARY KEY
-                    )'''
-                )
-                # Tabela Administrador
-                cursor.execute(
-                    '''CREATE TABLE IF NOT EXISTS administrador (
-                        email VARCHAR(100),
-                        senha VARCHAR(50),
-                        cod_pessoa INTEGER,
-                        FOREIGN KEY (cod_pessoa) REFERENCES pessoa(cpf)
-                    )'''
-                )
-                # Tabela Usuário
-                cursor.execute(
-                    '''CREATE TABLE IF NOT EXISTS usuario (
-                        cod_pessoa INTEGER PRIMARY KEY,
-                        FOREIGN KEY (cod_pessoa) REFERENCES pessoa(cpf)
-                    )'''
-                )
-                # Tabela Tel_Usuario
-                cursor.execute(
-                    '''CREATE TABLE IF NOT EXISTS tel_usuario (
-                        numero VARCHAR(20),
-                        cod_usuario INTEGER,
-                        FOREIGN KEY (cod_usuario) REFERENCES usuario(cod_pessoa)
-                    )'''
-                )
-                # Tabela Farmácia
-                cursor.execute(
-                    '''CREATE TABLE IF NOT EXISTS farmacia (
-                        cod INTEGER PRIMARY KEY,
-                        nome VARCHAR(100),
-                        rua VARCHAR(100),
-                        num INTEGER,
-                        bairro VARCHAR(50),
-                        cep VARCHAR(20),
-                        hora_inicio VARCHAR(5),
-                        hora_fim VARCHAR(5),
-                        dia_funcionamento VARCHAR(20),
-                        cod_admin INTEGER,
-                        FOREIGN KEY (cod_admin) REFERENCES administrador(cod_pessoa)
-                    )'''
-                )
-                # Tabela Tel_Farmácia
-                cursor.execute(
-                    '''CREATE TABLE IF NOT EXISTS tel_farmacia (
-                        numero VARCHAR(20),
-                        cod_farmacia INTEGER,
-                        FOREIGN KEY (cod_farmacia) REFERENCES farmacia(cod)
-                    )'''
-                )
-                # Tabela Estoque
-                cursor.execute(
-                    '''CREATE TABLE IF NOT EXISTS estoque (
-                        cod INTEGER PRIMARY KEY,
-                        quantidade INTEGER
-                    )'''
-                )
-                # Tabela Produto
-                cursor.execute(
-                    '''CREATE TABLE IF NOT EXISTS produto (
-                        cod INTEGER PRIMARY KEY,
-                        nome VARCHAR(100),
-                        preco DOUBLE PRECISION,
-                        cod_admin INTEGER,
-                        cod_estoque INTEGER,
-                        FOREIGN KEY (cod_admin) REFERENCES administrador(cod_pessoa),
-                        FOREIGN KEY (cod_estoque) REFERENCES estoque(cod)
-                    )'''
-                )
-                # Tabela Categoria_Produto
-                cursor.execute(
-                    '''CREATE TABLE IF NOT EXISTS categoria_produto (
-                        categoria VARCHAR(50),
-                        cod_produto INTEGER,
-                        FOREIGN KEY (cod_produto) REFERENCES produto(cod)
-                    )'''
-                )
-                # Tabela Usuário_Produto
-                cursor.execute(
-                    '''CREATE TABLE IF NOT EXISTS usuario_produto (
-                        cod_usuario INTEGER,
-                        cod_produto INTEGER,
-                        FOREIGN KEY (cod_usuario) REFERENCES usuario(cod_pessoa),
-                        FOREIGN KEY (cod_produto) REFERENCES produto(cod)
-                    )'''
-                )
-                # Tabela Usuário_Farmácia
-                cursor.execute(
-                    '''CREATE TABLE IF NOT EXISTS usuario_farmacia (
-                        cod_usuario INTEGER,
-                        cod_farmacia INTEGER,
-                        FOREIGN KEY (cod_usuario) REFERENCES usuario(cod_pessoa),
-                        FOREIGN KEY (cod_farmacia) REFERENCES farmacia(cod)
-                    )'''
-                )
-                conn.commit()
-            except sqlite3.Error as e:
-                print(f"Erro ao criar tabelas: {e}")
+                with BancoDeDados.usando(banco):
+                    # gravar_instantaneo() confere de novo com a trava de escrita (outro processo pode ter gravado).
+                    OperacoesMovimentos.gravar_instantaneo(intervalo)
+                    coberto = BancoDeDados.conectar().execute(
+                        'SELECT coalesce(max(ultimo_movimento), 0) FROM instantaneo_estoque').fetchone()[0]
+                with OperacoesMovimentos._trava:
+                    OperacoesMovimentos._cobertos[banco] = coberto
+            except sqlite3.Error:
+                # O instantâneo fica para a próxima gravação que cruzar o intervalo.
+                pass
             finally:
-                conn.close()
+                with OperacoesMovimentos._trava:
+                    OperacoesMovimentos._pendentes.discard(banco)
+                OperacoesMovimentos._fila.task_done()
 
+    @staticmethod
+    def aguardar_instantaneos() -> None:
+        """
+        Espera a thread de fundo terminar os instantâneos automáticos já agendados.
+        """
+        OperacoesMovimentos._fila.join()
 
-class OperacoesAdministrador:
+    @staticmethod
+    def quantidade_em(codigo: int, momento: float) -> int:
+        """
+        Retorna a quantidade em estoque do produto no instante informado (segundos desde a época),
+        partindo do instantâneo mais próximo anterior e somando apenas os movimentos seguintes.
+        Retorna None se o instante for anterior ao primeiro instantâneo.
+        """
+        conn = BancoDeDados.conectar()
+        try:
+            instantaneo = conn.execute(
+                '''SELECT id, ultimo_movimento FROM instantaneo_estoque
+                   WHERE momento <= ? ORDER BY id DESC LIMIT 1''', (momento,)
+            ).fetchone()
+            if instantaneo is None:
+                return None
+            base = conn.execute(
+                'SELECT quantidade FROM instantaneo_item WHERE cod_instantaneo = ? AND cod_estoque = ?',
+                (instantaneo[0], codigo)
+            ).fetchone()
+            delta = conn.execute(
+                '''SELECT coalesce(sum(delta), 0) FROM movimento_estoque
+                   WHERE cod_estoque = ? AND id > ? AND momento <= ?''',
+                (codigo, instantaneo[1], momento)
+            ).fetchone()[0]
+            return (base[0] if base else 0) + delta
+        finally:
+            BancoDeDados.liberar(conn)
+
+    @staticmethod
+    def movimentos(inicio: float = None, fim: float = None, codigo: int = None) -> list:
+        """
+        Retorna os movimentos (id, código, delta, motivo, cod_admin, momento) com
+        inicio <= momento < fim, opcionalmente de um único produto, na ordem em que ocorreram.
+        """
+        filtros, parametros = [], []
+        if codigo is not None:
+            filtros.append('cod_estoque = ?')
+            parametros.append(codigo)
+        if inicio is not None:
+            filtros.append('momento >= ?')
+            parametros.append(inicio)
+        if fim is not None:
+            filtros.append('momento < ?')
+            parametros.append(fim)
+        onde = f"WHERE {' AND '.join(filtros)}" if filtros else ''
+        conn = BancoDeDados.conectar()
+        try:
+            return conn.execute(
+                f'''SELECT id, cod_estoque, delta, motivo, cod_admin, momento
+                    FROM movimento_estoque {onde} ORDER BY id''', parametros
+            ).fetchall()
+        finally:
+            BancoDeDados.liberar(conn)
+
+    @staticmethod
+    def gravar_instantaneo(minimo_movimentos: int = 1) -> int:
+        """
+        Grava um instantâneo das quantidades atuais se houver ao menos minimo_movimentos
+        desde o último. Retorna o id do instantâneo, ou None se não foi necessário.
+        """
+        with BancoDeDados.transacao() as conn:
+            ultimo = conn.execute('SELECT coalesce(max(id), 0) FROM movimento_estoque').fetchone()[0]
+            anterior = conn.execute(
+                'SELECT ultimo_movimento FROM instantaneo_estoque ORDER BY id DESC LIMIT 1'
+            ).fetchone()
+            if anterior is not None and ultimo - anterior[0] < max(minimo_movimentos, 1):
+                return None
+            cursor = conn.execute(
+                '''INSERT INTO instantaneo_estoque (momento, ultimo_movimento)
+                   VALUES ((julianday('now') - 2440587.5) * 86400.0, ?)''', (ultimo,)
+            )
+            conn.execute(
+                '''INSERT INTO instantaneo_item (cod_instantaneo, cod_estoque, quantidade)
+                   SELECT ?, cod, quantidade FROM estoque WHERE coalesce(quantidade, 0) != 0''',
+                (cursor.lastrowid,)
+            )
+            return cursor.lastrowid
+
+
+class OperacoesPrecos:
     """
-    Operações relacionadas ao administrador do sistema.
+    Consultas ao histórico de preços (historico_preco), gravado pelos gatilhos de produto na
+    mesma transação que altera o preço. O histórico guarda só os trechos: uma linha por mudança,
+    válida até a mudança seguinte, e a chave (produto, início) resolve consultas pontuais pelo índice.
     """
-    admin_atual = None
 
     @staticmethod
-    def cadastrar_administrador() -> None:
+    def preco_em(codigo: int, momento: float) -> float:
         """
-        Realiza o cadastro de um novo administrador.
-        Solicita CPF, e-mail e senha.
+        Retorna o preço do produto no instante informado (segundos desde a época), ou None se
+        o produto não existia ou estava removido nesse instante.
         """
         conn = BancoDeDados.conectar()
-        if conn:
-            try:
-                cpf = int(input("CPF: "))
-                email = input("E-mail: ")
-                senha = input("Senha: ")
-                cursor = conn.cursor()
-                # Insere CPF na tabela pessoa
-                cursor.execute('INSERT INTO pessoa (cpf) VALUES (?)', (cpf,))
-                # Insere administrador na tabela administrador
-                cursor.execute(
-                    '''INSERT INTO administrador (email, senha, cod_pessoa)
-                       VALUES (?, ?, ?)''', (email, senha, cpf)
-                )
-                conn.commit()
-                print("Administrador cadastrado com sucesso!")
-                # Autentica logo após o cadastro
-                OperacoesAdministrador.autenticar_administrador()
-            except sqlite3.IntegrityError:
-                print("Erro: CPF já existe.")
-            except sqlite3.Error as e:
-                print(f"Erro ao cadastrar administrador: {e}")
-            finally:
-                conn.close()
+        try:
+            linha = conn.execute(
+                '''SELECT preco FROM historico_preco
+                   WHERE cod_produto = ? AND inicio <= ? ORDER BY inicio DESC LIMIT 1''',
+                (codigo, momento)
+            ).fetchone()
+            return linha[0] if linha else None
+        finally:
+            BancoDeDados.liberar(conn)
 
     @staticmethod
-    def autenticar_administrador() -> bool:
+    def alteracoes(inicio: float = None, fim: float = None, codigo: int = None) -> list:
         """
-        Autentica um administrador.
-        Solicita CPF e senha.
-        Retorna True se a autenticação for bem-sucedida.
+        Retorna as mudanças de preço (código, momento, preço anterior, preço novo) com
+        inicio <= momento < fim, opcionalmente de um único produto, em ordem cronológica.
+        Preço anterior None indica cadastro; preço novo None indica remoção.
         """
+        filtros, parametros = [], []
+        if codigo is not None:
+            filtros.append('h.cod_produto = ?')
+            parametros.append(codigo)
+        if inicio is not None:
+            filtros.append('h.inicio >= ?')
+            parametros.append(inicio)
+        if fim is not None:
+            filtros.append('h.inicio < ?')
+            parametros.append(fim)
+        onde = f"WHERE {' AND '.join(filtros)}" if filtros else ''
         conn = BancoDeDados.conectar()
-        if conn:
-            try:
-                print("\nLOGIN")
-                cpf = int(input("Digite o CPF: "))
-                senha = input("Digite a senha: ")
-                cursor = conn.cursor()
-                cursor.execute(
-                    'SELECT * FROM administrador WHERE cod_pessoa = ? AND senha = ?',
-                    (cpf, senha)
-                )
-                admin = cursor.fetchone()
-                if admin:
-                    OperacoesAdministrador.admin_atual = cpf
-                    return True
-                else:
-                    print("Credenciais inválidas!")
-                    return False
-            except sqlite3.Error as e:
-                print(f"Erro ao autenticar administrador: {e}")
-                return False
-            finally:
-                conn.close()
-        return False
+        try:
+            return conn.execute(
+                f'''SELECT h.cod_produto, h.inicio,
+                           (SELECT a.preco FROM historico_preco a
+                            WHERE a.cod_produto = h.cod_produto AND a.inicio < h.inicio
+                            ORDER BY a.inicio DESC LIMIT 1),
+                           h.preco
+                    FROM historico_preco h {onde}
+                    ORDER BY h.inicio, h.cod_produto''', parametros
+            ).fetchall()
+        finally:
+            BancoDeDados.liberar(conn)
 
     @staticmethod
-    def administrador_existe() -> bool:
+    def compactar(antes: float = None, resolucao: float = None) -> int:
         """
-        Verifica se já existe ao menos um administrador cadastrado.
+        Junta os trechos seguidos de mesmo preço de cada produto e retorna quantas linhas
+        foram removidas. Com `antes` e `resolucao` (segundos), as mudanças anteriores a `antes`
+        também são reduzidas à última de cada janela de `resolucao` segundos: o preço dentro
+        dessas janelas passa a ser aproximado, mas o de cada fim de janela é preservado.
         """
-        conn = BancoDeDados.conectar()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute('SELECT COUNT(*) FROM administrador')
-                count = cursor.fetchone()[0]
-                return count > 0
-            except sqlite3.Error as e:
-                print(f"Erro ao verificar administradores: {e}")
-                return False
-            finally:
-                conn.close()
-        return False
+        if (antes is None) != (resolucao is None) or (resolucao is not None and resolucao <= 0):
+            raise ValueError("Informe `antes` e uma `resolucao` positiva juntos.")
+        with BancoDeDados.transacao() as conn:
+            removidas = 0
+            if antes is not None:
+                removidas += conn.execute(
+                    '''DELETE FROM historico_preco
+                       WHERE inicio < ? AND (cod_produto, inicio) NOT IN (
+                           SELECT cod_produto, max(inicio) FROM historico_preco WHERE inicio < ?
+                           GROUP BY cod_produto, CAST(inicio / ? AS INTEGER))''',
+                    (antes, antes, resolucao)
+                ).rowcount
+            removidas += conn.execute(
+                '''DELETE FROM historico_preco WHERE (cod_produto, inicio) IN (
+                       SELECT cod_produto, inicio FROM (
+                           SELECT cod_produto, inicio, preco,
+                                  lag(preco) OVER trecho AS anterior,
+                                  row_number() OVER trecho AS ordem
+                           FROM historico_preco
+                           WINDOW trecho AS (PARTITION BY cod_produto ORDER BY inicio))
+                       WHERE ordem > 1 AND preco IS anterior)'''
+            ).rowcount
+        return removidas
 
 
-class OperacoesUsuario:
+class OperacoesRecomendacao:
     """
-    Operações relacionadas ao cadastro de usuários.
+    Recomendações "comprados juntos" mantidas a cada venda confirmada. Um par de produtos é
+    contado quando aparecem na mesma cesta ou quando um usuário compra pela primeira vez um
+    produto e já havia comprado o outro (usuario_produto). Cada produto guarda só os
+    MAX_VIZINHOS vizinhos mais frequentes, no esquema Space-Saving: um vizinho novo num produto
+    cheio entra com a menor contagem do produto mais um e o excedente de menor contagem é
+    descartado, de modo que as contagens podem ser superestimadas, mas os vizinhos realmente
+    frequentes não são descartados. Os pares de uma venda são gravados juntos, em dois comandos.
     """
 
+    # Vizinhos guardados por produto; limita o espaço e o custo de cada consulta.
+    MAX_VIZINHOS = 50
+    # Compras anteriores do usuário (as mais recentes) combinadas com cada produto novo.
+    MAX_HISTORICO = 50
+    # Pares contados por venda; os da própria cesta têm prioridade sobre os do histórico.
+    MAX_PARES = 200
+
     @staticmethod
-    def cadastrar_usuario() -> None:
+    def registrar_compra(conn: sqlite3.Connection, codigos: list, cod_usuario: int = None,
+                         cod_farmacia: int = None) -> None:
         """
-        Realiza o cadastro de um novo usuário.
-        Solicita CPF e telefone.
+        Registra a compra dos produtos na transação corrente: o histórico do usuário
+        (usuario_produto e usuario_farmacia), se informado, e os pares do índice de recomendações.
+        Com as farmácias particionadas, usuario_farmacia é gravado na partição da farmácia
+        depois da confirmação (ver _registrar_cliente).
         """
-        conn = BancoDeDados.conectar()
-        if conn:
-            try:
-                cpf = int(input("CPF: "))
-                telefone = input("Telefone: ")
-                cursor = conn.cursor()
-                # Insere CPF na tabela pessoa
-                cursor.execute('INSERT INTO pessoa (cpf) VALUES (?)', (cpf,))
-                # Insere usuário na tabela usuario
-                cursor.execute('INSERT INTO usuario (cod_pessoa) VALUES (?)', (cpf,))
-                # Insere telefone na tabela tel_usuario
-                cursor.execute(
-                    'INSERT INTO tel_usuario (numero, cod_usuario) VALUES (?, ?)',
-                    (telefone, cpf)
-                )
-                conn.commit()
-                print("Usuário cadastrado com sucesso!")
-            except sqlite3.IntegrityError:
-                print("Já existe um usuário com este CPF.")
-            except sqlite3.Error as e:
-                print(f"Erro ao cadastrar usuário: {e}")
-            finally:
-                conn.close()
+        codigos = list(dict.fromkeys(codigos))
+        novos, contexto = codigos, set(codigos)
+        if cod_usuario is not None:
+            anteriores = [linha[0] for linha in conn.execute(
+                '''SELECT cod_produto FROM usuario_produto WHERE cod_usuario = ?
+                   ORDER BY rowid DESC LIMIT ?''', (cod_usuario, OperacoesRecomendacao.MAX_HISTORICO))]
+            ja_comprados = {linha[0] for linha in conn.execute(
+                f'''SELECT cod_produto FROM usuario_produto
+                    WHERE cod_usuario = ? AND cod_produto IN ({', '.join('?' * len(codigos))})''',
+                [cod_usuario] + codigos)} if codigos else set()
+            novos = [codigo for codigo in codigos if codigo not in ja_comprados]
+            contexto.update(anteriores)
+            conn.executemany('INSERT INTO usuario_produto (cod_usuario, cod_produto) VALUES (?, ?)',
+                             ((cod_usuario, codigo) for codigo in novos))
+            if cod_farmacia is not None:
+                if OperacoesFarmacia.roteador is None:
+                    OperacoesRecomendacao._registrar_cliente(conn, cod_usuario, cod_farmacia)
+                else:
+                    BancoDeDados.apos_confirmar(
+                        lambda: OperacoesRecomendacao._registrar_cliente_particao(cod_usuario, cod_farmacia))
+        cesta = set(codigos)
+        pares = sorted({(min(a, b), max(a, b)) for a in novos for b in contexto if a != b},
+                       key=lambda par: (par[0] not in cesta or par[1] not in cesta, par))
+        OperacoesRecomendacao._contar(conn, pares[:OperacoesRecomendacao.MAX_PARES])
 
+    @staticmethod
+    def _registrar_cliente(conn: sqlite3.Connection, cod_usuario: int, cod_farmacia: int) -> None:
+        conn.execute(
+            '''INSERT INTO usuario_farmacia (cod_usuario, cod_farmacia) SELECT ?, ?
+               WHERE NOT EXISTS (SELECT 1 FROM usuario_farmacia
+                                 WHERE cod_usuario = ? AND cod_farmacia = ?)''',
+            (cod_usuario, cod_farmacia, cod_usuario, cod_farmacia)
+        )
 
-class OperacoesFarmacia:
+    @staticmethod
+    def _registrar_cliente_particao(cod_usuario: int, cod_farmacia: int) -> None:
+        # A troca de banco não é possível dentro da transação da venda; o vínculo é gravado
+        # na partição depois que ela é confirmada.
+        try:
+            with OperacoesFarmacia._particao(cod_farmacia):
+                with BancoDeDados.transacao() as conn:
+                    OperacoesRecomendacao._registrar_cliente(conn, cod_usuario, cod_farmacia)
+        except sqlite3.Error:
+            # A venda já foi confirmada; o vínculo volta a ser gravado na próxima compra.
+            pass
+
+    @staticmethod
+    def _contar(conn: sqlite3.Connection, pares: list) -> None:
+        if not pares:
+            return
+        sentidos = [codigo for a, b in pares for codigo in (a, b, b, a)]
+        produtos = sorted({codigo for par in pares for codigo in par})
+        # Um vizinho novo num produto cheio herda a menor contagem do produto (lida antes da venda).
+        conn.execute(
+            f'''INSERT INTO coocorrencia (cod_produto, cod_vizinho, contagem)
+                SELECT par.column1, par.column2, 1 + (
+                    SELECT CASE WHEN count(*) >= ? THEN min(contagem) ELSE 0 END
+                    FROM coocorrencia WHERE cod_produto = par.column1)
+                FROM (VALUES {', '.join(['(?, ?)'] * (2 * len(pares)))}) AS par WHERE true
+                ON CONFLICT (cod_produto, cod_vizinho) DO UPDATE SET contagem = contagem + 1''',
+            [OperacoesRecomendacao.MAX_VIZINHOS] + sentidos
+        )
+        conn.execute(
+            f'''DELETE FROM coocorrencia WHERE (cod_produto, cod_vizinho) IN (
+                    SELECT cod_produto, cod_vizinho FROM (
+                        SELECT cod_produto, cod_vizinho, row_number() OVER (
+                            PARTITION BY cod_produto ORDER BY contagem DESC, cod_vizinho DESC) AS posicao
+                        FROM coocorrencia WHERE cod_produto IN ({', '.join('?' * len(produtos))}))
+                    WHERE posicao > ?)''',
+            produtos + [OperacoesRecomendacao.MAX_VIZINHOS]
+        )
+
+    @staticmethod
+    def recomendar(codigos: list, quantidade: int = 5) -> list:
+        """
+        Retorna até `quantidade` produtos comprados junto com os da cesta informada, como
+        (código, pontuação), da maior pontuação para a menor. A pontuação soma as contagens
+        com cada produto da cesta; os produtos da própria cesta e os removidos ficam de fora.
+        Lê no máximo MAX_VIZINHOS linhas por produto da cesta.
+        """
+        codigos = list(dict.fromkeys(codigos))
+        if not codigos:
+            return []
+        marcadores = ', '.join('?' * len(codigos))
+        with BancoDeDados.leitura():
+            conn = BancoDeDados.conectar()
+        try:
+            return conn.execute(
+                f'''SELECT c.cod_vizinho, sum(c.contagem) AS pontuacao
+                    FROM coocorrencia c JOIN produto p ON p.cod = c.cod_vizinho
+                    WHERE c.cod_produto IN ({marcadores}) AND c.cod_vizinho NOT IN ({marcadores})
+                    GROUP BY c.cod_vizinho
+                    ORDER BY pontuacao DESC, c.cod_vizinho
+                    LIMIT ?''',
+                codigos + codigos + [quantidade]
+            ).fetchall()
+        finally:
+            BancoDeDados.liberar(conn)
+
+
+class OperacoesResumo:
     """
-    Operações relacionadas ao gerenciamento de farmácias.
+    Consultas analíticas sobre os resumos do estoque mantidos pelos gatilhos
+    (custo proporcional ao número de categorias ou administradores, não de produtos),
+    além da reconstrução e da verificação completas dos resumos.
     """
 
+    # Agregações completas sobre o catálogo, usadas na reconstrução e na verificação.
+    AGREGADO_CATEGORIA = '''
+        SELECT c.categoria, count(*), sum(q), sum(q * CAST(round(coalesce(preco, 0) * 100) AS INTEGER)),
+               sum(q < (SELECT estoque_minimo FROM resumo_parametros))
+        FROM categoria_produto c
+        JOIN (SELECT p.cod, p.preco, coalesce(e.quantidade, 0) AS q
+              FROM produto p LEFT JOIN estoque e ON e.cod = p.cod_estoque) ON cod = c.cod_produto
+        WHERE c.categoria IS NOT NULL
+        GROUP BY c.categoria'''
+    AGREGADO_ADMIN = '''
+        SELECT cod_admin, count(*), sum(q), sum(q * CAST(round(coalesce(preco, 0) * 100) AS INTEGER)),
+               sum(q < (SELECT estoque_minimo FROM resumo_parametros))
+        FROM (SELECT p.cod_admin, p.preco, coalesce(e.quantidade, 0) AS q
+              FROM produto p LEFT JOIN estoque e ON e.cod = p.cod_estoque)
+        WHERE cod_admin IS NOT NULL
+        GROUP BY cod_admin'''
+    TABELAS = {'resumo_categoria': ('categoria', AGREGADO_CATEGORIA), 'resumo_admin': ('cod_admin', AGREGADO_ADMIN)}
+
     @staticmethod
-    def cadastrar_farmacia() -> None:
+    def _consultar(tabela: str) -> list:
+        chave = OperacoesResumo.TABELAS[tabela][0]
+        with BancoDeDados.leitura():
+            conn = BancoDeDados.conectar()
+        try:
+            linhas = conn.execute(
+                f'''SELECT {chave}, produtos, unidades, valor_centavos, abaixo_minimo FROM {tabela}
+                    WHERE produtos > 0 ORDER BY valor_centavos DESC, {chave}'''
+            ).fetchall()
+        finally:
+            BancoDeDados.liberar(conn)
+        return [(chave, produtos, unidades, centavos / 100, abaixo)
+                for chave, produtos, unidades, centavos, abaixo in linhas]
+
+    @staticmethod
+    def por_categoria() -> list:
         """
-        Realiza o cadastro de uma nova farmácia.
-        Solicita os dados da farmácia e os registra no banco.
+        Retorna (categoria, produtos, unidades, valor em estoque, produtos abaixo do mínimo),
+        da categoria de maior valor para a de menor.
         """
-        if OperacoesAdministrador.admin_atual is None:
-            print("É necessário estar autenticado como administrador para cadastrar farmácias.")
-            return
+        return OperacoesResumo._consultar('resumo_categoria')
 
-        conn = BancoDeDados.conectar()
-        if conn:
-            try:
-                codigo = int(input("Código da farmácia: "))
-                nome = input("Nome da farmácia: ")
-                telefone = input("Telefone: ")
-                rua = input("Rua: ")
-                numero = int(input("Número: "))
-                bairro = input("Bairro: ")
-                cep = input("CEP: ")
-                hora_inicio = input("Horário de abertura (HH:mm): ")
-                hora_fim = input("Horário de fechamento (HH:mm): ")
-                dia_funcionamento = input("Dia(s) de funcionamento (ex: Segunda-Sexta): ")
-                cursor = conn.cursor()
-                # Insere dados na tabela farmacia
-                cursor.execute(
-                    '''INSERT INTO farmacia (cod, nome, rua, num, bairro, cep,
-                       hora_inicio, hora_fim, dia_funcionamento, cod_admin)
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                    (codigo, nome, rua, numero, bairro, cep, hora_inicio,
-                     hora_fim, dia_funcionamento, OperacoesAdministrador.admin_atual)
-                )
-                # Insere telefone na tabela tel_farmacia
-                cursor.execute(
-                    'INSERT INTO tel_farmacia (numero, cod_farmacia) VALUES (?, ?)',
-                    (telefone, codigo)
-                )
-                conn.commit()
-                print("Farmácia cadastrada com sucesso!")
-            except sqlite3.IntegrityError:
-                print("Código da farmácia já existe.")
-            except sqlite3.Error as e:
-                print(f"Erro ao cadastrar farmácia: {e}")
-            finally:
-                conn.close()
+    @staticmethod
+    def por_administrador() -> list:
+        """
+        Retorna (cod_admin, produtos, unidades, valor em estoque, produtos abaixo do mínimo),
+        do administrador de maior valor para o de menor.
+        """
+        return OperacoesResumo._consultar('resumo_admin')
 
     @staticmethod
-    def atualizar_farmacia() -> None:
+    def estoque_minimo() -> int:
         """
-        Atualiza os dados de uma farmácia cadastrada.
-        Solicita os novos dados a partir do código informado.
+        Retorna a quantidade abaixo da qual um produto conta como abaixo do mínimo.
         """
         conn = BancoDeDados.conectar()
-        if conn:
-            try:
-                codigo = int(input("Código da farmácia a ser atualizada: "))
-                nome = input("Novo nome da farmácia: ")
-                telefone = input("Novo telefone: ")
-                rua = input("Nova rua: ")
-                numero = int(input("Novo número: "))
-                bairro = input("Novo bairro: ")
-                cep = input("Novo CEP: ")
-                hora_inicio = input("Novo horário de abertura (HH:mm): ")
-                hora_fim = input("Novo horário de fechamento (HH:mm): ")
-                dia_funcionamento = input("Novo dia(s) de funcionamento: ")
-                cursor = conn.cursor()
-                cursor.execute(
-                    '''UPDATE farmacia SET nome = ?, rua = ?, num = ?, bairro = ?,
-                       cep = ?, hora_inicio = ?, hora_fim = ?, dia_funcionamento = ?
-                       WHERE cod = ?''',
-                    (nome, rua, numero, bairro, cep, hora_inicio, hora_fim,
-                     dia_funcionamento, codigo)
-                )
-                cursor.execute(
-                    'UPDATE tel_farmacia SET numero = ? WHERE cod_farmacia = ?',
-                    (telefone, codigo)
-                )
-                if cursor.rowcount == 0:
-                    print("Farmácia não encontrada.")
-                else:
-                    conn.commit()
-                    print("Dados da farmácia atualizados com sucesso!")
-            except sqlite3.Error as e:
-                print(f"Erro ao atualizar farmácia: {e}")
-            finally:
-                conn.close()
+        try:
+            return conn.execute('SELECT estoque_minimo FROM resumo_parametros').fetchone()[0]
+        finally:
+            BancoDeDados.liberar(conn)
 
     @staticmethod
-    def excluir_farmacia() -> None:
+    def definir_estoque_minimo(quantidade: int) -> None:
         """
-        Exclui uma farmácia a partir do código informado.
+        Altera o estoque mínimo e reconstrói os resumos com o novo limite.
         """
-        conn = BancoDeDados.conectar()
-        if conn:
-            try:
-                codigo = int(input("Código da farmácia a ser excluída: "))
-                cursor = conn.cursor()
-                cursor.execute('DELETE FROM farmacia WHERE cod = ?', (codigo,))
-                if cursor.rowcount == 0:
-                    print("Farmácia não encontrada.")
-                else:
-                    conn.commit()
-                    print("Farmácia excluída com sucesso!")
-            except sqlite3.Error as e:
-                print(f"Erro ao excluir farmácia: {e}")
-            finally:
-                conn.close()
+        with BancoDeDados.transacao() as conn:
+            conn.execute('UPDATE resumo_parametros SET estoque_minimo = ?', (quantidade,))
+            OperacoesResumo.reconstruir()
 
     @staticmethod
-    def consultar_farmacias() -> None:
+    def reconstruir() -> None:
         """
-        Consulta as farmácias que estão em funcionamento em um determinado intervalo de horário.
+        Recalcula os resumos do zero a partir de produto, estoque e categoria_produto.
         """
-        conn = BancoDeDados.conectar()
-        if conn:
-            try:
-                hora_inicio = input("Informe a hora de início (HH:mm): ")
-                hora_fim = input("Informe a hora de término (HH:mm): ")
-                cursor = conn.cursor()
-                cursor.execute(
-                    '''SELECT * FROM farmacia
-                       WHERE hora_inicio <= ? AND hora_fim >= ?''',
-                    (hora_inicio, hora_fim)
+        with BancoDeDados.transacao() as conn:
+            for tabela, (chave, agregado) in OperacoesResumo.TABELAS.items():
+                conn.execute(f'DELETE FROM {tabela}')
+                conn.execute(
+                    f'''INSERT INTO {tabela} ({chave}, produtos, unidades, valor_centavos, abaixo_minimo)
+                        {agregado}'''
                 )
-                farmacias = cursor.fetchall()
-                if farmacias:
-                    print("Farmácias em funcionamento:")
-                    for farmacia in farmacias:
-                        print(f"Farmácia: {farmacia[1]}, Endereço: {farmacia[2]}, "
-                              f"{farmacia[3]}, {farmacia[4]}, {farmacia[5]}")
-                        cursor.execute(
-                            'SELECT numero FROM tel_farmacia WHERE cod_farmacia = ?',
-                            (farmacia[0],)
-                        )
-                        telefone = cursor.fetchone()
-                        if telefone:
-                            print(f"Telefone: {telefone[0]}")
-                else:
-                    print("Nenhuma farmácia encontrada no horário informado.")
-            except sqlite3.Error as e:
-                print(f"Erro ao consultar farmácias: {e}")
-            finally:
-                conn.close()
 
+    @staticmethod
+    def verificar() -> list:
+        """
+        Compara os resumos com a agregação completa do catálogo.
+        Retorna as divergências como (tabela, chave, esperado, encontrado); vazia se consistentes.
+        """
+        divergencias = []
+        conn = BancoDeDados.conectar()
+        try:
+            for tabela, (chave, agregado) in OperacoesResumo.TABELAS.items():
+                esperado = {linha[0]: linha[1:] for linha in conn.execute(agregado)}
+                encontrado = {linha[0]: linha[1:] for linha in conn.execute(
+                    f'''SELECT {chave}, produtos, unidades, valor_centavos, abaixo_minimo FROM {tabela}
+                        WHERE produtos != 0 OR unidades != 0 OR valor_centavos != 0 OR abaixo_minimo != 0'''
+                )}
+                for valor in sorted(esperado.keys() | encontrado.keys(), key=str):
+                    if esperado.get(valor) != encontrado.get(valor):
+                        divergencias.append((tabela, valor, esperado.get(valor), encontrado.get(valor)))
+        finally:
+            BancoDeDados.liberar(conn)
+        return divergencias
 
-class OperacoesProdutos:
+
+class OperacoesAlertas:
     """
-    Operações relacionadas ao gerenciamento de produtos.
+    Limites de reposição e fila de alertas de estoque baixo. Os alertas são gerados pelo
+    gatilho alerta_estoque_au no mesmo UPDATE que reduz o estoque, sem varrer a tabela estoque.
     """
 
     @staticmethod
-    def cadastrar_produto() -> None:
+    def definir_limite_produto(codigo: int, limite: int = None) -> None:
         """
-        Realiza o cadastro de um novo produto.
-        Solicita código, nome, categoria, preço e quantidade.
+        Define o limite de reposição do produto; None remove o limite próprio, voltando ao da categoria.
         """
-        if OperacoesAdministrador.admin_atual is None:
-            print("É necessário estar autenticado como administrador para cadastrar produtos.")
-            return
-
-        conn = BancoDeDados.conectar()
-        if conn:
-            try:
-                codigo = int(input("Código do produto: "))
-                nome = input("Nome do produto: ")
-                categoria = input("Categoria do produto: ")
-                preco = float(input("Preço do produto: R$ "))
-                quantidade = int(input("Quantidade do produto: "))
-                cursor = conn.cursor()
-                # Insere dados na tabela produto
-                cursor.execute(
-                    '''INSERT INTO produto (cod, nome, preco, cod_admin, cod_estoque)
-                       VALUES (?, ?, ?, ?, ?)''',
-                    (codigo, nome, preco, OperacoesAdministrador.admin_atual, codigo)
-                )
-                # Insere categoria na tabela categoria_produto
-                cursor.execute(
-                    '''INSERT INTO categoria_produto (categoria, cod_produto)
-                       VALUES (?, ?)''', (categoria, codigo)
-                )
-                # Insere quantidade na tabela estoque
-                cursor.execute(
-                    '''INSERT INTO estoque (cod, quantidade)
-                       VALUES (?, ?)''', (codigo, quantidade)
-                )
-                conn.commit()
-                print("Produto cadastrado com sucesso!")
-            except sqlite3.IntegrityError:
-                print("Já existe um produto com este código.")
-            except sqlite3.Error as e:
-                print(f"Erro ao cadastrar produto: {e}")
-            finally:
-                conn.close()
+        with BancoDeDados.transacao() as conn:
+            if limite is None:
+                conn.execute('DELETE FROM limite_produto WHERE cod_produto = ?', (codigo,))
+            else:
+                conn.execute('INSERT OR REPLACE INTO limite_produto (cod_produto, limite) VALUES (?, ?)',
+                             (codigo, limite))
 
     @staticmethod
-    def atualizar_produto() -> None:
+    def definir_limite_categoria(categoria: str, limite: int = None) -> None:
         """
-        Atualiza os dados de um produto.
-        Solicita novos dados a partir do código informado.
+        Define o limite de reposição dos produtos da categoria; None remove o limite.
         """
-        conn = BancoDeDados.conectar()
-        if conn:
-            try:
-                codigo = int(input("Código do produto a ser atualizado: "))
-                nome = input("Novo nome do produto: ")
-                categoria = input("Nova categoria do produto: ")
-                preco = float(input("Novo preço do produto: R$ "))
-                quantidade = int(input("Nova quantidade do produto: "))
-                cursor = conn.cursor()
-                cursor.execute(
-                    '''UPDATE produto SET nome = ?, preco = ?
-                       WHERE cod = ?''',
-                    (nome, preco, codigo)
-                )
-                cursor.execute(
-                    '''UPDATE estoque SET quantidade = ?
-                       WHERE cod = ?''',
-                    (quantidade, codigo)
-                )
-                cursor.execute(
-                    '''UPDATE categoria_produto SET categoria = ?
-                       WHERE cod_produto = ?''',
-                    (categoria, codigo)
-                )
-                if cursor.rowcount == 0:
-                    print("Produto não encontrado.")
-                else:
-                    conn.commit()
-                    print("Dados do produto atualizados com sucesso!")
-            except sqlite3.Error as e:
-                print(f"Erro ao atualizar produto: {e}")
-            finally:
-                conn.close()
+        with BancoDeDados.transacao() as conn:
+            if limite is None:
+                conn.execute('DELETE FROM limite_categoria WHERE categoria = ?', (categoria,))
+            else:
+                conn.execute('INSERT OR REPLACE INTO limite_categoria (categoria, limite) VALUES (?, ?)',
+                             (categoria, limite))
 
     @staticmethod
-    def excluir_produto() -> None:
+    def pendentes(maximo: int = None) -> list:
         """
-        Exclui um produto a partir do código informado.
+        Retorna os alertas ainda não consumidos (até `maximo`, se informado), como
+        (id, produto, quantidade, limite, momento), do mais antigo para o mais recente.
         """
         conn = BancoDeDados.conectar()
-        if conn:
-            try:
-                codigo = int(input("Código do produto a ser excluído: "))
-                cursor = conn.cursor()
-                cursor.execute('DELETE FROM produto WHERE cod = ?', (codigo,))
-                cursor.execute('DELETE FROM categoria_produto WHERE cod_produto = ?', (codigo,))
-                cursor.execute('DELETE FROM estoque WHERE cod = ?', (codigo,))
-                if cursor.rowcount == 0:
-                    print("Produto não encontrado.")
-                else:
-                    conn.commit()
-                    print("Produto excluído com sucesso!")
-            except sqlite3.Error as e:
-                print(f"Erro ao excluir produto: {e}")
-            finally:
-                conn.close()
+        try:
+            return conn.execute(
+                'SELECT id, cod_produto, quantidade, limite, momento FROM alerta_estoque ORDER BY id LIMIT ?',
+                (-1 if maximo is None else maximo,)
+            ).fetchall()
+        finally:
+            BancoDeDados.liberar(conn)
 
     @staticmethod
-    def buscar_produto() -> None:
+    def confirmar(ultimo_id: int) -> int:
         """
-        Busca um produto a partir do nome.
-        Exibe os detalhes do produto caso seja encontrado.
+        Retira da fila os alertas entregues, até o id informado. Retorna quantos foram retirados.
         """
-        conn = BancoDeDados.conectar()
-        if conn:
-            try:
-                nome = input("Informe o nome do produto: ")
-                cursor = conn.cursor()
-                cursor.execute(
-                    'SELECT * FROM produto WHERE LOWER(nome) = ?',
-                    (nome.lower(),)
-                )
-                produto = cursor.fetchone()
-                if not produto:
-                    print("Produto não encontrado.")
-                    return
-                cursor.execute(
-                    'SELECT categoria FROM categoria_produto WHERE cod_produto = ?',
-                    (produto[0],)
-                )
-                categoria = cursor.fetchone()
-                cursor.execute(
-                    'SELECT quantidade FROM estoque WHERE cod = ?',
-                    (produto[0],)
-                )
-                estoque = cursor.fetchone()
-                print(f"Produto encontrado: {produto[1]} - Categoria: {categoria[0]} - "
-                      f"Preço: R${produto[2]:.2f} - Quantidade: {estoque[0]}")
-            except sqlite3.Error as e:
-                print(f"Erro ao buscar produto: {e}")
-            finally:
-                conn.close()
+        with BancoDeDados.transacao() as conn:
+            return conn.execute('DELETE FROM alerta_estoque WHERE id <= ?', (ultimo_id,)).rowcount
 
     @staticmethod
-    def decrementar_estoque() -> None:
+    def consumir(maximo: int = 100, entregar=None) -> list:
         """
-        Decrementa a quantidade de um produto no estoque.
-        Solicita o nome do produto e a quantidade a ser decrementada.
+        Lê e retorna até `maximo` alertas, do mais antigo para o mais recente, e os retira da fila.
+        Com `entregar`, a função recebe o lote antes da retirada e os alertas só saem da fila se
+        ela terminar sem exceção: a entrega é feita pelo menos uma vez, e uma falha (ou queda
+        do processo) entre a entrega e a retirada repete os mesmos alertas, identificados pelo id.
         """
-        conn = BancoDeDados.conectar()
-        if conn:
-            try:
-                nome = input("Informe o nome do produto: ")
-                quantidade = int(input("Quantidade a ser decrementada: "))
-                cursor = conn.cursor()
-                cursor.execute(
-                    'SELECT * FROM produto WHERE LOWER(nome) = ?',
-                    (nome.lower(),)
-                )
-                produto = cursor.fetchone()
-                if not produto:
-                    print("Produto não encontrado.")
-                    return
-                cursor.execute(
-                    'SELECT quantidade FROM estoque WHERE cod = ?',
-                    (produto[0],)
-                )
-                estoque = cursor.fetchone()
-                nova_quantidade = estoque[0] - quantidade
-                if nova_quantidade < 0:
-                    print("Quantidade para decrementar é maior que a disponível.")
-                    return
-                cursor.execute(
-                    'UPDATE estoque SET quantidade = ? WHERE cod = ?',
-                    (nova_quantidade, produto[0])
-                )
-                conn.commit()
-                print("Estoque decrementado com sucesso!")
-            except sqlite3.Error as e:
-                print(f"Erro ao decrementar estoque: {e}")
-            finally:
-                conn.close()
+        alertas = OperacoesAlertas.pendentes(maximo)
+        if alertas:
+            if entregar is not None:
+                entregar(alertas)
+            OperacoesAlertas.confirmar(alertas[-1][0])
+        return alertas
 
 
 def menu() -> None:
     """
     Exibe o menu principal e direciona a opção escolhida para a operação correspondente.
     """
+    # Ativa as métricas quando PHARMANALYTICS_METRICAS indica o arquivo de saída
+    if os.environ.get('PHARMANALYTICS_METRICAS'):
+        from pharmanalytics_metricas import Instrumentacao
+        Instrumentacao.ativar()
+        Instrumentacao.iniciar_exportacao(os.environ['PHARMANALYTICS_METRICAS'])
+
     # Inicializa o banco de dados e as tabelas
     BancoDeDados.criar_tabelas()
+    # Particiona as farmácias quando PHARMANALYTICS_PARTICOES indica a quantidade de bancos
+    if os.environ.get('PHARMANALYTICS_PARTICOES'):
+        OperacoesFarmacia.roteador = RoteadorFarmacias(RoteadorFarmacias.nomes_particoes(
+            BancoDeDados.NOME_DB, int(os.environ['PHARMANALYTICS_PARTICOES'])))
+        OperacoesFarmacia.roteador.criar_tabelas()
+
+    # Atende as consultas por uma réplica quando PHARMANALYTICS_REPLICA indica o arquivo dela
+    if os.environ.get('PHARMANALYTICS_REPLICA'):
+        BancoDeDados.replica = ReplicaLeitura(
+            os.environ['PHARMANALYTICS_REPLICA'], float(os.environ.get('PHARMANALYTICS_REPLICA_INTERVALO', 30)))
+        BancoDeDados.replica.iniciar()
 
     # Verifica se há um administrador cadastrado; se não houver, solicita o cadastro inicial.
     if not OperacoesAdministrador.administrador_existe():
@@ -635,6 +3192,8 @@ def menu() -> None:
                 "9  -  Consultar farmácias\n"
                 "10 -  Buscar produto\n"
                 "11 -  Decrementar estoque\n"
+                "12 -  Buscar farmácias por localidade\n"
+                "13 -  Reajustar preços em lote\n"
                 "0  -  Sair\n"
                 "Opção: "
             ))
@@ -660,8 +3219,15 @@ def menu() -> None:
                 OperacoesProdutos.buscar_produto()
             elif opcao == 11:
                 OperacoesProdutos.decrementar_estoque()
+            elif opcao == 12:
+                OperacoesFarmacia.consultar_farmacias_por_localidade()
+            elif opcao == 13:
+                OperacoesProdutos.reajustar_produtos()
             elif opcao == 0:
                 print("Saindo do sistema. Até logo!")
+                if BancoDeDados.replica is not None:
+                    BancoDeDados.replica.parar()
+                BancoDeDados.fechar_conexoes()
                 break
             else:
                 print("Opção inválida. Tente novamente!")
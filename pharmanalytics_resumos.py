@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Resumos analíticos do estoque do PharmAnalytics.
+Mostra as unidades e o valor em estoque por categoria e por administrador a partir das
+tabelas de resumo mantidas pelos gatilhos, e permite reconstruí-las ou verificá-las
+contra a agregação completa do catálogo.
+
+Uso: python pharmanalytics_resumos.py {mostrar,reconstruir,verificar} [--por categoria|admin]
+"""
+
+import argparse
+import sqlite3
+import sys
+
+from pharmanalytics_reformulado import BancoDeDados, OperacoesResumo
+
+
+def main(argumentos: list = None) -> int:
+    """
+    Ponto de entrada da linha de comando.
+    Na verificação, retorna 1 se algum resumo divergir do catálogo.
+    """
+    parser = argparse.ArgumentParser(description="Resumos do estoque do PharmAnalytics.")
+    parser.add_argument('acao', choices=('mostrar', 'reconstruir', 'verificar'))
+    parser.add_argument('--por', choices=('categoria', 'admin'), default='categoria')
+    parser.add_argument('--estoque-minimo', type=int, help="novo limite de estoque baixo (reconstrói os resumos)")
+    parser.add_argument('--banco', default=BancoDeDados.NOME_DB)
+    args = parser.parse_args(argumentos)
+
+    BancoDeDados.NOME_DB = args.banco
+    BancoDeDados.criar_tabelas()
+    try:
+        if args.acao == 'mostrar':
+            linhas = OperacoesResumo.por_categoria() if args.por == 'categoria' else OperacoesResumo.por_administrador()
+            print(f"{args.por:<30} {'produtos':>9} {'unidades':>10} {'valor (R$)':>14} {'abaixo':>7}"
+                  f"  (estoque mínimo: {OperacoesResumo.estoque_minimo()})")
+            for chave, produtos, unidades, valor, abaixo in linhas:
+                print(f"{str(chave):<30} {produtos:>9} {unidades:>10} {valor:>14.2f} {abaixo:>7}")
+        elif args.acao == 'reconstruir':
+            if args.estoque_minimo is not None:
+                OperacoesResumo.definir_estoque_minimo(args.estoque_minimo)
+            else:
+                OperacoesResumo.reconstruir()
+            print("Resumos reconstruídos.")
+        else:
+            divergencias = OperacoesResumo.verificar()
+            for tabela, chave, esperado, encontrado in divergencias:
+                print(f"{tabela} [{chave}]: esperado {esperado}, encontrado {encontrado}")
+            if divergencias:
+                print(f"{len(divergencias)} divergência(s). Use 'reconstruir' para corrigir.")
+                return 1
+            print("Resumos consistentes.")
+    except sqlite3.Error as e:
+        print(f"Erro ao processar os resumos: {e}")
+        return 1
+    finally:
+        BancoDeDados.fechar_conexoes()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
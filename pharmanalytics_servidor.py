@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Serviço HTTP/JSON do PharmAnalytics.
+Um único processo asyncio atende todos os terminais: as operações bloqueantes do
+SQLite rodam num pool limitado de threads (cada uma com sua conexão persistente),
+com tempo limite por requisição e recusa imediata (503) quando a fila está cheia.
+Uma requisição ocupa sua vaga na fila até a thread terminá-la, mesmo depois do tempo
+limite. O 504 informa se a operação foi descartada antes de começar ("executada": false)
+ou se continua em andamento e ainda pode ser confirmada ("executada": null): nesse caso,
+consulte o estado antes de repetir uma venda, para não dar baixa duas vezes.
+
+Rotas:
+    GET  /saude                            estado do serviço e defasagem da réplica de leitura
+    GET  /produtos?q=TERMO&limite=N       pesquisa por nome/categoria
+    GET  /produtos?ordem=nome&categoria=C&limite=N&cursor=X  listagem paginada (sem q)
+    GET  /produtos/COD                     produto pelo código
+    POST /produtos                         cadastro (administrador)
+    POST /vendas                           baixa de estoque {"itens": [{"produto": 1, "quantidade": 2}]}
+                                           (opcionais: "usuario": CPF, "farmacia": COD)
+    GET  /recomendacoes?produtos=1,2&limite=N  produtos comprados junto com a cesta
+    GET  /farmacias?inicio=HH:mm&fim=HH:mm farmácias abertas no intervalo
+    GET  /farmacias?cep=P&bairro=B&rua=R&aberta_em=HH:mm  farmácias por prefixo de localidade
+    GET  /farmacias?ordem=nome&limite=N&cursor=X           listagem paginada (sem filtros)
+    POST /farmacias                        cadastro (administrador)
+    GET  /usuarios?limite=N&cursor=X       listagem paginada (administrador)
+    POST /usuarios                         cadastro de usuário
+    POST /sessoes                          abre sessão de administrador {"cpf": 1, "senha": "..."}
+    DELETE /sessoes                        encerra a sessão do token informado
+
+Rotas de administrador aceitam o token da sessão (Authorization: Bearer TOKEN)
+ou autenticação HTTP Basic (CPF e senha).
+
+Uso: python pharmanalytics_servidor.py --porta 8080 --trabalhadores 8
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import re
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from pharmanalytics_reformulado import (
+    BancoDeDados, EscritorEstoque, OperacoesAdministrador, OperacoesFarmacia,
+    OperacoesProdutos, OperacoesRecomendacao, OperacoesUsuario, ReplicaLeitura, RoteadorFarmacias
+)
+
+MENSAGENS_STATUS = {
+    200: 'OK', 201: 'Created', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found',
+    405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large',
+    500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout',
+}
+
+
+class ErroRequisicao(Exception):
+    """
+    Erro de requisição convertido diretamente numa resposta HTTP.
+    """
+
+    def __init__(self, status: int, mensagem: str) -> None:
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+
+class ServidorHTTP:
+    """
+    Servidor HTTP/1.1 mínimo sobre asyncio que expõe as operações do PharmAnalytics.
+    """
+
+    # Tamanho máximo aceito para o corpo de uma requisição.
+    MAXIMO_CORPO = 1024 * 1024
+    # Segundos de espera pela linha de requisição, pelos cabeçalhos e pelo corpo; clientes
+    # ociosos ou lentos demais têm a conexão encerrada.
+    TEMPO_LEITURA = 30.0
+
+    def __init__(self, host: str = '127.0.0.1', porta: int = 8080, trabalhadores: int = 8,
+                 max_pendentes: int = 64, tempo_limite: float = 5.0) -> None:
+        self.host = host
+        self.porta = porta
+        self.max_pendentes = max_pendentes
+        self.tempo_limite = tempo_limite
+        self.pendentes = 0
+        self._trava = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix='pharmanalytics')
+        self._servidor = None
+        self.rotas = [
+            ('GET', re.compile(r'/saude'), self._saude),
+            ('GET', re.compile(r'/produtos'), self._pesquisar_produtos),
+            ('GET', re.compile(r'/produtos/(\d+)'), self._obter_produto),
+            ('POST', re.compile(r'/produtos'), self._cadastrar_produto),
+            ('POST', re.compile(r'/vendas'), self._finalizar_venda),
+            ('GET', re.compile(r'/recomendacoes'), self._recomendar),
+            ('GET', re.compile(r'/farmacias'), self._listar_farmacias),
+            ('POST', re.compile(r'/farmacias'), self._cadastrar_farmacia),
+            ('GET', re.compile(r'/usuarios'), self._listar_usuarios),
+            ('POST', re.compile(r'/usuarios'), self._cadastrar_usuario),
+            ('POST', re.compile(r'/sessoes'), self._iniciar_sessao),
+            ('DELETE', re.compile(r'/sessoes'), self._encerrar_sessao),
+        ]
+
+    async def iniciar(self) -> asyncio.AbstractServer:
+        """
+        Começa a aceitar conexões e retorna o servidor asyncio.
+        A porta efetivamente usada fica em self.porta (útil com porta 0).
+        """
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.porta)
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+        return self._servidor
+
+    async def encerrar(self) -> None:
+        """
+        Para de aceitar conexões e aguarda as operações em andamento.
+        """
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+        self._executor.shutdown(wait=True)
+
+    async def _atender(self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                linha = await asyncio.wait_for(leitor.readline(), ServidorHTTP.TEMPO_LEITURA)
+                if not linha.strip():
+                    break
+                try:
+                    metodo, alvo, versao = linha.decode('latin-1').split()
+                except ValueError:
+                    await self._responder(escritor, 400, {'erro': 'Linha de requisição inválida.'}, False)
+                    break
+                cabecalhos = await asyncio.wait_for(ServidorHTTP._ler_cabecalhos(leitor), ServidorHTTP.TEMPO_LEITURA)
+                manter = (cabecalhos.get('connection', '').lower() != 'close'
+                          and versao.upper() == 'HTTP/1.1')
+                tamanho = cabecalhos.get('content-length') or '0'
+                if not re.fullmatch(r'[0-9]+', tamanho):
+                    await self._responder(escritor, 400, {'erro': 'Content-Length inválido.'}, False)
+                    break
+                tamanho = int(tamanho)
+                if tamanho > ServidorHTTP.MAXIMO_CORPO:
+                    await self._responder(escritor, 413, {'erro': 'Corpo muito grande.'}, False)
+                    break
+                corpo = b''
+                if tamanho:
+                    corpo = await asyncio.wait_for(leitor.readexactly(tamanho), ServidorHTTP.TEMPO_LEITURA)
+                status, dados = await self._despachar(metodo.upper(), alvo, cabecalhos, corpo)
+                await self._responder(escritor, status, dados, manter)
+                if not manter:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError, ValueError):
+            # Conexão interrompida, cliente lento demais ou linha acima do limite do leitor.
+            pass
+        finally:
+            escritor.close()
+
+    @staticmethod
+    async def _ler_cabecalhos(leitor: asyncio.StreamReader) -> dict:
+        cabecalhos = {}
+        while True:
+            cabecalho = await leitor.readline()
+            if cabecalho in (b'\r\n', b'\n', b''):
+                return cabecalhos
+            nome, _, valor = cabecalho.decode('latin-1').partition(':')
+            cabecalhos[nome.strip().lower()] = valor.strip()
+
+    @staticmethod
+    async def _responder(escritor: asyncio.StreamWriter, status: int, dados, manter: bool) -> None:
+        corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+        cabecalhos = [
+            f'HTTP/1.1 {status} {MENSAGENS_STATUS.get(status, "")}',
+            'Content-Type: application/json; charset=utf-8',
+            f'Content-Length: {len(corpo)}',
+            f'Connection: {"keep-alive" if manter else "close"}',
+        ]
+        if status == 503:
+            cabecalhos.append('Retry-After: 1')
+        escritor.write(('\r\n'.join(cabecalhos) + '\r\n\r\n').encode('latin-1') + corpo)
+        await escritor.drain()
+
+    async def _despachar(self, metodo: str, alvo: str, cabecalhos: dict, corpo: bytes) -> tuple:
+        url = urlsplit(alvo)
+        manipulador, grupos, caminho_existe = None, (), False
+        for metodo_rota, padrao, funcao in self.rotas:
+            casamento = padrao.fullmatch(url.path)
+            if casamento:
+                caminho_existe = True
+                if metodo_rota == metodo:
+                    manipulador, grupos = funcao, casamento.groups()
+                    break
+        if manipulador is None:
+            if caminho_existe:
+                return 405, {'erro': 'Método não permitido.'}
+            return 404, {'erro': 'Rota não encontrada.'}
+        if self.pendentes >= self.max_pendentes:
+            return 503, {'erro': 'Servidor ocupado, tente novamente.'}
+        try:
+            parametros = {chave: valores[-1] for chave, valores in parse_qs(url.query).items()}
+            dados = json.loads(corpo) if corpo else None
+        except (ValueError, UnicodeDecodeError):
+            return 400, {'erro': 'JSON inválido.'}
+        with self._trava:
+            self.pendentes += 1
+        try:
+            trabalho = self._executor.submit(self._executar, manipulador, parametros, dados, cabecalhos, grupos)
+        except RuntimeError:
+            self._liberar()
+            return 503, {'erro': 'Servidor encerrando.'}
+        # A vaga só é devolvida quando a thread termina (ou o trabalho é cancelado antes de começar).
+        trabalho.add_done_callback(self._liberar)
+        espera = asyncio.wrap_future(trabalho)
+        concluidos, _ = await asyncio.wait({espera}, timeout=self.tempo_limite)
+        if concluidos:
+            return espera.result()
+        if trabalho.cancel():
+            return 504, {'erro': 'Tempo limite excedido; a operação não foi executada.', 'executada': False}
+        return 504, {'erro': 'Tempo limite excedido; a operação continua em andamento e pode ser confirmada.',
+                     'executada': None}
+
+    def _liberar(self, trabalho=None) -> None:
+        with self._trava:
+            self.pendentes -= 1
+
+    @staticmethod
+    def _executar(manipulador, parametros: dict, dados, cabecalhos: dict, grupos: tuple) -> tuple:
+        try:
+            return manipulador(parametros, dados, cabecalhos, *grupos)
+        except ErroRequisicao as e:
+            return e.status, {'erro': e.mensagem}
+        except (KeyError, TypeError, ValueError, OverflowError) as e:
+            return 400, {'erro': f'Dados inválidos: {e}'}
+        except sqlite3.IntegrityError:
+            return 409, {'erro': 'Registro já existe.'}
+        except sqlite3.Error as e:
+            return 500, {'erro': f'Erro no banco de dados: {e}'}
+        except Exception as e:
+            # Qualquer outra falha ainda vira uma resposta, sem derrubar a conexão do cliente.
+            return 500, {'erro': f'Erro interno: {e}'}
+
+    @staticmethod
+    def autenticar(cabecalhos: dict) -> int:
+        """
+        Valida o token de sessão (Bearer) ou as credenciais HTTP Basic (CPF:senha)
+        e retorna o CPF do administrador.
+        """
+        autorizacao = cabecalhos.get('authorization', '')
+        if autorizacao.lower().startswith('bearer '):
+            sessao = OperacoesAdministrador.obter_sessao(autorizacao[7:].strip())
+            if sessao is not None:
+                return sessao.cpf
+        elif autorizacao.lower().startswith('basic '):
+            try:
+                cpf, _, senha = base64.b64decode(autorizacao[6:]).decode('utf-8').partition(':')
+                if OperacoesAdministrador.verificar_credenciais(int(cpf), senha):
+                    return int(cpf)
+            except (ValueError, UnicodeDecodeError):
+                pass
+        raise ErroRequisicao(401, 'Autenticação de administrador necessária.')
+
+    @staticmethod
+    def _produto_dict(produto: tuple) -> dict:
+        return dict(zip(('cod', 'nome', 'categoria', 'preco', 'quantidade'), produto))
+
+    def _saude(self, parametros, dados, cabecalhos) -> tuple:
+        resposta = {'status': 'ok', 'pendentes': self.pendentes}
+        if BancoDeDados.replica is not None:
+            defasagem = BancoDeDados.replica.defasagem()
+            resposta['replica'] = {'defasagem': None if defasagem is None else round(defasagem, 3),
+                                   'disponivel': BancoDeDados.replica.disponivel()}
+        return 200, resposta
+
+    @staticmethod
+    def _pagina(linhas: list, proximo: str, campos: tuple) -> dict:
+        return {'itens': [dict(zip(campos, linha)) for linha in linhas], 'proximo': proximo}
+
+    def _pesquisar_produtos(self, parametros, dados, cabecalhos) -> tuple:
+        if 'q' not in parametros:
+            return 200, ServidorHTTP._pagina(*OperacoesProdutos.listar_produtos(
+                int(parametros.get('limite', 50)), parametros.get('cursor'), parametros.get('ordem', 'cod'),
+                parametros.get('categoria')), ('cod', 'nome', 'categoria', 'preco', 'quantidade'))
+        limite = int(parametros.get('limite', OperacoesProdutos.LIMITE_BUSCA))
+        produtos = OperacoesProdutos.pesquisar_produtos(parametros.get('q', ''), limite)
+        return 200, [ServidorHTTP._produto_dict(produto) for produto in produtos]
+
+    def _obter_produto(self, parametros, dados, cabecalhos, codigo) -> tuple:
+        produto = OperacoesProdutos.obter_produto(codigo=int(codigo))
+        if produto is None:
+            return 404, {'erro': OperacoesProdutos.NAO_ENCONTRADO}
+        return 200, ServidorHTTP._produto_dict(produto)
+
+    def _cadastrar_produto(self, parametros, dados, cabecalhos) -> tuple:
+        cod_admin = ServidorHTTP.autenticar(cabecalhos)
+        OperacoesProdutos.inserir_produto(int(dados['cod']), str(dados['nome']), str(dados['categoria']),
+                                          float(dados['preco']), int(dados['quantidade']), cod_admin)
+        return 201, {'cod': int(dados['cod'])}
+
+    def _finalizar_venda(self, parametros, dados, cabecalhos) -> tuple:
+        itens = [(item['produto'], item['quantidade']) for item in dados['itens']]
+        usuario, farmacia = dados.get('usuario'), dados.get('farmacia')
+        falhas = OperacoesProdutos.finalizar_venda(itens, None if usuario is None else int(usuario),
+                                                   None if farmacia is None else int(farmacia))
+        if falhas:
+            return 409, {'confirmada': False, 'falhas': [
+                {'linha': linha, 'produto': produto, 'motivo': motivo} for linha, produto, motivo in falhas
+            ]}
+        return 200, {'confirmada': True}
+
+    def _recomendar(self, parametros, dados, cabecalhos) -> tuple:
+        codigos = [int(codigo) for codigo in parametros['produtos'].split(',') if codigo.strip()]
+        recomendados = OperacoesRecomendacao.recomendar(codigos, int(parametros.get('limite', 5)))
+        return 200, [{'cod': codigo, 'pontuacao': pontuacao} for codigo, pontuacao in recomendados]
+
+    def _listar_farmacias(self, parametros, dados, cabecalhos) -> tuple:
+        if {'cep', 'bairro', 'rua'} & parametros.keys():
+            farmacias = OperacoesFarmacia.buscar_por_localidade(
+                parametros.get('cep'), parametros.get('bairro'), parametros.get('rua'), parametros.get('aberta_em'))
+        elif 'inicio' in parametros or 'fim' in parametros:
+            farmacias = OperacoesFarmacia.listar_farmacias_abertas(parametros['inicio'], parametros['fim'])
+        else:
+            return 200, ServidorHTTP._pagina(*OperacoesFarmacia.listar_farmacias(
+                int(parametros.get('limite', 50)), parametros.get('cursor'), parametros.get('ordem', 'cod')),
+                ('cod', 'nome', 'rua', 'num', 'bairro', 'cep', 'hora_inicio', 'hora_fim',
+                 'dia_funcionamento', 'telefones'))
+        campos = ('cod', 'nome', 'rua', 'num', 'bairro', 'cep', 'telefone')
+        return 200, [dict(zip(campos, farmacia)) for farmacia in farmacias]
+
+    def _cadastrar_farmacia(self, parametros, dados, cabecalhos) -> tuple:
+        cod_admin = ServidorHTTP.autenticar(cabecalhos)
+        OperacoesFarmacia.registrar_farmacia(
+            int(dados['cod']), str(dados['nome']), str(dados['telefone']), str(dados['rua']),
+            int(dados['num']), str(dados['bairro']), str(dados['cep']), str(dados['hora_inicio']),
+            str(dados['hora_fim']), str(dados['dia_funcionamento']), cod_admin
+        )
+        return 201, {'cod': int(dados['cod'])}
+
+    def _listar_usuarios(self, parametros, dados, cabecalhos) -> tuple:
+        ServidorHTTP.autenticar(cabecalhos)
+        return 200, ServidorHTTP._pagina(*OperacoesUsuario.listar_usuarios(
+            int(parametros.get('limite', 50)), parametros.get('cursor')), ('cpf', 'telefones'))
+
+    def _cadastrar_usuario(self, parametros, dados, cabecalhos) -> tuple:
+        OperacoesUsuario.registrar_usuario(int(dados['cpf']), str(dados['telefone']))
+        return 201, {'cpf': int(dados['cpf'])}
+
+    def _iniciar_sessao(self, parametros, dados, cabecalhos) -> tuple:
+        sessao = OperacoesAdministrador.iniciar_sessao(int(dados['cpf']), str(dados['senha']))
+        if sessao is None:
+            return 401, {'erro': 'Credenciais inválidas.'}
+        return 201, {'token': sessao.token, 'validade_s': OperacoesAdministrador.sessoes.ttl}
+
+    def _encerrar_sessao(self, parametros, dados, cabecalhos) -> tuple:
+        autorizacao = cabecalhos.get('authorization', '')
+        if not autorizacao.lower().startswith('bearer '):
+            raise ErroRequisicao(401, 'Token de sessão necessário.')
+        if not OperacoesAdministrador.encerrar_sessao(autorizacao[7:].strip()):
+            return 404, {'erro': 'Sessão não encontrada.'}
+        return 200, {'encerrada': True}
+
+
+async def servir(servidor: ServidorHTTP) -> None:
+    """
+    Inicia o servidor e atende requisições até ser interrompido.
+    """
+    await servidor.iniciar()
+    print(f"PharmAnalytics atendendo em http://{servidor.host}:{servidor.porta}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await servidor.encerrar()
+
+
+def main(argumentos: list = None) -> int:
+    """
+    Ponto de entrada da linha de comando.
+    """
+    parser = argparse.ArgumentParser(description="Serviço HTTP/JSON do PharmAnalytics.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8080)
+    parser.add_argument('--trabalhadores', type=int, default=8, help="threads para as operações no banco")
+    parser.add_argument('--max-pendentes', type=int, default=64, help="requisições simultâneas antes do 503")
+    parser.add_argument('--tempo-limite', type=float, default=5.0, help="segundos por requisição")
+    parser.add_argument('--escritor', action='store_true', help="grava as vendas em lote pelo EscritorEstoque")
+    parser.add_argument('--particoes', type=int, help="distribui as farmácias entre N bancos")
+    parser.add_argument('--replica', help="arquivo da réplica que atende as consultas de leitura")
+    parser.add_argument('--replica-intervalo', type=float, default=30.0, help="segundos entre cópias da réplica")
+    parser.add_argument('--replica-defasagem', type=float, help="defasagem máxima (s) antes de ler do principal")
+    parser.add_argument('--banco', default=BancoDeDados.NOME_DB)
+    args = parser.parse_args(argumentos)
+
+    BancoDeDados.NOME_DB = args.banco
+    BancoDeDados.criar_tabelas()
+    if args.particoes:
+        OperacoesFarmacia.roteador = RoteadorFarmacias(RoteadorFarmacias.nomes_particoes(args.banco, args.particoes))
+        OperacoesFarmacia.roteador.criar_tabelas()
+    if args.escritor:
+        # Pedidos ainda na fila quando a requisição expira são cancelados em vez de gravados.
+        OperacoesProdutos.escritor = EscritorEstoque(tempo_resposta=args.tempo_limite)
+        OperacoesProdutos.escritor.iniciar()
+    if args.replica:
+        BancoDeDados.replica = ReplicaLeitura(args.replica, args.replica_intervalo, args.replica_defasagem)
+        BancoDeDados.replica.iniciar()
+    try:
+        asyncio.run(servir(ServidorHTTP(args.host, args.porta, args.trabalhadores,
+                                        args.max_pendentes, args.tempo_limite)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if OperacoesProdutos.escritor is not None:
+            OperacoesProdutos.escritor.parar()
+        if BancoDeDados.replica is not None:
+            BancoDeDados.replica.parar()
+        if OperacoesFarmacia.roteador is not None:
+            OperacoesFarmacia.roteador.encerrar()
+        BancoDeDados.fechar_conexoes()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,603 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from pharmanalytics_reformulado import (
+    BancoDeDados, CacheProdutos, CacheSessoes, EscritorEstoque, OperacoesAdministrador, OperacoesFarmacia,
+    OperacoesProdutos, OperacoesRecomendacao, OperacoesResumo, OperacoesUsuario, ReplicaLeitura, RoteadorFarmacias
+)
+
+
+class TestPharmanalytics(unittest.TestCase):
+
+    def setUp(self):
+        """Cria um banco de dados temporário em disco para cada teste"""
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.nome_db_original = BancoDeDados.NOME_DB
+        self.iteracoes_originais = OperacoesAdministrador.ITERACOES_HASH
+        BancoDeDados.NOME_DB = os.path.join(self.diretorio.name, 'teste.db')
+        BancoDeDados.criar_tabelas()
+        OperacoesAdministrador.sessoes = CacheSessoes()
+        # Custo baixo de hash para manter os testes rápidos.
+        OperacoesAdministrador.ITERACOES_HASH = 1000
+        OperacoesAdministrador.sessao_atual = OperacoesAdministrador.sessoes.abrir(1)
+        OperacoesProdutos.cache = CacheProdutos()
+
+    def tearDown(self):
+        """Fecha as conexões persistentes e remove o banco temporário"""
+        OperacoesAdministrador.sessao_atual = None
+        OperacoesAdministrador.ITERACOES_HASH = self.iteracoes_originais
+        BancoDeDados.fechar_conexoes()
+        BancoDeDados.NOME_DB = self.nome_db_original
+        self.diretorio.cleanup()
+
+    def executar(self, operacao, *entradas):
+        """Executa uma operação interativa respondendo aos prompts com as entradas informadas."""
+        with patch('builtins.input', side_effect=[str(e) for e in entradas]), \
+                patch('builtins.print'):
+            return operacao()
+
+    def test_conexao_persistente_por_thread(self):
+        """Teste unitário: a mesma thread reutiliza a conexão; outra thread recebe a sua."""
+        conn = BancoDeDados.conectar()
+        self.assertIs(conn, BancoDeDados.conectar())
+        outras = []
+        thread = threading.Thread(target=lambda: outras.append(BancoDeDados.conectar()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(conn, outras[0])
+
+    def test_conexao_falha_lanca_erro(self):
+        """Teste unitário: falha ao abrir o banco lança erro em vez de devolver None."""
+        BancoDeDados.NOME_DB = os.path.join(self.diretorio.name, 'inexistente', 'teste.db')
+        with self.assertRaises(sqlite3.OperationalError):
+            BancoDeDados.conectar()
+        with self.assertRaises(sqlite3.OperationalError):
+            with BancoDeDados.transacao():
+                pass
+
+    def test_pragmas_aplicados(self):
+        """Teste unitário: a conexão é aberta em modo WAL e com busy_timeout configurado."""
+        conn = BancoDeDados.conectar()
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(conn.execute('PRAGMA busy_timeout').fetchone()[0], 5000)
+
+    def test_liberar_descarta_alteracoes_pendentes(self):
+        """Teste unitário: liberar a conexão desfaz alterações não confirmadas."""
+        conn = BancoDeDados.conectar()
+        conn.execute('INSERT INTO pessoa (cpf) VALUES (?)', (42,))
+        BancoDeDados.liberar(conn)
+        self.assertIsNone(conn.execute('SELECT cpf FROM pessoa WHERE cpf = 42').fetchone())
+
+    def test_fluxo_produto_com_conexao_reutilizada(self):
+        """Teste de sistema: cadastra, decrementa e exclui um produto pela mesma conexão."""
+        self.executar(OperacoesProdutos.cadastrar_produto, 1, 'Paracetamol', 'Analgésico', 10.0, 50)
+        self.executar(OperacoesProdutos.decrementar_estoque, 'paracetamol', 5)
+        conn = BancoDeDados.conectar()
+        self.assertEqual(conn.execute('SELECT quantidade FROM estoque WHERE cod = 1').fetchone()[0], 45)
+        self.executar(OperacoesProdutos.excluir_produto, 1)
+        self.assertIsNone(conn.execute('SELECT * FROM produto WHERE cod = 1').fetchone())
+
+    def test_esquema_na_versao_atual(self):
+        """Teste unitário: o banco novo fica na última versão e a busca por nome usa índice."""
+        conn = BancoDeDados.conectar()
+        self.assertEqual(BancoDeDados.versao_esquema(conn), len(BancoDeDados.MIGRACOES))
+        plano = conn.execute(
+            'EXPLAIN QUERY PLAN SELECT * FROM produto WHERE LOWER(nome) = ?', ('x',)
+        ).fetchall()
+        self.assertIn('idx_produto_nome', str(plano))
+
+    def test_inicializacao_sem_ddl_quando_atualizado(self):
+        """Teste unitário: com o esquema atual, criar_tabelas apenas lê a versão."""
+        instrucoes = []
+        BancoDeDados.conectar().set_trace_callback(instrucoes.append)
+        BancoDeDados.criar_tabelas()
+        BancoDeDados.conectar().set_trace_callback(None)
+        self.assertEqual(instrucoes, ['PRAGMA user_version'])
+
+    def test_migra_banco_existente(self):
+        """Teste de integração: um banco antigo, sem versão, é migrado sem perder dados."""
+        BancoDeDados.fechar_conexoes()
+        BancoDeDados.NOME_DB = os.path.join(self.diretorio.name, 'antigo.db')
+        antigo = sqlite3.connect(BancoDeDados.NOME_DB)
+        antigo.executescript('''
+            CREATE TABLE produto (cod INTEGER PRIMARY KEY, nome VARCHAR(100),
+                preco DOUBLE PRECISION, cod_admin INTEGER, cod_estoque INTEGER);
+            INSERT INTO produto VALUES (7, 'Dipirona', 5.0, 1, 7);
+        ''')
+        antigo.close()
+        BancoDeDados.criar_tabelas()
+        conn = BancoDeDados.conectar()
+        self.assertEqual(BancoDeDados.versao_esquema(conn), len(BancoDeDados.MIGRACOES))
+        self.assertEqual(conn.execute('SELECT nome FROM produto').fetchone()[0], 'Dipirona')
+        indices = {linha[0] for linha in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertIn('idx_tel_farmacia_farmacia', indices)
+
+    def cadastrar_catalogo(self):
+        """Cadastra um pequeno catálogo de produtos usado pelos testes de busca."""
+        for produto in [(1, 'Paracetamol 500mg', 'Analgésico', 10.0, 50),
+                        (2, 'Paracetamol 750mg', 'Analgésico', 12.0, 30),
+                        (3, 'Dipirona Sódica', 'Analgésico', 8.0, 20),
+                        (4, 'Amoxicilina', 'Antibiótico', 25.0, 10)]:
+            self.executar(OperacoesProdutos.cadastrar_produto, *produto)
+
+    def test_pesquisa_por_prefixo_e_varias_palavras(self):
+        """Teste unitário: nomes parciais e várias palavras encontram os produtos certos."""
+        self.cadastrar_catalogo()
+        self.assertEqual({p[0] for p in OperacoesProdutos.pesquisar_produtos('parace')}, {1, 2})
+        self.assertEqual([p[0] for p in OperacoesProdutos.pesquisar_produtos('parace 750')], [2])
+        self.assertEqual([p[0] for p in OperacoesProdutos.pesquisar_produtos('antibio')], [4])
+        self.assertEqual([p[0] for p in OperacoesProdutos.pesquisar_produtos('sodica')], [3])
+        self.assertEqual(len(OperacoesProdutos.pesquisar_produtos('analgesico', limite=2)), 2)
+
+    def test_pesquisa_tolerante_a_erros(self):
+        """Teste unitário: um erro de digitação ainda encontra o produto."""
+        self.cadastrar_catalogo()
+        self.assertEqual([p[0] for p in OperacoesProdutos.pesquisar_produtos('amoxicilna')], [4])
+
+    def test_indice_de_busca_sincronizado(self):
+        """Teste de integração: atualizar e excluir produtos mantém o índice de busca em dia."""
+        self.cadastrar_catalogo()
+        self.executar(OperacoesProdutos.atualizar_produto, 4, 'Azitromicina', 'Antibiótico', 30.0, 5)
+        self.assertEqual(OperacoesProdutos.pesquisar_produtos('amoxi'), [])
+        self.assertEqual([p[0] for p in OperacoesProdutos.pesquisar_produtos('azitro')], [4])
+        self.executar(OperacoesProdutos.excluir_produto, 4)
+        self.assertEqual(OperacoesProdutos.pesquisar_produtos('azitro'), [])
+
+    def test_cache_de_produto(self):
+        """Teste unitário: consultas repetidas são atendidas pelo cache, por código ou nome."""
+        self.cadastrar_catalogo()
+        produto = OperacoesProdutos.obter_produto(nome='AMOXICILINA')
+        self.assertEqual(produto, (4, 'Amoxicilina', 'Antibiótico', 25.0, 10))
+        self.assertEqual(OperacoesProdutos.obter_produto(codigo=4), produto)
+        self.assertEqual(OperacoesProdutos.obter_produto(nome='amoxicilina'), produto)
+        estatisticas = OperacoesProdutos.cache.estatisticas()
+        self.assertEqual((estatisticas['acertos'], estatisticas['falhas']), (2, 1))
+
+    def test_estoque_pelo_cod_estoque(self):
+        """Teste de integração: consulta e busca leem o estoque de produto.cod_estoque, como os resumos."""
+        conn = BancoDeDados.conectar()
+        conn.execute('INSERT INTO estoque (cod, quantidade) VALUES (50, 7)')
+        conn.execute('INSERT INTO estoque (cod, quantidade) VALUES (5, 99)')
+        conn.execute("INSERT INTO produto (cod, nome, preco, cod_admin, cod_estoque) VALUES (5, 'Legado', 2.0, 1, 50)")
+        conn.execute("INSERT INTO categoria_produto (categoria, cod_produto) VALUES ('Antigos', 5)")
+        conn.commit()
+        self.assertEqual(OperacoesProdutos.obter_produto(5)[4], 7)
+        self.assertEqual(OperacoesProdutos.pesquisar_produtos('legado')[0][4], 7)
+        self.assertEqual(OperacoesResumo.por_categoria()[0][2], 7)
+
+    def test_cache_invalidado_apos_decremento(self):
+        """Teste de integração: a quantidade nunca é servida desatualizada após um decremento."""
+        self.cadastrar_catalogo()
+        self.assertEqual(OperacoesProdutos.obter_produto(codigo=3)[4], 20)
+        self.executar(OperacoesProdutos.decrementar_estoque, 'dipirona sódica', 5)
+        self.assertEqual(OperacoesProdutos.obter_produto(codigo=3)[4], 15)
+        self.executar(OperacoesProdutos.atualizar_produto, 3, 'Dipirona', 'Analgésico', 9.0, 40)
+        self.assertEqual(OperacoesProdutos.obter_produto(nome='dipirona')[3:], (9.0, 40))
+        self.executar(OperacoesProdutos.excluir_produto, 3)
+        self.assertIsNone(OperacoesProdutos.obter_produto(codigo=3))
+
+    def test_cache_expulsao_e_expiracao(self):
+        """Teste unitário: o cache respeita a capacidade (LRU), o TTL e descarta leituras antigas."""
+        cache = CacheProdutos(capacidade=2, ttl=60.0)
+        for codigo in (1, 2, 3):
+            cache.guardar((codigo, f'P{codigo}', 'C', 1.0, 1), cache.versao())
+        self.assertIsNone(cache.obter(codigo=1))
+        self.assertEqual(cache.estatisticas()['expulsoes'], 1)
+        versao = cache.versao()
+        cache.invalidar(codigo=4)
+        cache.guardar((4, 'P4', 'C', 1.0, 1), versao)
+        self.assertIsNone(cache.obter(codigo=4))
+        cache.ttl = -1.0
+        cache.guardar((5, 'P5', 'C', 1.0, 1), cache.versao())
+        self.assertIsNone(cache.obter(nome='p5'))
+
+    def quantidade(self, codigo):
+        """Lê diretamente do banco a quantidade em estoque do produto."""
+        conn = BancoDeDados.conectar()
+        return conn.execute('SELECT quantidade FROM estoque WHERE cod = ?', (codigo,)).fetchone()[0]
+
+    def test_venda_confirma_todas_as_linhas(self):
+        """Teste de integração: uma cesta válida baixa todas as linhas numa única transação."""
+        self.cadastrar_catalogo()
+        self.assertEqual(OperacoesProdutos.finalizar_venda([(1, 5), ('amoxicilina', 2), (1, 1)]), [])
+        self.assertEqual((self.quantidade(1), self.quantidade(4)), (44, 8))
+
+    def test_venda_recusada_nao_altera_estoque(self):
+        """Teste de integração: se uma linha falha, nenhuma é aplicada e as falhas são informadas."""
+        self.cadastrar_catalogo()
+        falhas = OperacoesProdutos.finalizar_venda([(1, 5), (4, 11), ('inexistente', 1), (2, 0)])
+        self.assertEqual(falhas, [
+            (1, 4, OperacoesProdutos.SEM_ESTOQUE),
+            (2, 'inexistente', OperacoesProdutos.NAO_ENCONTRADO),
+            (3, 2, OperacoesProdutos.QUANTIDADE_INVALIDA),
+        ])
+        self.assertEqual((self.quantidade(1), self.quantidade(4)), (50, 10))
+
+    def test_vendas_concorrentes_sem_venda_a_mais(self):
+        """Teste de sistema: várias threads disputando o último estoque nunca vendem a mais."""
+        self.cadastrar_catalogo()
+        resultados = []
+
+        def vender():
+            resultados.append(OperacoesProdutos.finalizar_venda([(4, 3)]))
+
+        threads = [threading.Thread(target=vender) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(1 for falhas in resultados if not falhas), 3)
+        self.assertEqual(self.quantidade(4), 1)
+
+    def test_transacao_aninhada(self):
+        """Teste unitário: um bloco aninhado que falha desfaz apenas a sua parte."""
+        with BancoDeDados.transacao() as conn:
+            conn.execute('INSERT INTO pessoa (cpf) VALUES (1)')
+            with self.assertRaises(sqlite3.IntegrityError):
+                with BancoDeDados.transacao():
+                    conn.execute('INSERT INTO pessoa (cpf) VALUES (2)')
+                    conn.execute('INSERT INTO pessoa (cpf) VALUES (1)')
+        cpfs = [linha[0] for linha in BancoDeDados.conectar().execute('SELECT cpf FROM pessoa')]
+        self.assertEqual(cpfs, [1])
+
+    def test_escritor_agrupa_vendas_em_lotes(self):
+        """Teste de sistema: vendas concorrentes roteadas ao escritor são gravadas em lotes."""
+        self.cadastrar_catalogo()
+        escritor = EscritorEstoque(max_lote=64, latencia_maxima=0.05)
+        escritor.iniciar()
+        OperacoesProdutos.escritor = escritor
+        try:
+            resultados = []
+            threads = [threading.Thread(target=lambda: resultados.append(
+                OperacoesProdutos.finalizar_venda([(1, 1), (4, 1)]))) for _ in range(12)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            OperacoesProdutos.escritor = None
+            escritor.parar()
+        self.assertEqual(sum(1 for falhas in resultados if not falhas), 10)
+        self.assertEqual((self.quantidade(1), self.quantidade(4)), (40, 0))
+        self.assertEqual(escritor.pedidos, 12)
+        self.assertLess(escritor.lotes, 12)
+
+    def test_escritor_sobrevive_a_falhas(self):
+        """Teste de integração: a falha de um pedido chega só ao Future dele e o escritor segue gravando."""
+        self.cadastrar_catalogo()
+        escritor = EscritorEstoque(latencia_maxima=0.01, tempo_resposta=0.1)
+        # Sem a thread iniciada o prazo vence antes do início e o pedido é cancelado.
+        with self.assertRaisesRegex(sqlite3.OperationalError, 'não foi gravada'):
+            escritor.vender([(1, 1)])
+        for itens in ([(1,)], [(10 ** 20, 1)], [(1.5, 1)]):
+            with self.assertRaises(ValueError):
+                escritor.enviar(itens)
+        baixar = OperacoesProdutos._baixar_itens
+        chamadas = []
+
+        def baixar_com_falha(conn, itens):
+            chamadas.append(itens)
+            if len(chamadas) == 1:
+                raise RuntimeError('falha inesperada')
+            return baixar(conn, itens)
+
+        escritor.iniciar()
+        try:
+            with patch.object(OperacoesProdutos, '_baixar_itens', side_effect=baixar_com_falha):
+                primeiro = escritor.enviar([(1, 1)])
+                with self.assertRaises(RuntimeError):
+                    primeiro.result(timeout=5)
+                self.assertEqual(escritor.vender([(1, 2)]), [])
+        finally:
+            escritor.parar()
+        self.assertEqual(self.quantidade(1), 48)
+
+    def test_senha_em_hash_e_cache_de_credenciais(self):
+        """Teste de integração: senhas gravadas em hash, legadas regravadas e credenciais em cache."""
+        OperacoesAdministrador.registrar_administrador(7, 'a@x.com', 'segredo')
+        conn = BancoDeDados.conectar()
+        armazenada = conn.execute('SELECT senha FROM administrador WHERE cod_pessoa = 7').fetchone()[0]
+        self.assertTrue(armazenada.startswith('pbkdf2_sha256$'))
+        self.assertNotIn('segredo', armazenada)
+        self.assertFalse(OperacoesAdministrador.verificar_credenciais(7, 'errada'))
+        self.assertTrue(OperacoesAdministrador.verificar_credenciais(7, 'segredo'))
+        # Com a credencial em cache, nem o banco nem o hash são consultados.
+        with patch.object(BancoDeDados, 'conectar', side_effect=AssertionError):
+            self.assertTrue(OperacoesAdministrador.verificar_credenciais(7, 'segredo'))
+
+        conn.execute('INSERT INTO pessoa (cpf) VALUES (8)')
+        conn.execute("INSERT INTO administrador (email, senha, cod_pessoa) VALUES ('b@x.com', 'antiga', 8)")
+        conn.commit()
+        self.assertTrue(OperacoesAdministrador.verificar_credenciais(8, 'antiga'))
+        armazenada = conn.execute('SELECT senha FROM administrador WHERE cod_pessoa = 8').fetchone()[0]
+        self.assertTrue(OperacoesAdministrador.conferir_senha('antiga', armazenada))
+        self.assertNotEqual(armazenada, 'antiga')
+        # Hashes malformados não conferem e não derrubam a verificação.
+        for malformada in ('pbkdf2_sha256$x$00$00', 'pbkdf2_sha256$1000$zz$00', 'pbkdf2_sha256$0$00$00'):
+            self.assertFalse(OperacoesAdministrador.conferir_senha('antiga', malformada))
+        self.assertTrue(OperacoesAdministrador._hash_desatualizado('pbkdf2_sha256$x$00$00'))
+        conn.execute("UPDATE administrador SET senha = 'pbkdf2_sha256$x$00$00' WHERE cod_pessoa = 8")
+        conn.commit()
+        OperacoesAdministrador.sessoes = CacheSessoes()
+        self.assertFalse(OperacoesAdministrador.verificar_credenciais(8, 'antiga'))
+
+    def test_sessoes_independentes(self):
+        """Teste unitário: cada administrador tem sua sessão, encerrada na troca de senha."""
+        OperacoesAdministrador.registrar_administrador(7, 'a@x.com', 'um')
+        OperacoesAdministrador.registrar_administrador(8, 'b@x.com', 'dois')
+        primeira = OperacoesAdministrador.iniciar_sessao(7, 'um')
+        segunda = OperacoesAdministrador.iniciar_sessao(8, 'dois')
+        self.assertIsNone(OperacoesAdministrador.iniciar_sessao(8, 'um'))
+        self.assertEqual(OperacoesAdministrador.obter_sessao(primeira.token).cpf, 7)
+        self.assertEqual(OperacoesAdministrador.obter_sessao(segunda.token).cpf, 8)
+        self.assertTrue(OperacoesAdministrador.alterar_senha(7, 'novo'))
+        self.assertIsNone(OperacoesAdministrador.obter_sessao(primeira.token))
+        self.assertFalse(OperacoesAdministrador.verificar_credenciais(7, 'um'))
+        self.assertTrue(OperacoesAdministrador.encerrar_sessao(segunda.token))
+        self.assertIsNone(OperacoesAdministrador.obter_sessao(segunda.token))
+        OperacoesAdministrador.sessoes.ttl = -1
+        self.assertIsNone(OperacoesAdministrador.obter_sessao(OperacoesAdministrador.sessoes.abrir(8).token))
+        # No limite de capacidade, a sessão mais antiga dá lugar à nova.
+        sessoes = CacheSessoes(capacidade=2)
+        tokens = [sessoes.abrir(cpf).token for cpf in (1, 2, 3)]
+        self.assertEqual([sessoes.obter(token) is not None for token in tokens], [False, True, True])
+
+    def test_farmacias_particionadas(self):
+        """Teste de integração: farmácias gravadas na partição do roteador e consultadas em paralelo."""
+        bancos = RoteadorFarmacias.nomes_particoes(BancoDeDados.NOME_DB, 3)
+        roteador = RoteadorFarmacias(bancos)
+        roteador.criar_tabelas()
+        OperacoesFarmacia.roteador = roteador
+        try:
+            for codigo in (5, 1, 4, 3, 2, 6):
+                OperacoesFarmacia.registrar_farmacia(codigo, f'Farmácia {codigo}', f'{codigo}000', 'Rua A', codigo,
+                                                     'Centro', '01000-000', '08:00', '20:00', 'Seg-Sex', 1)
+            self.assertTrue(OperacoesFarmacia.alterar_farmacia(4, 'Noturna', '4000', 'Rua B', 4, 'Centro',
+                                                               '01000-000', '18:00', '23:00', 'Seg-Sex'))
+            self.assertTrue(OperacoesFarmacia.remover_farmacia(6))
+            self.assertFalse(OperacoesFarmacia.remover_farmacia(6))
+            abertas = OperacoesFarmacia.listar_farmacias_abertas('09:00', '18:00')
+        finally:
+            OperacoesFarmacia.roteador = None
+            roteador.encerrar()
+        self.assertEqual([(f[0], f[6]) for f in abertas], [(1, '1000'), (2, '2000'), (3, '3000'), (5, '5000')])
+        for indice, banco in enumerate(bancos):
+            conn = sqlite3.connect(banco)
+            self.assertEqual([linha[0] for linha in conn.execute('SELECT cod FROM farmacia ORDER BY cod')],
+                             [cod for cod in (1, 2, 3, 4, 5) if cod % 3 == indice])
+            conn.close()
+        # O banco principal continua sem farmácias.
+        self.assertEqual(OperacoesFarmacia.listar_farmacias_abertas('09:00', '18:00'), [])
+        with BancoDeDados.transacao():
+            with self.assertRaises(sqlite3.ProgrammingError):
+                with BancoDeDados.usando(bancos[0]):
+                    pass
+
+    def test_busca_por_localidade(self):
+        """Teste de integração: prefixos de CEP, bairro e rua acompanham cadastro, alteração e exclusão."""
+        OperacoesFarmacia.registrar_farmacia(1, 'Central', '1000', 'Rua São Bento', 10, 'Sé',
+                                             '01010-000', '08:00', '20:00', 'Seg-Sex', 1)
+        OperacoesFarmacia.registrar_farmacia(2, 'Paulista', '2000', 'Avenida Paulista', 900, 'Bela Vista',
+                                             '01310-100', '00:00', '23:59', 'Todos', 1)
+        OperacoesFarmacia.registrar_farmacia(3, 'Vila', '3000', 'Rua Domingos', 5, 'Vila Mariana',
+                                             '04010-000', '08:00', '12:00', 'Seg-Sab', 1)
+        buscar = OperacoesFarmacia.buscar_por_localidade
+        self.assertEqual([f[0] for f in buscar(cep='01')], [1, 2])
+        self.assertEqual([f[0] for f in buscar(cep='01310')], [2])
+        self.assertEqual([f[0] for f in buscar(bairro='  se ')], [1])
+        self.assertEqual([f[0] for f in buscar(cep='0', rua='RUA')], [1, 3])
+        self.assertEqual([f[0] for f in buscar(cep='0', aberta_em='15:00')], [1, 2])
+        self.assertEqual(buscar(bairro='bela')[0][6], '2000')
+        with self.assertRaises(ValueError):
+            buscar(cep='-')
+
+        OperacoesFarmacia.alterar_farmacia(3, 'Vila', '3000', 'Rua Domingos', 5, 'Saúde',
+                                           '04010-000', '08:00', '12:00', 'Seg-Sab')
+        self.assertEqual(buscar(bairro='vila'), [])
+        self.assertEqual([f[0] for f in buscar(bairro='sa')], [3])
+        OperacoesFarmacia.remover_farmacia(1)
+        self.assertEqual([f[0] for f in buscar(cep='01')], [2])
+
+        # Farmácias gravadas direto na tabela entram no índice ao reindexar.
+        conn = BancoDeDados.conectar()
+        conn.execute("""INSERT INTO farmacia (cod, nome, rua, num, bairro, cep, hora_inicio, hora_fim,
+                        dia_funcionamento, cod_admin) VALUES (4, 'Nova', 'Rua X', 1, 'Sé', '01000-000',
+                        '08:00', '20:00', 'Seg-Sex', 1)""")
+        conn.commit()
+        OperacoesFarmacia.reindexar_localidades()
+        self.assertEqual([f[0] for f in buscar(cep='01')], [2, 4])
+
+    def test_reajuste_de_precos_em_lote(self):
+        """Teste de integração: simulação e reajuste em lotes por categoria, administrador e faixa de códigos."""
+        for codigo in range(1, 8):
+            OperacoesProdutos.inserir_produto(codigo, f'Produto {codigo}', 'Genérico' if codigo % 2 else 'Marca',
+                                              10.0, codigo, 1 if codigo < 6 else 2)
+        self.assertEqual(OperacoesProdutos.obter_produto(1)[3], 10.0)
+        # Genéricos: 1, 3, 5 e 7, com 16 unidades ao todo.
+        self.assertEqual(OperacoesProdutos.reajustar_precos(10, categoria='Genérico', simular=True), (4, 16.0))
+        self.assertEqual(OperacoesProdutos.obter_produto(3)[3], 10.0)
+        self.assertEqual(OperacoesProdutos.reajustar_precos(10, categoria='Genérico', tamanho_lote=3), (4, 16.0))
+        conn = BancoDeDados.conectar()
+        precos = dict(conn.execute('SELECT cod, preco FROM produto'))
+        self.assertEqual(precos, {1: 11.0, 2: 10.0, 3: 11.0, 4: 10.0, 5: 11.0, 6: 10.0, 7: 11.0})
+        # O cache é descartado após o reajuste.
+        self.assertEqual(OperacoesProdutos.obter_produto(1)[3], 11.0)
+
+        self.assertEqual(OperacoesProdutos.reajustar_precos(valor=-20, cod_admin=1, cod_inicio=4), (2, -95.0))
+        self.assertEqual(dict(conn.execute('SELECT cod, preco FROM produto WHERE cod >= 4')),
+                         {4: 0.0, 5: 0.0, 6: 10.0, 7: 11.0})
+        self.assertEqual(OperacoesProdutos.reajustar_precos(5, cod_inicio=100), (0, 0.0))
+        with self.assertRaises(ValueError):
+            OperacoesProdutos.reajustar_precos(5)
+
+        self.executar(OperacoesProdutos.reajustar_produtos, '', '2', '', '-50', '', 's')
+        self.assertEqual(dict(conn.execute('SELECT cod, preco FROM produto WHERE cod_admin = 2')), {6: 5.0, 7: 5.5})
+
+    def test_replica_de_leitura(self):
+        """Teste de integração: consultas leem da réplica até a próxima cópia, dentro da defasagem máxima."""
+        OperacoesProdutos.inserir_produto(1, 'Paracetamol', 'Analgésico', 10.0, 5, 1)
+        replica = ReplicaLeitura(os.path.join(self.diretorio.name, 'replica.db'), paginas=1)
+        self.assertFalse(replica.disponivel())
+        BancoDeDados.replica = replica
+        try:
+            self.assertEqual(len(OperacoesProdutos.pesquisar_produtos('parac')), 1)
+            replica.atualizar()
+            self.assertLess(replica.defasagem(), 5)
+            # As conexões da réplica são somente leitura.
+            with BancoDeDados.leitura() as na_replica:
+                self.assertTrue(na_replica)
+                with self.assertRaises(sqlite3.OperationalError):
+                    BancoDeDados.conectar().execute('INSERT INTO pessoa (cpf) VALUES (99)')
+            OperacoesProdutos.inserir_produto(2, 'Paracetamol Infantil', 'Analgésico', 12.0, 5, 1)
+            # A réplica ainda não tem o produto novo; o banco principal, sim.
+            self.assertEqual([p[0] for p in OperacoesProdutos.pesquisar_produtos('parac')], [1])
+            self.assertIsNone(OperacoesProdutos.obter_produto(2))
+            with BancoDeDados.transacao():
+                self.assertIsNotNone(OperacoesProdutos.obter_produto(2))
+            replica.defasagem_maxima = 0
+            self.assertEqual(len(OperacoesProdutos.pesquisar_produtos('parac')), 2)
+            replica.defasagem_maxima = None
+            replica.intervalo = 0.01
+            replica.iniciar()
+            copias = replica.copias
+            while replica.copias < copias + 2:
+                time.sleep(0.01)
+            replica.parar()
+            self.assertEqual(len(OperacoesProdutos.pesquisar_produtos('parac')), 2)
+        finally:
+            replica.parar()
+            BancoDeDados.replica = None
+
+    def percorrer(self, listar, **opcoes):
+        """Percorre todas as páginas de uma listagem e retorna as linhas e a quantidade de páginas."""
+        linhas, paginas, cursor = [], 0, None
+        while True:
+            pagina, cursor = listar(cursor=cursor, **opcoes)
+            linhas += pagina
+            paginas += 1
+            if cursor is None:
+                return linhas, paginas
+
+    def test_listagens_paginadas(self):
+        """Teste de integração: páginas por chave cobrem cada linha uma única vez, em qualquer ordenação."""
+        precos = [5.0, 1.0, 5.0, 3.0, 5.0, 2.0, 4.0]
+        for codigo, preco in enumerate(precos, 1):
+            OperacoesProdutos.inserir_produto(codigo, f'Produto {8 - codigo}', 'Par' if codigo % 2 == 0 else 'Ímpar',
+                                              preco, codigo * 10, 1)
+        linhas, paginas = self.percorrer(OperacoesProdutos.listar_produtos, limite=2, ordem='-preco')
+        self.assertEqual([linha[0] for linha in linhas], [5, 3, 1, 7, 4, 6, 2])
+        self.assertEqual(paginas, 4)
+        self.assertEqual(linhas[0], (5, 'Produto 3', 'Ímpar', 5.0, 50))
+        linhas, _ = self.percorrer(OperacoesProdutos.listar_produtos, limite=3, ordem='nome')
+        self.assertEqual([linha[0] for linha in linhas], [7, 6, 5, 4, 3, 2, 1])
+        linhas, paginas = self.percorrer(OperacoesProdutos.listar_produtos, limite=3, categoria='Par')
+        self.assertEqual(([linha[0] for linha in linhas], paginas), ([2, 4, 6], 1))
+
+        _, cursor = OperacoesProdutos.listar_produtos(2, ordem='nome')
+        with self.assertRaises(ValueError):
+            OperacoesProdutos.listar_produtos(2, cursor, ordem='preco')
+        with self.assertRaises(ValueError):
+            OperacoesProdutos.listar_produtos(2, 'lixo')
+        with self.assertRaises(ValueError):
+            OperacoesProdutos.listar_produtos(2, ordem='quantidade')
+
+        for cpf in (30, 10, 20):
+            OperacoesUsuario.registrar_usuario(cpf, f'9{cpf}')
+        linhas, paginas = self.percorrer(OperacoesUsuario.listar_usuarios, limite=1)
+        self.assertEqual((linhas, paginas), ([(10, '910'), (20, '920'), (30, '930')], 3))
+
+    def test_listagem_de_farmacias_particionadas(self):
+        """Teste de integração: a listagem paginada intercala as páginas de todas as partições."""
+        roteador = RoteadorFarmacias(RoteadorFarmacias.nomes_particoes(BancoDeDados.NOME_DB, 3))
+        roteador.criar_tabelas()
+        OperacoesFarmacia.roteador = roteador
+        try:
+            for codigo, nome in enumerate(['Sul', 'norte', 'Leste', 'Oeste', 'Centro', 'Alto', 'Baixo'], 1):
+                OperacoesFarmacia.registrar_farmacia(codigo, nome, f'{codigo}0', 'Rua A', codigo, 'Centro',
+                                                     '01000-000', '08:00', '20:00', 'Seg-Sex', 1)
+            por_codigo, _ = self.percorrer(OperacoesFarmacia.listar_farmacias, limite=3)
+            por_nome, paginas = self.percorrer(OperacoesFarmacia.listar_farmacias, limite=2, ordem='-nome')
+        finally:
+            OperacoesFarmacia.roteador = None
+            roteador.encerrar()
+        self.assertEqual([linha[0] for linha in por_codigo], [1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(por_codigo[0][9], '10')
+        self.assertEqual([linha[1] for linha in por_nome], ['Sul', 'Oeste', 'norte', 'Leste', 'Centro', 'Baixo', 'Alto'])
+        self.assertEqual(paginas, 4)
+
+    def test_recomendacoes_comprados_juntos(self):
+        """Teste de integração: cestas e histórico do usuário alimentam o índice de vizinhos."""
+        for codigo in range(1, 6):
+            OperacoesProdutos.inserir_produto(codigo, f'Produto {codigo}', 'Geral', 1.0, 100, 1)
+        self.assertEqual(OperacoesProdutos.finalizar_venda([(1, 1), (2, 1), (3, 1)]), [])
+        OperacoesProdutos.finalizar_venda([(1, 1)], cod_usuario=10, cod_farmacia=7)
+        OperacoesProdutos.finalizar_venda([(4, 1)], cod_usuario=10, cod_farmacia=7)
+        # Produtos já comprados pelo usuário não são contados de novo.
+        OperacoesProdutos.finalizar_venda([(1, 1), (4, 1)], cod_usuario=10)
+        self.assertEqual(OperacoesRecomendacao.recomendar([1]), [(2, 1), (3, 1), (4, 1)])
+        OperacoesProdutos.finalizar_venda([(1, 1), (2, 1)])
+        self.assertEqual(OperacoesRecomendacao.recomendar([1], 2), [(2, 2), (3, 1)])
+        self.assertEqual(OperacoesRecomendacao.recomendar([1, 2]), [(3, 2), (4, 1)])
+        self.assertEqual(OperacoesRecomendacao.recomendar([]), [])
+        conn = BancoDeDados.conectar()
+        self.assertEqual(conn.execute('SELECT cod_produto FROM usuario_produto WHERE cod_usuario = 10 '
+                                      'ORDER BY cod_produto').fetchall(), [(1,), (4,)])
+        self.assertEqual(conn.execute('SELECT count(*) FROM usuario_farmacia').fetchone()[0], 1)
+        # Venda recusada não registra compra.
+        self.assertNotEqual(OperacoesProdutos.finalizar_venda([(5, 1), (3, 1000)], cod_usuario=10), [])
+        self.assertEqual(OperacoesRecomendacao.recomendar([5]), [])
+
+        maximo = OperacoesRecomendacao.MAX_VIZINHOS
+        OperacoesRecomendacao.MAX_VIZINHOS = 3
+        escritor = EscritorEstoque()
+        escritor.iniciar()
+        OperacoesProdutos.escritor = escritor
+        try:
+            # O produto 1 está cheio (2, 3 e 4): o vizinho novo substitui o de menor contagem.
+            self.assertEqual(OperacoesProdutos.finalizar_venda([(1, 1), (5, 1)]), [])
+        finally:
+            OperacoesProdutos.escritor = None
+            escritor.parar()
+            OperacoesRecomendacao.MAX_VIZINHOS = maximo
+        self.assertEqual(OperacoesRecomendacao.recomendar([1]), [(2, 2), (5, 2), (4, 1)])
+        OperacoesProdutos.remover_produto(2)
+        self.assertEqual(OperacoesRecomendacao.recomendar([1]), [(5, 2), (4, 1)])
+
+    def test_recomendacoes_limitadas_e_particionadas(self):
+        """Teste de integração: pares da cesta têm prioridade no limite e o cliente vai para a partição."""
+        for codigo in range(1, 7):
+            OperacoesProdutos.inserir_produto(codigo, f'Produto {codigo}', 'Geral', 1.0, 100, 1)
+        OperacoesProdutos.finalizar_venda([(1, 1), (2, 1)], cod_usuario=10)
+        roteador = RoteadorFarmacias(RoteadorFarmacias.nomes_particoes(BancoDeDados.NOME_DB, 2))
+        roteador.criar_tabelas()
+        maximo = OperacoesRecomendacao.MAX_PARES
+        OperacoesRecomendacao.MAX_PARES = 3
+        OperacoesFarmacia.roteador = roteador
+        comandos = []
+        BancoDeDados.conectar().set_trace_callback(comandos.append)
+        try:
+            # Pares da cesta (5, 6) e do histórico (1-5, 1-6, 2-5, 2-6): só 3 entram, a cesta primeiro.
+            self.assertEqual(OperacoesProdutos.finalizar_venda([(5, 1), (6, 1)], cod_usuario=10, cod_farmacia=3), [])
+        finally:
+            BancoDeDados.conectar().set_trace_callback(None)
+            OperacoesFarmacia.roteador = None
+            OperacoesRecomendacao.MAX_PARES = maximo
+            roteador.encerrar()
+        self.assertEqual(sum('coocorrencia' in comando for comando in comandos), 2)
+        self.assertEqual(OperacoesRecomendacao.recomendar([5]), [(1, 1), (6, 1)])
+        self.assertEqual(OperacoesRecomendacao.recomendar([6]), [(1, 1), (5, 1)])
+        conn = BancoDeDados.conectar()
+        self.assertEqual(conn.execute('SELECT count(*) FROM usuario_farmacia').fetchone()[0], 0)
+        particao = sqlite3.connect(roteador.banco(3))
+        self.assertEqual(particao.execute('SELECT cod_usuario, cod_farmacia FROM usuario_farmacia').fetchall(),
+                         [(10, 3)])
+        particao.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
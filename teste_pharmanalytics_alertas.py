@@ -0,0 +1,81 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+
+from pharmanalytics_alertas import main
+from pharmanalytics_reformulado import BancoDeDados, CacheProdutos, OperacoesAlertas, OperacoesProdutos
+
+
+class TestAlertas(unittest.TestCase):
+
+    def setUp(self):
+        """Cria um banco de dados temporário para cada teste"""
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.nome_db_original = BancoDeDados.NOME_DB
+        BancoDeDados.NOME_DB = os.path.join(self.diretorio.name, 'teste.db')
+        BancoDeDados.criar_tabelas()
+        OperacoesProdutos.cache = CacheProdutos()
+
+    def tearDown(self):
+        """Fecha as conexões persistentes e remove o banco temporário"""
+        BancoDeDados.fechar_conexoes()
+        BancoDeDados.NOME_DB = self.nome_db_original
+        self.diretorio.cleanup()
+
+    def test_alerta_ao_cruzar_o_limite(self):
+        """Teste de integração: o alerta nasce só na venda ou ajuste que cruza o limite."""
+        OperacoesProdutos.inserir_produto(1, 'Paracetamol', 'Analgésico', 10.0, 12, 1)
+        OperacoesProdutos.inserir_produto(2, 'Dipirona', 'Analgésico', 5.0, 12, 1)
+        OperacoesProdutos.inserir_produto(3, 'Vitamina C', 'Vitaminas', 20.0, 12, 1)
+        OperacoesAlertas.definir_limite_categoria('Analgésico', 10)
+        OperacoesAlertas.definir_limite_produto(2, 5)
+
+        self.assertEqual(OperacoesProdutos.finalizar_venda([(1, 2), (2, 2), (3, 11)]), [])
+        self.assertEqual(OperacoesAlertas.pendentes(), [])
+        self.assertEqual(OperacoesProdutos.finalizar_venda([(1, 1), (2, 3)]), [])
+        self.assertEqual(OperacoesProdutos.finalizar_venda([(1, 1), (2, 6)]), [])
+        self.assertEqual([a[1:4] for a in OperacoesAlertas.pendentes()], [(1, 9, 10), (2, 1, 5)])
+
+        # Reposição acima do limite rearma o alerta do produto.
+        OperacoesProdutos.alterar_produto(1, 'Paracetamol', 'Analgésico', 10.0, 30, 1)
+        OperacoesProdutos.alterar_produto(1, 'Paracetamol', 'Analgésico', 10.0, 3, 1)
+        OperacoesAlertas.definir_limite_produto(2, None)
+        OperacoesAlertas.definir_limite_categoria('Analgésico', None)
+        OperacoesProdutos.finalizar_venda([(1, 1)])
+
+        consumidos = OperacoesAlertas.consumir(2)
+        self.assertEqual([a[1:4] for a in consumidos], [(1, 9, 10), (2, 1, 5)])
+        self.assertEqual([a[1:4] for a in OperacoesAlertas.consumir()], [(1, 3, 10)])
+        self.assertEqual(OperacoesAlertas.consumir(), [])
+
+    def test_linha_de_comando(self):
+        """Teste de sistema: limites definidos e alertas consumidos em JSON pela linha de comando."""
+        OperacoesProdutos.inserir_produto(1, 'Paracetamol', 'Analgésico', 10.0, 5, 1)
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(main(['--banco', BancoDeDados.NOME_DB, 'limite', '--produto', '1', '3']), 0)
+        OperacoesProdutos.finalizar_venda([(1, 4)])
+        arquivo = os.path.join(self.diretorio.name, 'alertas.jsonl')
+        self.assertEqual(main(['--banco', BancoDeDados.NOME_DB, 'consumir', '--arquivo', arquivo]), 0)
+        with open(arquivo, encoding='utf-8') as entrada:
+            alertas = [json.loads(linha) for linha in entrada]
+        self.assertEqual([(a['produto'], a['quantidade'], a['limite']) for a in alertas], [(1, 1, 3)])
+        self.assertEqual(OperacoesAlertas.pendentes(), [])
+
+        # Se a escrita falha, os alertas continuam na fila para a próxima entrega.
+        OperacoesProdutos.alterar_produto(1, 'Paracetamol', 'Analgésico', 10.0, 5, 1)
+        OperacoesProdutos.finalizar_venda([(1, 3)])
+        invalido = os.path.join(self.diretorio.name, 'inexistente', 'alertas.jsonl')
+        with redirect_stderr(io.StringIO()):
+            self.assertEqual(main(['--banco', BancoDeDados.NOME_DB, 'consumir', '--arquivo', invalido]), 1)
+        self.assertEqual([a[1:4] for a in OperacoesAlertas.pendentes()], [(1, 2, 3)])
+        with self.assertRaises(OSError):
+            OperacoesAlertas.consumir(entregar=lambda alertas: open(invalido))
+        self.assertEqual(len(OperacoesAlertas.consumir(entregar=lambda alertas: None)), 1)
+        self.assertEqual(OperacoesAlertas.pendentes(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+
+from pharmanalytics_benchmark import Benchmark, GeradorDados
+from pharmanalytics_reformulado import BancoDeDados, OperacoesAdministrador
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        """Cria um diretório temporário para os bancos sintéticos"""
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.nome_db_original = BancoDeDados.NOME_DB
+
+    def tearDown(self):
+        """Fecha as conexões persistentes e remove os bancos temporários"""
+        BancoDeDados.fechar_conexoes()
+        BancoDeDados.NOME_DB = self.nome_db_original
+        self.diretorio.cleanup()
+
+    def test_gerador_reprodutivel(self):
+        """Teste unitário: a mesma semente gera as quantidades e os dados esperados."""
+        BancoDeDados.NOME_DB = os.path.join(self.diretorio.name, 'sintetico.db')
+        GeradorDados(produtos=300, farmacias=7, administradores=2, usuarios=5,
+                     categorias=4, telefones_por_farmacia=3).gerar()
+        conn = BancoDeDados.conectar()
+        contagens = [conn.execute(f'SELECT COUNT(*) FROM {tabela}').fetchone()[0]
+                     for tabela in ('produto', 'estoque', 'farmacia', 'tel_farmacia', 'administrador', 'usuario')]
+        self.assertEqual(contagens, [300, 300, 7, 21, 2, 5])
+        self.assertEqual(conn.execute('SELECT COUNT(DISTINCT categoria) FROM categoria_produto').fetchone()[0], 4)
+        admin = GeradorDados.cpf_administrador(1)
+        self.assertTrue(OperacoesAdministrador.verificar_credenciais(admin, GeradorDados.senha_administrador(admin)))
+
+    def test_relatorio_e_comparacao(self):
+        """Teste de sistema: o benchmark mede todas as operações e compara relatórios."""
+        relatorio = Benchmark(iteracoes=5).executar([200], self.diretorio.name)
+        operacoes = relatorio['escalas']['200']
+        for operacao in Benchmark.OPERACOES:
+            self.assertEqual(operacoes[operacao]['n'], 5)
+        comparacao = Benchmark.comparar(relatorio, relatorio)
+        self.assertEqual(len(comparacao), len(Benchmark.OPERACOES))
+        self.assertTrue(all(variacao == 0.0 for *_, variacao in comparacao))
+
+
+if __name__ == '__main__':
+    unittest.main()
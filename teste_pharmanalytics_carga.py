@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+from pharmanalytics_benchmark import GeradorDados
+from pharmanalytics_carga import executar_carga, ler_mix
+from pharmanalytics_reformulado import BancoDeDados
+
+
+class TestCarga(unittest.TestCase):
+
+    def setUp(self):
+        """Gera um banco sintético pequeno para a carga"""
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.nome_db_original = BancoDeDados.NOME_DB
+        self.banco = os.path.join(self.diretorio.name, 'carga.db')
+        BancoDeDados.NOME_DB = self.banco
+        GeradorDados(produtos=50, semente=7).gerar()
+        BancoDeDados.fechar_conexoes()
+
+    def tearDown(self):
+        """Restaura o banco padrão e remove o banco temporário"""
+        BancoDeDados.NOME_DB = self.nome_db_original
+        self.diretorio.cleanup()
+
+    def test_ler_mix(self):
+        """Teste unitário: o mix de operações é lido e validado."""
+        self.assertEqual(ler_mix('buscar=3, decrementar=1'), {'buscar': 3, 'decrementar': 1})
+        with self.assertRaises(ValueError):
+            ler_mix('vender=1')
+
+    def test_carga_concorrente_mantem_estoque_consistente(self):
+        """Teste de sistema: processos concorrentes vendem sem quebrar a consistência do estoque."""
+        relatorio = executar_carga(self.banco, processos=2, duracao=0.5, threads=2,
+                                   mix={'decrementar': 8, 'buscar': 1, 'atualizar': 1})
+        self.assertTrue(relatorio['estoque_consistente'])
+        self.assertGreater(relatorio['latencias']['decrementar']['n'], 0)
+        self.assertEqual(relatorio['estoque_inicial'] - relatorio['vendidos'], relatorio['estoque_final'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+from pharmanalytics_colunar import CatalogoColunar
+from pharmanalytics_reformulado import BancoDeDados, CacheProdutos, OperacoesProdutos
+
+
+class TestColunar(unittest.TestCase):
+
+    def setUp(self):
+        """Cria um banco de dados temporário com um pequeno catálogo"""
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.nome_db_original = BancoDeDados.NOME_DB
+        BancoDeDados.NOME_DB = os.path.join(self.diretorio.name, 'teste.db')
+        BancoDeDados.criar_tabelas()
+        OperacoesProdutos.cache = CacheProdutos()
+        for cod, nome, categoria, preco, quantidade, admin in [
+                (1, 'Paracetamol', 'Analgésico', 9.5, 3, 1),
+                (2, 'Dipirona', 'Analgésico', 4.0, 40, 2),
+                (3, 'Amoxicilina', 'Antibiótico', 25.0, 2, 1),
+                (4, 'Ibuprofeno', 'Analgésico', 12.0, 1, 1)]:
+            OperacoesProdutos.inserir_produto(cod, nome, categoria, preco, quantidade, admin)
+
+    def tearDown(self):
+        """Fecha as conexões persistentes e remove o banco temporário"""
+        BancoDeDados.fechar_conexoes()
+        BancoDeDados.NOME_DB = self.nome_db_original
+        self.diretorio.cleanup()
+
+    def test_filtros_agregacoes_e_top_k(self):
+        """Teste unitário: consultas sobre as colunas equivalem às consultas no banco."""
+        catalogo = CatalogoColunar.carregar(usar_numpy=False)
+        self.assertEqual(len(catalogo), 4)
+        self.assertEqual(catalogo.filtrar(categoria='Analgésico', preco_maximo=10, estoque_maximo=4), [1])
+        self.assertEqual(catalogo.filtrar(categoria='Inexistente'), [])
+        self.assertEqual(catalogo.agregar('categoria'),
+                         {'Analgésico': (3, 44, 200.5), 'Antibiótico': (1, 2, 50.0)})
+        self.assertEqual(catalogo.agregar('cod_admin', estoque_maximo=5), {1: (3, 6, 90.5)})
+        self.assertEqual(catalogo.top_k(2, 'valor'), [(2, 160.0), (3, 50.0)])
+        self.assertEqual(catalogo.top_k(1, 'quantidade', crescente=True), [(4, 1.0)])
+
+    def test_atualizacao_incremental_e_arquivo_mapeado(self):
+        """Teste de integração: a cópia gravada é reaberta por mmap e relê só os produtos alterados."""
+        caminho = os.path.join(self.diretorio.name, 'catalogo.col')
+        CatalogoColunar.carregar(usar_numpy=False).gravar(caminho)
+        OperacoesProdutos.finalizar_venda([(2, 38)])
+        OperacoesProdutos.alterar_produto(3, 'Amoxicilina', 'Antibiótico', 5.0, 2)
+        OperacoesProdutos.remover_produto(4)
+        OperacoesProdutos.inserir_produto(5, 'Loratadina', 'Antialérgico', 7.0, 4, 2)
+
+        catalogo = CatalogoColunar.abrir(caminho, usar_numpy=False)
+        self.assertEqual(catalogo.filtrar(estoque_maximo=4), [1, 3, 4])
+        self.assertEqual(catalogo.atualizar(), 4)
+        self.assertEqual(catalogo.filtrar(estoque_maximo=4), [1, 2, 3, 5])
+        self.assertEqual(catalogo.filtrar(preco_maximo=10, estoque_maximo=4),
+                         CatalogoColunar.carregar(usar_numpy=False).filtrar(preco_maximo=10, estoque_maximo=4))
+        self.assertEqual(catalogo.atualizar(), 0)
+        catalogo.gravar(caminho)
+        reaberto = CatalogoColunar.abrir(caminho, usar_numpy=False)
+        self.assertEqual(len(reaberto), 4)
+        self.assertEqual(reaberto.agregar('categoria')['Antialérgico'], (1, 4, 28.0))
+        reaberto.fechar()
+
+    def test_registro_de_alteracoes_limitado(self):
+        """Teste de integração: reajustes repetidos mantêm uma linha por produto em alteracao_produto."""
+        catalogo = CatalogoColunar.carregar(usar_numpy=False)
+        for _ in range(5):
+            OperacoesProdutos.reajustar_precos(percentual=10, cod_inicio=1)
+        conn = BancoDeDados.conectar()
+        self.assertEqual(conn.execute('SELECT count(*) FROM alteracao_produto').fetchone()[0], 4)
+        self.assertEqual(catalogo.atualizar(), 4)
+        self.assertEqual(catalogo.top_k(1, 'valor'), CatalogoColunar.carregar(usar_numpy=False).top_k(1, 'valor'))
+        OperacoesProdutos.alterar_produto(1, 'Paracetamol', 'Analgésico', 1.0, 3)
+        self.assertEqual(catalogo.atualizar(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
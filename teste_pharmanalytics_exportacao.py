@@ -0,0 +1,91 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from pharmanalytics_exportacao import ExportadorDados, main
+from pharmanalytics_reformulado import BancoDeDados, OperacoesFarmacia, RoteadorFarmacias
+
+
+class TestExportacao(unittest.TestCase):
+
+    def setUp(self):
+        """Cria um banco de dados temporário com alguns produtos e farmácias"""
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.nome_db_original = BancoDeDados.NOME_DB
+        BancoDeDados.NOME_DB = os.path.join(self.diretorio.name, 'teste.db')
+        BancoDeDados.criar_tabelas()
+        with BancoDeDados.transacao() as conn:
+            for cod, nome, categoria, preco, quantidade, admin in [
+                    (1, 'Paracetamol', 'Analgésico', 10.0, 50, 1),
+                    (2, 'Dipirona', 'Analgésico', 8.0, 3, 2),
+                    (3, 'Amoxicilina', 'Antibiótico', 25.0, 10, 1)]:
+                conn.execute('INSERT INTO produto VALUES (?, ?, ?, ?, ?)', (cod, nome, preco, admin, cod))
+                conn.execute('INSERT INTO categoria_produto VALUES (?, ?)', (categoria, cod))
+                conn.execute('INSERT INTO estoque VALUES (?, ?)', (cod, quantidade))
+            conn.execute('''INSERT INTO farmacia VALUES (10, 'Central', 'Rua A', 1, 'Centro',
+                            '01000-000', '08:00', '22:00', 'Segunda-Sexta', 1)''')
+            conn.executemany('INSERT INTO tel_farmacia VALUES (?, 10)', [('1111',), ('2222',)])
+
+    def tearDown(self):
+        """Fecha as conexões persistentes e remove o banco temporário"""
+        BancoDeDados.fechar_conexoes()
+        BancoDeDados.NOME_DB = self.nome_db_original
+        self.diretorio.cleanup()
+
+    def test_filtros_de_produtos(self):
+        """Teste unitário: os filtros de categoria, estoque e administrador são aplicados."""
+        self.assertEqual([p['cod'] for p in ExportadorDados.produtos(categoria='Analgésico')], [1, 2])
+        self.assertEqual([p['cod'] for p in ExportadorDados.produtos(estoque_maximo=10)], [2, 3])
+        self.assertEqual([p['cod'] for p in ExportadorDados.produtos(estoque_minimo=5, cod_admin=1)], [1, 3])
+
+    def test_exporta_csv_compactado_em_blocos(self):
+        """Teste de integração: a exportação lê em blocos e grava CSV compactado."""
+        ExportadorDados.TAMANHO_BLOCO, original = 1, ExportadorDados.TAMANHO_BLOCO
+        try:
+            caminho = os.path.join(self.diretorio.name, 'produtos.csv.gz')
+            total = ExportadorDados.gravar(ExportadorDados.produtos(), caminho, ExportadorDados.CAMPOS_PRODUTO)
+        finally:
+            ExportadorDados.TAMANHO_BLOCO = original
+        self.assertEqual(total, 3)
+        with gzip.open(caminho, 'rt', encoding='utf-8') as arquivo:
+            linhas = list(csv.DictReader(arquivo))
+        self.assertEqual(linhas[2]['nome'], 'Amoxicilina')
+
+    def test_exporta_farmacias_jsonl(self):
+        """Teste de integração: farmácias são exportadas com todos os telefones."""
+        caminho = os.path.join(self.diretorio.name, 'farmacias.jsonl')
+        ExportadorDados.gravar(ExportadorDados.farmacias(), caminho, ExportadorDados.CAMPOS_FARMACIA)
+        with open(caminho, encoding='utf-8') as arquivo:
+            farmacia = json.loads(arquivo.readline())
+        self.assertEqual((farmacia['nome'], farmacia['telefones']), ('Central', '1111;2222'))
+
+
+    def test_exporta_farmacias_particionadas(self):
+        """Teste de sistema: a exportação junta as farmácias de todas as partições, em ordem de código."""
+        roteador = RoteadorFarmacias(RoteadorFarmacias.nomes_particoes(BancoDeDados.NOME_DB, 3))
+        OperacoesFarmacia.roteador = roteador
+        try:
+            roteador.criar_tabelas()
+            for cod in (5, 1, 4, 2, 3, 6):
+                OperacoesFarmacia.registrar_farmacia(cod, f'Farmácia {cod}', f'{cod}000', 'Rua B', cod, 'Centro',
+                                                     '02000-000', '08:00', '20:00', 'Todos', cod % 2)
+        finally:
+            OperacoesFarmacia.roteador = None
+            roteador.encerrar()
+        caminho = os.path.join(self.diretorio.name, 'farmacias.jsonl')
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(main(['farmacias', caminho, '--admin', '1', '--particoes', '3',
+                                   '--banco', BancoDeDados.NOME_DB]), 0)
+        self.assertIsNone(OperacoesFarmacia.roteador)
+        with open(caminho, encoding='utf-8') as arquivo:
+            farmacias = [json.loads(linha) for linha in arquivo]
+        self.assertEqual([(f['cod'], f['telefones']) for f in farmacias], [(1, '1000'), (3, '3000'), (5, '5000')])
+
+
+if __name__ == '__main__':
+    unittest.main()
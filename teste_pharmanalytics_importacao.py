@@ -0,0 +1,144 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from pharmanalytics_importacao import ImportadorCatalogo, main
+from pharmanalytics_reformulado import (
+    BancoDeDados, CacheProdutos, OperacoesFarmacia, OperacoesProdutos, RoteadorFarmacias
+)
+
+
+class TestImportacao(unittest.TestCase):
+
+    def setUp(self):
+        """Cria um banco de dados temporário em disco para cada teste"""
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.nome_db_original = BancoDeDados.NOME_DB
+        BancoDeDados.NOME_DB = os.path.join(self.diretorio.name, 'teste.db')
+        BancoDeDados.criar_tabelas()
+        OperacoesProdutos.cache = CacheProdutos()
+
+    def tearDown(self):
+        """Fecha as conexões persistentes e remove o banco temporário"""
+        BancoDeDados.fechar_conexoes()
+        BancoDeDados.NOME_DB = self.nome_db_original
+        self.diretorio.cleanup()
+
+    def arquivo(self, nome, conteudo):
+        """Grava um arquivo de entrada no diretório temporário e retorna o caminho."""
+        caminho = os.path.join(self.diretorio.name, nome)
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        return caminho
+
+    def test_importa_produtos_csv_com_rejeicoes(self):
+        """Teste de integração: linhas válidas são gravadas e as inválidas informadas."""
+        caminho = self.arquivo('produtos.csv', (
+            'cod,nome,categoria,preco,quantidade\n'
+            '1,Paracetamol,Analgésico,10.0,50\n'
+            '2,Dipirona,Analgésico,abc,20\n'
+            '3,Amoxicilina,Antibiótico,25.0,10\n'
+            '3,Amoxicilina 2,Antibiótico,25.0,10\n'
+            '4,,Antibiótico,25.0,10\n'
+        ))
+        resumo = ImportadorCatalogo(cod_admin=1, tamanho_lote=2).importar_produtos(caminho)
+        self.assertEqual((resumo['inseridos'], resumo['atualizados']), (2, 0))
+        self.assertEqual([numero for numero, _ in resumo['rejeitados']], [3, 5, 6])
+        self.assertEqual(OperacoesProdutos.obter_produto(nome='amoxicilina'),
+                         (3, 'Amoxicilina', 'Antibiótico', 25.0, 10))
+        self.assertEqual([p[0] for p in OperacoesProdutos.pesquisar_produtos('parace')], [1])
+
+    def test_reimportacao_com_upsert(self):
+        """Teste de integração: sem upsert os códigos repetidos são rejeitados; com upsert, atualizados."""
+        primeiro = self.arquivo('a.jsonl', '{"cod": 1, "nome": "Paracetamol", "categoria": "Analgésico", '
+                                           '"preco": 10.0, "quantidade": 50}\n')
+        segundo = self.arquivo('b.jsonl', '{"cod": 1, "nome": "Paracetamol", "categoria": "Antitérmico", '
+                                          '"preco": 11.0, "quantidade": 70}\n'
+                                          '{"cod": 2, "nome": "Dipirona", "categoria": "Analgésico", '
+                                          '"preco": 8.0, "quantidade": 5}\n')
+        ImportadorCatalogo(cod_admin=1).importar_produtos(primeiro)
+        self.assertEqual(OperacoesProdutos.obter_produto(codigo=1)[4], 50)
+        resumo = ImportadorCatalogo(cod_admin=1).importar_produtos(segundo)
+        self.assertEqual((resumo['inseridos'], len(resumo['rejeitados'])), (1, 1))
+        resumo = ImportadorCatalogo(cod_admin=1, upsert=True).importar_produtos(segundo)
+        self.assertEqual((resumo['inseridos'], resumo['atualizados']), (0, 2))
+        self.assertEqual(OperacoesProdutos.obter_produto(codigo=1), (1, 'Paracetamol', 'Antitérmico', 11.0, 70))
+        conn = BancoDeDados.conectar()
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM categoria_produto').fetchone()[0], 2)
+
+    def test_importa_farmacias(self):
+        """Teste de integração: farmácias e telefones são gravados a partir de JSONL."""
+        caminho = self.arquivo('farmacias.jsonl', (
+            '{"cod": 10, "nome": "Central", "telefone": "1111", "rua": "Rua A", "num": 1, '
+            '"bairro": "Centro", "cep": "01000-000", "hora_inicio": "08:00", "hora_fim": "22:00", '
+            '"dia_funcionamento": "Segunda-Sexta"}\n'
+            'isto não é json\n'
+        ))
+        resumo = ImportadorCatalogo(cod_admin=1).importar_farmacias(caminho)
+        self.assertEqual((resumo['inseridos'], resumo['rejeitados']), (1, [(2, 'linha mal formada')]))
+        conn = BancoDeDados.conectar()
+        self.assertEqual(conn.execute('SELECT numero FROM tel_farmacia WHERE cod_farmacia = 10').fetchone()[0],
+                         '1111')
+
+    def test_valores_e_arquivos_invalidos(self):
+        """Teste de sistema: preços não finitos são rejeitados e erros do CSV encerram a importação."""
+        caminho = self.arquivo('produtos.jsonl', (
+            '{"cod": 1, "nome": "A", "categoria": "X", "preco": NaN, "quantidade": 1}\n'
+            '{"cod": 2, "nome": "B", "categoria": "X", "preco": "inf", "quantidade": 1}\n'
+            '{"cod": 3, "nome": "C", "categoria": "X", "preco": 1e400, "quantidade": 1}\n'
+            '{"cod": 4, "nome": "D", "categoria": "X", "preco": 4.5, "quantidade": 1}\n'
+        ))
+        resumo = ImportadorCatalogo(cod_admin=1).importar_produtos(caminho)
+        self.assertEqual((resumo['inseridos'], [numero for numero, _ in resumo['rejeitados']]), (1, [1, 2, 3]))
+
+        conn = BancoDeDados.conectar()
+        conn.execute('INSERT INTO pessoa (cpf) VALUES (1)')
+        conn.execute("INSERT INTO administrador (email, senha, cod_pessoa) VALUES ('admin@x.com', 'segredo', 1)")
+        conn.commit()
+        # Campo acima do limite do módulo csv.
+        caminho = self.arquivo('produtos.csv', 'cod,nome,categoria,preco,quantidade\n5,' + 'x' * 200000 + ',X,1,1\n')
+        saida = io.StringIO()
+        with redirect_stdout(saida):
+            self.assertEqual(main(['produtos', caminho, '--admin', '1', '--banco', BancoDeDados.NOME_DB]), 1)
+            self.assertEqual(BancoDeDados._conexoes, [])
+            self.assertEqual(main(['produtos', caminho, '--admin', '9', '--banco', BancoDeDados.NOME_DB]), 1)
+            self.assertEqual(BancoDeDados._conexoes, [])
+        self.assertIn('Erro ao importar produtos', saida.getvalue())
+
+    def test_importa_farmacias_particionadas(self):
+        """Teste de integração: com partições, cada farmácia importada vai para o banco dela."""
+        caminho = self.arquivo('farmacias.jsonl', ''.join(
+            f'{{"cod": {cod}, "nome": "Farmácia {cod}", "telefone": "{cod}000", "rua": "Rua {cod}", "num": 1, '
+            f'"bairro": "Centro", "cep": "0100{cod}-000", "hora_inicio": "08:00", "hora_fim": "22:00", '
+            f'"dia_funcionamento": "Todos"}}\n' for cod in range(1, 6)))
+        bancos = RoteadorFarmacias.nomes_particoes(BancoDeDados.NOME_DB, 2)
+        OperacoesFarmacia.roteador = RoteadorFarmacias(bancos)
+        try:
+            OperacoesFarmacia.roteador.criar_tabelas()
+            resumo = ImportadorCatalogo(cod_admin=1, tamanho_lote=3).importar_farmacias(caminho)
+            self.assertEqual(resumo['inseridos'], 5)
+            for indice, banco in enumerate(bancos):
+                with BancoDeDados.usando(banco):
+                    conn = BancoDeDados.conectar()
+                    self.assertEqual([linha[0] for linha in conn.execute('SELECT cod FROM farmacia ORDER BY cod')],
+                                     [cod for cod in range(1, 6) if cod % 2 == indice])
+                    # As partições recebem só o esquema das farmácias.
+                    self.assertNotIn('produto', {linha[0] for linha in conn.execute(
+                        "SELECT name FROM sqlite_master WHERE type = 'table'")})
+            # Leituras que atravessam as partições enxergam todas as farmácias importadas.
+            self.assertEqual([f[0] for f in OperacoesFarmacia.buscar_por_localidade(bairro='centro')],
+                             [1, 2, 3, 4, 5])
+            self.assertEqual([f[0] for f in OperacoesFarmacia.buscar_por_localidade(cep='01004')], [4])
+            linhas, _ = OperacoesFarmacia.listar_farmacias(limite=10, ordem='-cod')
+            self.assertEqual([(f[0], f[-1]) for f in linhas], [(cod, f'{cod}000') for cod in range(5, 0, -1)])
+        finally:
+            OperacoesFarmacia.roteador.encerrar()
+            OperacoesFarmacia.roteador = None
+        conn = BancoDeDados.conectar()
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM farmacia').fetchone()[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
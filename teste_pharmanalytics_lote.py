@@ -0,0 +1,103 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from pharmanalytics_lote import ExecutorLote, main
+from pharmanalytics_reformulado import BancoDeDados, CacheProdutos, OperacoesProdutos, OperacoesUsuario
+
+
+class TestLote(unittest.TestCase):
+
+    def setUp(self):
+        """Cria um banco de dados temporário com um administrador para cada teste"""
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.nome_db_original = BancoDeDados.NOME_DB
+        BancoDeDados.NOME_DB = os.path.join(self.diretorio.name, 'teste.db')
+        BancoDeDados.criar_tabelas()
+        OperacoesProdutos.cache = CacheProdutos()
+        conn = BancoDeDados.conectar()
+        conn.execute('INSERT INTO pessoa (cpf) VALUES (1)')
+        conn.execute("INSERT INTO administrador (email, senha, cod_pessoa) VALUES ('admin@x.com', 'segredo', 1)")
+        conn.commit()
+
+    def tearDown(self):
+        """Fecha as conexões persistentes e remove o banco temporário"""
+        BancoDeDados.fechar_conexoes()
+        BancoDeDados.NOME_DB = self.nome_db_original
+        self.diretorio.cleanup()
+
+    def test_operacoes_em_grupos(self):
+        """Teste de integração: falhas isoladas por operação e resultados na ordem da entrada."""
+        operacoes = [
+            {'op': 'produto', 'id': 'a', 'cod': 1, 'nome': 'Dipirona', 'categoria': 'Analgésico',
+             'preco': 5.0, 'quantidade': 10},
+            {'op': 'produto', 'cod': 1, 'nome': 'Repetido', 'categoria': 'X', 'preco': 1.0, 'quantidade': 1},
+            {'op': 'venda', 'itens': [{'produto': 1, 'quantidade': 4}]},
+            {'op': 'venda', 'itens': [{'produto': 'Dipirona', 'quantidade': 7}]},
+            {'op': 'usuario', 'cpf': 50},
+            {'op': 'desconhecida'},
+            {'op': 'farmacia', 'cod': 3, 'nome': 'Central', 'telefone': '11', 'rua': 'Rua A', 'num': 1,
+             'bairro': 'Centro', 'cep': '01000-000', 'hora_inicio': '08:00', 'hora_fim': '20:00',
+             'dia_funcionamento': 'Seg-Sex'},
+            {'op': 'remover_farmacia', 'cod': 4},
+            {'op': 'buscar', 'q': 'dipi'},
+        ]
+        linhas = [json.dumps(operacao) for operacao in operacoes]
+        linhas.insert(3, '')
+        linhas.append('{não é json')
+        resultados = list(ExecutorLote(1, tamanho_transacao=3).executar(linhas))
+        self.assertEqual([r['linha'] for r in resultados], [1, 2, 3, 5, 6, 7, 8, 9, 10, 11])
+        self.assertEqual([r['ok'] for r in resultados],
+                         [True, False, True, True, False, False, True, False, True, False])
+        self.assertEqual(resultados[0]['id'], 'a')
+        self.assertTrue(resultados[1]['erro'].startswith('conflito'))
+        self.assertEqual((resultados[2]['confirmada'], resultados[3]['confirmada']), (True, False))
+        self.assertEqual(resultados[4]['erro'], "campo ausente: 'telefone'")
+        self.assertEqual(resultados[7]['erro'], "Farmácia não encontrada.")
+        self.assertEqual(resultados[8]['produtos'][0]['quantidade'], 6)
+        self.assertEqual(OperacoesProdutos.obter_produto(1)[4], 6)
+
+    def test_cache_fora_do_grupo_aberto(self):
+        """Teste de integração: o grupo lê as próprias gravações e nada dele fica no cache se for desfeito."""
+        produto = {'op': 'produto', 'cod': 1, 'nome': 'Dipirona', 'categoria': 'Analgésico',
+                   'preco': 5.0, 'quantidade': 10}
+        operacoes = [produto, {'op': 'consultar_produto', 'cod': 1},
+                     dict(produto, op='atualizar_produto', quantidade=20), {'op': 'consultar_produto', 'cod': 1}]
+        resultados = list(ExecutorLote(1).executar(json.dumps(operacao) for operacao in operacoes))
+        self.assertEqual([r['produto']['quantidade'] for r in resultados if 'produto' in r], [10, 20])
+
+        operacoes = [dict(produto, cod=2), {'op': 'consultar_produto', 'cod': 2},
+                     {'op': 'usuario', 'cpf': 50, 'telefone': '11'}]
+        with patch.object(OperacoesUsuario, 'registrar_usuario', side_effect=sqlite3.OperationalError('disco cheio')):
+            with self.assertRaises(sqlite3.OperationalError):
+                list(ExecutorLote(1).executar(json.dumps(operacao) for operacao in operacoes))
+        self.assertIsNone(OperacoesProdutos.obter_produto(2))
+        self.assertEqual(OperacoesProdutos.obter_produto(1)[4], 20)
+
+    def test_linha_de_comando(self):
+        """Teste de sistema: arquivo de operações executado e resultados gravados em JSONL."""
+        entrada = os.path.join(self.diretorio.name, 'operacoes.jsonl')
+        saida = os.path.join(self.diretorio.name, 'resultados.jsonl')
+        with open(entrada, 'w', encoding='utf-8') as arquivo:
+            for cod in range(1, 6):
+                arquivo.write(json.dumps({'op': 'produto', 'cod': cod, 'nome': f'Produto {cod}',
+                                          'categoria': 'Geral', 'preco': 1.0, 'quantidade': cod}) + '\n')
+            arquivo.write(json.dumps({'op': 'consultar_produto', 'cod': 5}) + '\n')
+        self.assertEqual(main([entrada, '--admin', '1', '--transacao', '2', '--saida', saida,
+                               '--banco', BancoDeDados.NOME_DB]), 0)
+        with open(saida, encoding='utf-8') as arquivo:
+            resultados = [json.loads(linha) for linha in arquivo]
+        self.assertEqual(len(resultados), 6)
+        self.assertTrue(all(r['ok'] for r in resultados))
+        self.assertEqual(resultados[-1]['produto']['nome'], 'Produto 5')
+        with patch('builtins.print'):
+            self.assertEqual(main([entrada, '--admin', '9', '--banco', BancoDeDados.NOME_DB]), 1)
+        # A recusa do administrador também fecha as conexões.
+        self.assertEqual(BancoDeDados._conexoes, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
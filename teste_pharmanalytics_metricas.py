@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from pharmanalytics_metricas import Histograma, Instrumentacao
+from pharmanalytics_reformulado import BancoDeDados, CacheProdutos, OperacoesProdutos
+
+
+class TestMetricas(unittest.TestCase):
+
+    def setUp(self):
+        """Cria um banco temporário e liga a instrumentação"""
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.nome_db_original = BancoDeDados.NOME_DB
+        BancoDeDados.NOME_DB = os.path.join(self.diretorio.name, 'teste.db')
+        OperacoesProdutos.cache = CacheProdutos()
+        Instrumentacao.limpar()
+        Instrumentacao.ativar(limiar_lento=0.0)
+        BancoDeDados.criar_tabelas()
+
+    def tearDown(self):
+        """Desliga a instrumentação e remove o banco temporário"""
+        Instrumentacao.desativar()
+        BancoDeDados.fechar_conexoes()
+        BancoDeDados.NOME_DB = self.nome_db_original
+        self.diretorio.cleanup()
+
+    def test_histograma(self):
+        """Teste unitário: as durações caem nas faixas certas e os percentis são estimados."""
+        histograma = Histograma()
+        for segundos in (0.0002, 0.0002, 0.003, 10.0):
+            histograma.registrar(segundos)
+        self.assertEqual(histograma.total, 4)
+        self.assertEqual(histograma.percentil(0.5), 0.00025)
+        self.assertEqual(histograma.percentil(0.99), float('inf'))
+
+    def test_operacoes_e_instrucoes_medidas(self):
+        """Teste de integração: operações e instruções são medidas e as lentas trazem o plano."""
+        OperacoesProdutos.inserir_produto(1, 'Paracetamol', 'Analgésico', 10.0, 50, 1)
+        OperacoesProdutos.obter_produto(nome='paracetamol')
+        metricas = Instrumentacao.exportar_json()
+        self.assertEqual(metricas['operacoes']['OperacoesProdutos.inserir_produto']['total'], 1)
+        self.assertEqual(metricas['operacoes']['OperacoesProdutos.obter_produto']['total'], 1)
+        self.assertTrue(any(sql.startswith('INSERT INTO produto') for sql in metricas['instrucoes']))
+        planos = [lenta['plano'] for lenta in metricas['lentas'] if 'LOWER(p.nome)' in lenta['sql']]
+        self.assertTrue(any('idx_produto_nome' in ' '.join(plano) for plano in planos))
+
+    def test_leitura_e_executemany_medidos(self):
+        """Teste de integração: o tempo dos fetch* entra na instrução e o executemany traz o plano."""
+        conn = BancoDeDados.conectar()
+        conn.create_function('dormir', 1, time.sleep)
+        Instrumentacao.LIMIAR_LENTO = 0.05
+        # A primeira linha sai no execute; a demora está na leitura da segunda.
+        self.assertEqual(len(conn.execute('SELECT dormir(x) FROM (SELECT 0 AS x UNION ALL SELECT 0.06)').fetchall()), 2)
+        lentas = [lenta for lenta in Instrumentacao.exportar_json()['lentas'] if 'dormir' in lenta['sql']]
+        self.assertEqual(len(lentas), 1)
+        self.assertGreaterEqual(lentas[0]['duracao_s'], 0.06)
+
+        Instrumentacao.LIMIAR_LENTO = 0.0
+        OperacoesProdutos.inserir_produto(1, 'Paracetamol', 'Analgésico', 10.0, 50, 1)
+        conn.executemany('UPDATE estoque SET quantidade = ? WHERE cod = ?', iter([(40, 1), (30, 1)]))
+        conn.commit()
+        self.assertEqual(OperacoesProdutos.obter_produto(1)[4], 30)
+        planos = [lenta['plano'] for lenta in Instrumentacao.exportar_json()['lentas']
+                  if lenta['sql'].startswith('UPDATE estoque SET quantidade = ?')]
+        self.assertTrue(planos and 'estoque' in ' '.join(planos[0]))
+
+    def test_erros_contados_e_exportacao(self):
+        """Teste de integração: exceções são contadas e as métricas gravadas nos dois formatos."""
+        OperacoesProdutos.inserir_produto(1, 'Paracetamol', 'Analgésico', 10.0, 50, 1)
+        with self.assertRaises(Exception):
+            OperacoesProdutos.inserir_produto(1, 'Paracetamol', 'Analgésico', 10.0, 50, 1)
+        caminho_json = os.path.join(self.diretorio.name, 'metricas.json')
+        caminho_prom = os.path.join(self.diretorio.name, 'metricas.prom')
+        Instrumentacao.gravar(caminho_json)
+        Instrumentacao.gravar(caminho_prom)
+        with open(caminho_json, encoding='utf-8') as arquivo:
+            self.assertEqual(json.load(arquivo)['operacoes']['OperacoesProdutos.inserir_produto']['erros'], 1)
+        with open(caminho_prom, encoding='utf-8') as arquivo:
+            texto = arquivo.read()
+        self.assertIn('pharmanalytics_operacao_segundos_count{operacao="OperacoesProdutos.inserir_produto"} 2',
+                      texto)
+        self.assertIn('pharmanalytics_operacao_erros_total{operacao="OperacoesProdutos.inserir_produto"} 1', texto)
+        self.assertIn('pharmanalytics_operacao_instrucoes_vm_total{operacao="OperacoesProdutos.inserir_produto"}',
+                      texto)
+
+    def test_desativar_restaura_metodos(self):
+        """Teste unitário: desativar devolve os métodos originais."""
+        Instrumentacao.desativar()
+        self.assertFalse(hasattr(OperacoesProdutos.inserir_produto, '__wrapped__'))
+        Instrumentacao.ativar()
+        self.assertTrue(hasattr(OperacoesProdutos.inserir_produto, '__wrapped__'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import io
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+
+from pharmanalytics_movimentos import main
+from pharmanalytics_reformulado import BancoDeDados, CacheProdutos, OperacoesMovimentos, OperacoesProdutos
+
+
+class TestMovimentos(unittest.TestCase):
+
+    def setUp(self):
+        """Cria um banco de dados temporário para cada teste"""
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.nome_db_original = BancoDeDados.NOME_DB
+        BancoDeDados.NOME_DB = os.path.join(self.diretorio.name, 'teste.db')
+        BancoDeDados.criar_tabelas()
+        OperacoesProdutos.cache = CacheProdutos()
+
+    def tearDown(self):
+        """Fecha as conexões persistentes e remove o banco temporário"""
+        BancoDeDados.fechar_conexoes()
+        BancoDeDados.NOME_DB = self.nome_db_original
+        self.diretorio.cleanup()
+
+    def marcar(self):
+        """Retorna um instante separado dos movimentos anteriores e seguintes."""
+        time.sleep(0.01)
+        momento = time.time()
+        time.sleep(0.01)
+        return momento
+
+    def test_movimentos_das_operacoes(self):
+        """Teste de integração: cada alteração de estoque gera um movimento com motivo e administrador."""
+        OperacoesProdutos.inserir_produto(1, 'Paracetamol', 'Analgésico', 10.0, 50, 7)
+        self.assertEqual(OperacoesProdutos.finalizar_venda([(1, 5)]), [])
+        self.assertNotEqual(OperacoesProdutos.finalizar_venda([(1, 5), (1, 100)]), [])
+        OperacoesProdutos.alterar_produto(1, 'Paracetamol', 'Analgésico', 10.0, 60, 7)
+        with BancoDeDados.transacao() as conn:
+            conn.execute('UPDATE estoque SET quantidade = 58 WHERE cod = 1')
+        OperacoesProdutos.remover_produto(1, 8)
+        movimentos = [linha[2:5] for linha in OperacoesMovimentos.movimentos(codigo=1)]
+        self.assertEqual(movimentos, [(50, 'cadastro', 7), (-5, 'venda', None), (15, 'ajuste', 7),
+                                      (-2, None, None), (-58, 'remocao', 8)])
+        conn = BancoDeDados.conectar()
+        with self.assertRaises(sqlite3.DatabaseError):
+            conn.execute('DELETE FROM movimento_estoque')
+        conn.rollback()
+
+    def test_quantidade_em_instante_passado(self):
+        """Teste de sistema: consultas históricas partem do instantâneo mais próximo."""
+        OperacoesProdutos.inserir_produto(1, 'Paracetamol', 'Analgésico', 10.0, 50, 7)
+        OperacoesProdutos.inserir_produto(2, 'Dipirona', 'Analgésico', 5.0, 10, 7)
+        antes_da_venda = self.marcar()
+        OperacoesProdutos.finalizar_venda([(1, 20), (2, 1)])
+        self.assertIsNotNone(OperacoesMovimentos.gravar_instantaneo())
+        self.assertIsNone(OperacoesMovimentos.gravar_instantaneo())
+        depois_do_instantaneo = self.marcar()
+        OperacoesProdutos.finalizar_venda([(1, 10)])
+        agora = self.marcar()
+
+        self.assertEqual(OperacoesMovimentos.quantidade_em(1, antes_da_venda), 50)
+        self.assertEqual(OperacoesMovimentos.quantidade_em(1, depois_do_instantaneo), 30)
+        self.assertEqual(OperacoesMovimentos.quantidade_em(1, agora), 20)
+        self.assertEqual(OperacoesMovimentos.quantidade_em(2, agora), 9)
+        self.assertIsNone(OperacoesMovimentos.quantidade_em(1, 0))
+        janela = OperacoesMovimentos.movimentos(antes_da_venda, depois_do_instantaneo)
+        self.assertEqual([linha[1:3] for linha in janela], [(1, -20), (2, -1)])
+
+        saida = io.StringIO()
+        with redirect_stdout(saida):
+            self.assertEqual(main(['--banco', BancoDeDados.NOME_DB, 'quantidade', '1',
+                                   '--momento', str(depois_do_instantaneo)]), 0)
+        self.assertEqual(saida.getvalue().strip(), '30')
+
+    def test_instantaneo_automatico(self):
+        """Teste de integração: a thread de fundo grava um instantâneo a cada INTERVALO_INSTANTANEO movimentos."""
+        intervalo_original = OperacoesMovimentos.INTERVALO_INSTANTANEO
+        OperacoesMovimentos.INTERVALO_INSTANTANEO = 3
+        try:
+            OperacoesProdutos.inserir_produto(1, 'Paracetamol', 'Analgésico', 10.0, 50, 7)
+            OperacoesProdutos.finalizar_venda([(1, 1)])
+            OperacoesMovimentos.aguardar_instantaneos()
+            conn = BancoDeDados.conectar()
+            self.assertEqual(conn.execute('SELECT count(*) FROM instantaneo_estoque').fetchone()[0], 1)
+            # A venda de três linhas leva o livro a quatro movimentos desde o instantâneo inicial.
+            OperacoesProdutos.finalizar_venda([(1, 1), (1, 1), (1, 1)])
+            OperacoesMovimentos.aguardar_instantaneos()
+            self.assertEqual(conn.execute('SELECT max(ultimo_movimento) FROM instantaneo_estoque').fetchone()[0],
+                             5)
+            self.assertEqual(conn.execute(
+                'SELECT quantidade FROM instantaneo_item ORDER BY cod_instantaneo DESC LIMIT 1').fetchone()[0], 46)
+        finally:
+            OperacoesMovimentos.INTERVALO_INSTANTANEO = intervalo_original
+        # O contexto não deixa rastro no banco: fora de contexto() os movimentos ficam sem motivo.
+        with BancoDeDados.transacao() as conn:
+            conn.execute('UPDATE estoque SET quantidade = 40 WHERE cod = 1')
+        self.assertEqual(OperacoesMovimentos.movimentos(codigo=1)[-1][2:5], (-6, None, None))
+        # Conexões sem as funções do contexto não alteram o estoque.
+        externa = sqlite3.connect(BancoDeDados.NOME_DB)
+        with self.assertRaises(sqlite3.OperationalError):
+            externa.execute('UPDATE estoque SET quantidade = 30 WHERE cod = 1')
+        externa.close()
+        self.assertEqual(OperacoesProdutos.obter_produto(1)[4], 40)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import io
+import os
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+
+from pharmanalytics_precos import main
+from pharmanalytics_reformulado import BancoDeDados, CacheProdutos, OperacoesPrecos, OperacoesProdutos
+
+
+class TestPrecos(unittest.TestCase):
+
+    def setUp(self):
+        """Cria um banco de dados temporário para cada teste"""
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.nome_db_original = BancoDeDados.NOME_DB
+        BancoDeDados.NOME_DB = os.path.join(self.diretorio.name, 'teste.db')
+        BancoDeDados.criar_tabelas()
+        OperacoesProdutos.cache = CacheProdutos()
+
+    def tearDown(self):
+        """Fecha as conexões persistentes e remove o banco temporário"""
+        BancoDeDados.fechar_conexoes()
+        BancoDeDados.NOME_DB = self.nome_db_original
+        self.diretorio.cleanup()
+
+    def marcar(self):
+        """Retorna um instante separado das alterações anteriores e seguintes."""
+        time.sleep(0.01)
+        momento = time.time()
+        time.sleep(0.01)
+        return momento
+
+    def test_preco_em_um_instante(self):
+        """Teste de integração: cada alteração de preço gera um trecho consultável depois."""
+        antes = self.marcar()
+        OperacoesProdutos.inserir_produto(1, 'Paracetamol', 'Analgésico', 10.0, 5, 1)
+        cadastro = self.marcar()
+        OperacoesProdutos.alterar_produto(1, 'Paracetamol', 'Analgésico', 12.5, 5, 1)
+        reajuste = self.marcar()
+        # Alterações que não mudam o preço não geram trechos.
+        OperacoesProdutos.alterar_produto(1, 'Paracetamol 500mg', 'Analgésico', 12.5, 9, 1)
+        OperacoesProdutos.reajustar_precos(percentual=-20, cod_inicio=1)
+        lote = self.marcar()
+        OperacoesProdutos.remover_produto(1)
+        remocao = self.marcar()
+
+        self.assertIsNone(OperacoesPrecos.preco_em(1, antes))
+        self.assertEqual(OperacoesPrecos.preco_em(1, cadastro), 10.0)
+        self.assertEqual(OperacoesPrecos.preco_em(1, reajuste), 12.5)
+        self.assertEqual(OperacoesPrecos.preco_em(1, lote), 10.0)
+        self.assertIsNone(OperacoesPrecos.preco_em(1, remocao))
+        self.assertEqual([linha[2:] for linha in OperacoesPrecos.alteracoes(codigo=1)],
+                         [(None, 10.0), (10.0, 12.5), (12.5, 10.0), (10.0, None)])
+        self.assertEqual([linha[2:] for linha in OperacoesPrecos.alteracoes(cadastro, lote)],
+                         [(10.0, 12.5), (12.5, 10.0)])
+
+    def test_compactacao(self):
+        """Teste de integração: trechos repetidos são juntados e mudanças antigas reduzidas por janela."""
+        OperacoesProdutos.inserir_produto(1, 'Dipirona', 'Analgésico', 5.0, 5, 1)
+        conn = BancoDeDados.conectar()
+        conn.executemany('INSERT INTO historico_preco (cod_produto, inicio, preco) VALUES (1, ?, ?)',
+                         [(100.0, 1.0), (110.0, 1.0), (150.0, 2.0), (170.0, 3.0), (230.0, 3.0)])
+        conn.commit()
+        self.assertEqual(OperacoesPrecos.compactar(), 2)
+        self.assertEqual(OperacoesPrecos.preco_em(1, 120), 1.0)
+        self.assertEqual(OperacoesPrecos.preco_em(1, 240), 3.0)
+        # Janelas de 100 s antes do instante 200: [100, 200) mantém só a última mudança (170).
+        self.assertEqual(OperacoesPrecos.compactar(antes=200, resolucao=100), 2)
+        self.assertEqual([linha[1:] for linha in OperacoesPrecos.alteracoes(fim=1000)], [(170.0, None, 3.0)])
+        self.assertEqual(OperacoesPrecos.preco_em(1, time.time()), 5.0)
+        with self.assertRaises(ValueError):
+            OperacoesPrecos.compactar(antes=200)
+
+    def test_linha_de_comando(self):
+        """Teste de sistema: consulta do preço atual pela linha de comando."""
+        OperacoesProdutos.inserir_produto(1, 'Dipirona', 'Analgésico', 5.0, 5, 1)
+        saida = io.StringIO()
+        with redirect_stdout(saida):
+            self.assertEqual(main(['--banco', BancoDeDados.NOME_DB, 'preco', '1']), 0)
+            self.assertEqual(main(['--banco', BancoDeDados.NOME_DB, 'preco', '2']), 1)
+        self.assertEqual(saida.getvalue().splitlines(), ['5.00', "Produto sem preço nesse instante."])
+
+
+if __name__ == '__main__':
+    unittest.main()
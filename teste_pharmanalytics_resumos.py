@@ -0,0 +1,62 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from pharmanalytics_importacao import ImportadorCatalogo
+from pharmanalytics_reformulado import BancoDeDados, CacheProdutos, OperacoesProdutos, OperacoesResumo
+from pharmanalytics_resumos import main
+
+
+class TestResumos(unittest.TestCase):
+
+    def setUp(self):
+        """Cria um banco de dados temporário com um pequeno catálogo"""
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.nome_db_original = BancoDeDados.NOME_DB
+        BancoDeDados.NOME_DB = os.path.join(self.diretorio.name, 'teste.db')
+        BancoDeDados.criar_tabelas()
+        OperacoesProdutos.cache = CacheProdutos()
+        OperacoesProdutos.inserir_produto(1, 'Paracetamol', 'Analgésico', 10.0, 50, 1)
+        OperacoesProdutos.inserir_produto(2, 'Dipirona', 'Analgésico', 8.0, 3, 2)
+        OperacoesProdutos.inserir_produto(3, 'Amoxicilina', 'Antibiótico', 25.5, 12, 1)
+
+    def tearDown(self):
+        """Fecha as conexões persistentes e remove o banco temporário"""
+        BancoDeDados.fechar_conexoes()
+        BancoDeDados.NOME_DB = self.nome_db_original
+        self.diretorio.cleanup()
+
+    def test_resumos_acompanham_as_escritas(self):
+        """Teste de integração: cadastro, venda, alteração, remoção e importação atualizam os resumos."""
+        self.assertEqual(OperacoesResumo.por_categoria(),
+                         [('Analgésico', 2, 53, 524.0, 1), ('Antibiótico', 1, 12, 306.0, 0)])
+        self.assertEqual(OperacoesResumo.por_administrador(), [(1, 2, 62, 806.0, 0), (2, 1, 3, 24.0, 1)])
+        self.assertEqual(OperacoesProdutos.finalizar_venda([(1, 45), (3, 2)]), [])
+        OperacoesProdutos.alterar_produto(2, 'Dipirona', 'Antibiótico', 9.0, 20)
+        OperacoesProdutos.remover_produto(3)
+        self.assertEqual(OperacoesResumo.por_categoria(),
+                         [('Antibiótico', 1, 20, 180.0, 0), ('Analgésico', 1, 5, 50.0, 1)])
+        arquivo = os.path.join(self.diretorio.name, 'produtos.csv')
+        with open(arquivo, 'w', encoding='utf-8') as saida:
+            saida.write('cod,nome,categoria,preco,quantidade\n4,Ibuprofeno,Analgésico,2.0,100\n')
+        ImportadorCatalogo(cod_admin=2).importar_produtos(arquivo)
+        self.assertEqual(OperacoesResumo.por_categoria()[0], ('Analgésico', 2, 105, 250.0, 1))
+        self.assertEqual(OperacoesResumo.verificar(), [])
+
+    def test_verificar_reconstruir_e_estoque_minimo(self):
+        """Teste de sistema: a linha de comando detecta divergências e reconstrói os resumos."""
+        conn = BancoDeDados.conectar()
+        conn.execute("UPDATE resumo_categoria SET unidades = 0 WHERE categoria = 'Analgésico'")
+        conn.commit()
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(main(['verificar', '--banco', BancoDeDados.NOME_DB]), 1)
+            self.assertEqual(main(['reconstruir', '--estoque-minimo', '20', '--banco', BancoDeDados.NOME_DB]), 0)
+            self.assertEqual(main(['verificar', '--banco', BancoDeDados.NOME_DB]), 0)
+        self.assertEqual(OperacoesResumo.estoque_minimo(), 20)
+        self.assertEqual([linha[4] for linha in OperacoesResumo.por_categoria()], [1, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
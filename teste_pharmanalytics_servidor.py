@@ -0,0 +1,184 @@
+import asyncio
+import base64
+import http.client
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+from pharmanalytics_reformulado import (
+    BancoDeDados, CacheProdutos, CacheSessoes, OperacoesAdministrador, OperacoesProdutos
+)
+from pharmanalytics_servidor import ServidorHTTP
+
+
+class TestServidor(unittest.TestCase):
+
+    def setUp(self):
+        """Cria um banco temporário e sobe o servidor numa thread com seu próprio laço"""
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.nome_db_original = BancoDeDados.NOME_DB
+        BancoDeDados.NOME_DB = os.path.join(self.diretorio.name, 'servidor.db')
+        BancoDeDados.criar_tabelas()
+        OperacoesProdutos.cache = CacheProdutos()
+        OperacoesAdministrador.sessoes = CacheSessoes()
+        conn = BancoDeDados.conectar()
+        conn.execute('INSERT INTO pessoa (cpf) VALUES (1)')
+        conn.execute("INSERT INTO administrador (email, senha, cod_pessoa) VALUES ('admin@x.com', 'segredo', 1)")
+        conn.commit()
+        self.credenciais = 'Basic ' + base64.b64encode(b'1:segredo').decode()
+
+        self.servidor = ServidorHTTP(porta=0, trabalhadores=2, max_pendentes=4, tempo_limite=2.0)
+        self.laco = asyncio.new_event_loop()
+        pronto = threading.Event()
+
+        def executar():
+            asyncio.set_event_loop(self.laco)
+            self.laco.run_until_complete(self.servidor.iniciar())
+            pronto.set()
+            self.laco.run_forever()
+
+        self.thread = threading.Thread(target=executar, daemon=True)
+        self.thread.start()
+        pronto.wait()
+
+    def tearDown(self):
+        """Encerra o servidor, fecha as conexões e remove o banco temporário"""
+        asyncio.run_coroutine_threadsafe(self.servidor.encerrar(), self.laco).result()
+        self.laco.call_soon_threadsafe(self.laco.stop)
+        self.thread.join()
+        self.laco.close()
+        BancoDeDados.fechar_conexoes()
+        BancoDeDados.NOME_DB = self.nome_db_original
+        self.diretorio.cleanup()
+
+    def requisitar(self, metodo, caminho, dados=None, cabecalhos=None, conexao=None):
+        conexao = conexao or http.client.HTTPConnection('127.0.0.1', self.servidor.porta, timeout=5)
+        corpo = json.dumps(dados) if dados is not None else None
+        conexao.request(metodo, caminho, body=corpo, headers=cabecalhos or {})
+        resposta = conexao.getresponse()
+        return resposta.status, json.loads(resposta.read())
+
+    def test_produtos_e_vendas(self):
+        """Teste de sistema: cadastro autenticado, busca, consulta e venda pela API."""
+        produto = {'cod': 1, 'nome': 'Paracetamol 500mg', 'categoria': 'Analgésico', 'preco': 9.9, 'quantidade': 5}
+        self.assertEqual(self.requisitar('POST', '/produtos', produto)[0], 401)
+        conexao = http.client.HTTPConnection('127.0.0.1', self.servidor.porta, timeout=5)
+        status, _ = self.requisitar('POST', '/produtos', produto, {'Authorization': self.credenciais}, conexao)
+        self.assertEqual(status, 201)
+        # A mesma conexão é reaproveitada (keep-alive) nas requisições seguintes.
+        status, _ = self.requisitar('POST', '/produtos', produto, {'Authorization': self.credenciais}, conexao)
+        self.assertEqual(status, 409)
+        status, encontrados = self.requisitar('GET', '/produtos?q=parac', conexao=conexao)
+        self.assertEqual((status, [p['cod'] for p in encontrados]), (200, [1]))
+
+        status, resposta = self.requisitar('POST', '/vendas', {'itens': [{'produto': 1, 'quantidade': 3}]})
+        self.assertEqual((status, resposta['confirmada']), (200, True))
+        status, resposta = self.requisitar('POST', '/vendas', {'itens': [{'produto': 1, 'quantidade': 3}]})
+        self.assertEqual(status, 409)
+        self.assertEqual(resposta['falhas'][0]['motivo'], OperacoesProdutos.SEM_ESTOQUE)
+        self.assertEqual(self.requisitar('GET', '/produtos/1')[1]['quantidade'], 2)
+        produto['cod'], produto['nome'] = 2, 'Dipirona'
+        self.requisitar('POST', '/produtos', produto, {'Authorization': self.credenciais})
+        status, _ = self.requisitar('POST', '/vendas', {'itens': [{'produto': 1, 'quantidade': 1},
+                                                                  {'produto': 2, 'quantidade': 1}],
+                                                        'usuario': 5, 'farmacia': 1})
+        self.assertEqual(status, 200)
+        self.assertEqual(self.requisitar('GET', '/recomendacoes?produtos=2')[1], [{'cod': 1, 'pontuacao': 1}])
+        self.assertEqual(self.requisitar('GET', '/produtos/99')[0], 404)
+
+    def test_farmacias_usuarios_e_erros(self):
+        """Teste de sistema: farmácias abertas, usuários e respostas de erro."""
+        farmacia = {'cod': 7, 'nome': 'Central', 'telefone': '1199', 'rua': 'Rua A', 'num': 10,
+                    'bairro': 'Centro', 'cep': '01000-000', 'hora_inicio': '08:00', 'hora_fim': '20:00',
+                    'dia_funcionamento': 'Seg-Sex'}
+        status, _ = self.requisitar('POST', '/farmacias', farmacia, {'Authorization': self.credenciais})
+        self.assertEqual(status, 201)
+        status, abertas = self.requisitar('GET', '/farmacias?inicio=09:00&fim=18:00')
+        self.assertEqual((status, abertas[0]['nome'], abertas[0]['telefone']), (200, 'Central', '1199'))
+        self.assertEqual(self.requisitar('POST', '/usuarios', {'cpf': 123, 'telefone': '55'})[0], 201)
+        self.assertEqual(self.requisitar('POST', '/usuarios', {'cpf': 123, 'telefone': '55'})[0], 409)
+        self.assertEqual(self.requisitar('POST', '/usuarios', {'telefone': '55'})[0], 400)
+        self.assertEqual(self.requisitar('POST', '/usuarios', {'cpf': 2 ** 64, 'telefone': '55'})[0], 400)
+        self.assertEqual(self.requisitar('POST', '/vendas', {'itens': [{'produto': 10 ** 20, 'quantidade': 1}]})[0],
+                         400)
+        status, pagina = self.requisitar('GET', '/farmacias?limite=1')
+        self.assertEqual((status, pagina['itens'][0]['telefones'], pagina['proximo']), (200, '1199', None))
+        self.assertEqual(self.requisitar('GET', '/usuarios')[0], 401)
+        status, pagina = self.requisitar('GET', '/usuarios?limite=1', cabecalhos={'Authorization': self.credenciais})
+        self.assertEqual((status, pagina['itens'], pagina['proximo']), (200, [{'cpf': 123, 'telefones': '55'}], None))
+        self.assertEqual(self.requisitar('GET', '/produtos?cursor=xyz')[0], 400)
+        self.assertEqual(self.requisitar('GET', '/inexistente')[0], 404)
+        self.assertEqual(self.requisitar('DELETE', '/produtos')[0], 405)
+
+    def enviar_bruto(self, dados):
+        with socket.create_connection(('127.0.0.1', self.servidor.porta), timeout=5) as conexao:
+            conexao.sendall(dados)
+            resposta = b''
+            while True:
+                parte = conexao.recv(4096)
+                if not parte:
+                    return resposta
+                resposta += parte
+
+    def test_cabecalhos_invalidos_e_cliente_lento(self):
+        """Teste de sistema: Content-Length inválido recebe 400 e clientes ociosos são desconectados."""
+        for tamanho in (b'abc', b'-5', b'1_0'):
+            resposta = self.enviar_bruto(b'POST /usuarios HTTP/1.1\r\nContent-Length: ' + tamanho + b'\r\n\r\n')
+            self.assertTrue(resposta.startswith(b'HTTP/1.1 400 '), resposta)
+        tempo_original = ServidorHTTP.TEMPO_LEITURA
+        ServidorHTTP.TEMPO_LEITURA = 0.2
+        try:
+            inicio = time.monotonic()
+            # Corpo prometido e nunca enviado: a conexão é encerrada sem resposta.
+            self.assertEqual(self.enviar_bruto(b'POST /usuarios HTTP/1.1\r\nContent-Length: 10\r\n\r\n'), b'')
+            self.assertEqual(self.enviar_bruto(b'GET /saude HTTP/1.1\r\n'), b'')
+            self.assertLess(time.monotonic() - inicio, 4)
+        finally:
+            ServidorHTTP.TEMPO_LEITURA = tempo_original
+        self.assertEqual(self.requisitar('GET', '/saude')[0], 200)
+
+    def test_sessao_por_token(self):
+        """Teste de sistema: sessão aberta pela API autoriza cadastros até ser encerrada."""
+        self.assertEqual(self.requisitar('POST', '/sessoes', {'cpf': 1, 'senha': 'errada'})[0], 401)
+        status, resposta = self.requisitar('POST', '/sessoes', {'cpf': 1, 'senha': 'segredo'})
+        self.assertEqual(status, 201)
+        portador = {'Authorization': 'Bearer ' + resposta['token']}
+        produto = {'cod': 3, 'nome': 'Dipirona', 'categoria': 'Analgésico', 'preco': 5.0, 'quantidade': 1}
+        self.assertEqual(self.requisitar('POST', '/produtos', produto, portador)[0], 201)
+        self.assertEqual(self.requisitar('DELETE', '/sessoes', None, portador)[0], 200)
+        produto['cod'] = 4
+        self.assertEqual(self.requisitar('POST', '/produtos', produto, portador)[0], 401)
+
+    def test_tempo_limite_e_sobrecarga(self):
+        """Teste de integração: operação lenta gera 504 e o excesso de requisições gera 503."""
+        original = OperacoesAdministrador.verificar_credenciais
+        OperacoesAdministrador.verificar_credenciais = staticmethod(lambda cpf, senha: time.sleep(1) or True)
+        try:
+            self.servidor.tempo_limite = 0.2
+            status, _ = self.requisitar('POST', '/usuarios', {'cpf': 2, 'telefone': '1'})
+            self.assertEqual(status, 201)
+            # As duas threads seguem ocupadas depois do 504 e continuam contando como pendentes.
+            for _ in range(2):
+                status, resposta = self.requisitar('POST', '/produtos', {}, {'Authorization': self.credenciais})
+                self.assertEqual((status, resposta['executada']), (504, None))
+            self.assertEqual(self.servidor.pendentes, 2)
+            # Sem thread livre, a terceira expira ainda na fila e é descartada.
+            status, resposta = self.requisitar('POST', '/produtos', {}, {'Authorization': self.credenciais})
+            self.assertEqual((status, resposta['executada']), (504, False))
+            self.servidor.max_pendentes = 2
+            status, resposta = self.requisitar('GET', '/saude')
+            self.assertEqual(status, 503)
+            prazo = time.monotonic() + 5
+            while self.servidor.pendentes and time.monotonic() < prazo:
+                time.sleep(0.05)
+            self.assertEqual(self.requisitar('GET', '/saude')[0], 200)
+        finally:
+            OperacoesAdministrador.verificar_credenciais = original
+
+
+if __name__ == '__main__':
+    unittest.main()